@@ -0,0 +1,102 @@
+"""Payment archive: database size and read times before and after `archive`.
+
+Generates a ledger, times a set of reads, archives every year but the last
+(VACUUM included), then times the same reads served from the segments.
+A year's total is also computed both ways: SUM() over payments in SQLite
+against sum() over the archived amount column.
+
+    python -m benchmarks.bench_archive [--expenses 2000] [--payments 1000000] [--runs 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from expense_tracker import archive
+from expense_tracker import db as dbm
+from expense_tracker.recurrence import day_number, month_bounds
+
+from .datagen import generate
+
+# Generated payments run from 2019 through 2024; everything before 2024 is archived.
+ARCHIVE_BEFORE = 2024
+OLD_YEAR = 2021
+
+READS: dict[str, Callable[[str], object]] = {
+    "month summary": lambda p: dbm.monthly_payment_summary(p, year=OLD_YEAR, month=5),
+    "month by currency": lambda p: dbm.monthly_currency_summary(p, year=OLD_YEAR, month=5),
+    "report, one year": lambda p: dbm.payment_report(p, year=OLD_YEAR),
+    "payments, 1 month": lambda p: dbm.list_payments(p, year_month=f"{OLD_YEAR}-05", limit=100),
+    "payments, newest": lambda p: dbm.list_payments(p, limit=100),
+}
+
+
+def sql_year_total(db_path: str, year: int) -> tuple[int, int]:
+    start, _ = month_bounds(year, 1)
+    _, end = month_bounds(year, 12)
+    with dbm.get_connection(db_path) as conn:
+        return conn.execute(
+            "SELECT SUM(amount_cents), COUNT(*) FROM payments WHERE paid_day >= ? AND paid_day < ?",
+            (day_number(start), day_number(end)),
+        ).fetchone()
+
+
+def time_call(fn: Callable, runs: int) -> float:
+    """Median seconds over runs (after one warm-up call)."""
+    fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--expenses", type=int, default=2000)
+    p.add_argument("--payments", type=int, default=1000000)
+    p.add_argument("--runs", type=int, default=5)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        generate(db_path, expenses=args.expenses, payments=args.payments)
+        dbm.get_connection(db_path).execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_before = os.path.getsize(db_path)
+        hot = {name: time_call(lambda: read(db_path), args.runs) for name, read in READS.items()}
+        sql_total = time_call(lambda: sql_year_total(db_path, OLD_YEAR), args.runs)
+        expected = sql_year_total(db_path, OLD_YEAR)
+
+        started = time.perf_counter()
+        written = archive.archive_payments(db_path, before_year=ARCHIVE_BEFORE)
+        archived = time.perf_counter() - started
+        dbm.vacuum(db_path)
+        size_after = os.path.getsize(db_path)
+        segment_size = sum(f.stat().st_size for f in archive.archive_dir(db_path).iterdir())
+        assert archive.year_total(db_path, OLD_YEAR) == tuple(expected)
+
+        print(f"{args.expenses} expenses / {args.payments} payments")
+        print(f"archived {sum(w['rows'] for w in written)} payments in {archived:.1f}s")
+        print(
+            f"database {size_before // 1024} KiB -> {size_after // 1024} KiB"
+            f" + {segment_size // 1024} KiB of segments\n"
+        )
+        print(f"{'read':<22} {'sqlite ms':>10} {'archived ms':>12}")
+        for name, read in READS.items():
+            cold = time_call(lambda: read(db_path), args.runs)
+            print(f"{name:<22} {hot[name] * 1000:>10.2f} {cold * 1000:>12.2f}")
+        column_total = time_call(lambda: archive.year_total(db_path, OLD_YEAR), args.runs)
+        print(f"{'year total':<22} {sql_total * 1000:>10.2f} {column_total * 1000:>12.2f}")
+        dbm.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
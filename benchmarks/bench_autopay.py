@@ -0,0 +1,90 @@
+"""Autopay catch-up: one run_autopay batch vs paying each occurrence with pay_expense.
+
+Every expense is switched to autopay and made due from the start of a
+quarter, then the quarter is paid off. The per-occurrence baseline (what a
+loop of `pay` commands does, minus process start-up) runs on a sample of
+expenses and is extrapolated to all of them.
+
+    python -m benchmarks.bench_autopay [--expenses 50000] [--days 90] [--sample 1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from expense_tracker import db as dbm
+
+from .datagen import generate
+
+QUARTER_START = date(2025, 1, 1)
+
+
+def prepare(db_path: str) -> None:
+    """Make every expense an active autopay expense due within the first four weeks."""
+    with dbm.write_transaction(db_path) as conn:
+        conn.execute(
+            "UPDATE expenses SET autopay = 1, active = 1, next_due_date = date(?, '+' || (id % 28) || ' days')",
+            (QUARTER_START.isoformat(),),
+        )
+
+
+def pay_one_by_one(db_path: str, expense_ids: list[int], through: str) -> int:
+    """Pay each due occurrence with its own pay_expense call; returns the payment count."""
+    count = 0
+    for expense_id in expense_ids:
+        due = dbm.get_expense_by_id(db_path, expense_id)["next_due_date"]
+        while due is not None and due <= through:
+            result = dbm.pay_expense(db_path, expense_id, paid_date=due, method=dbm.AUTOPAY_METHOD)
+            count += 1
+            due = result["next_due_date"] if result["active"] else None
+    return count
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--expenses", type=int, default=50000)
+    p.add_argument("--payments", type=int, default=100000, help="Existing payment history")
+    p.add_argument("--days", type=int, default=90, help="Length of the catch-up window")
+    p.add_argument("--sample", type=int, default=1000, help="Expenses paid one by one for the baseline")
+    args = p.parse_args(argv)
+    through = (QUARTER_START + timedelta(days=args.days - 1)).isoformat()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        batch_db = str(Path(tmp) / "batch.db")
+        loop_db = str(Path(tmp) / "loop.db")
+        generate(batch_db, expenses=args.expenses, payments=args.payments)
+        prepare(batch_db)
+        dbm.close_all()
+        with sqlite3.connect(batch_db) as source, sqlite3.connect(loop_db) as target:
+            source.backup(target)
+        source.close()
+        target.close()
+
+        started = time.perf_counter()
+        results = dbm.run_autopay(batch_db, through=through)
+        batch = time.perf_counter() - started
+        posted = sum(r["payments"] for r in results)
+
+        sample = list(range(1, min(args.sample, args.expenses) + 1))
+        started = time.perf_counter()
+        sampled = pay_one_by_one(loop_db, sample, through)
+        loop = time.perf_counter() - started
+        per_payment = loop / sampled if sampled else 0.0
+        dbm.close_all()
+
+    print(f"{len(results)} autopay expenses, {posted} payments due {QUARTER_START.isoformat()}..{through}")
+    print(f"run_autopay (one transaction): {batch:8.2f} s  {posted / batch:10.0f} payments/s")
+    print(
+        f"pay_expense per occurrence:    {per_payment * posted:8.2f} s  {1 / per_payment if per_payment else 0:10.0f} payments/s"
+        f"  (extrapolated from {sampled} payments for {len(sample)} expenses)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
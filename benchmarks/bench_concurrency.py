@@ -0,0 +1,107 @@
+"""Reader/writer throughput under each database PRAGMA profile.
+
+Readers run the dashboard queries (upcoming, monthly summary, recent
+payments) while writers record payments, all against one database file.
+
+    python -m benchmarks.bench_concurrency [--seconds 5] [--readers 4] [--writers 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from expense_tracker import db as dbm
+
+from .datagen import generate
+
+
+def run_profile(db_path: str, profile: str, *, seconds: float, readers: int, writers: int, expenses: int) -> dict:
+    dbm.close_all()
+    dbm.set_default_profile(profile)
+    # Open once up front so a journal_mode change happens before the threads start.
+    dbm.get_connection(db_path)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "busy": 0}
+    lock = threading.Lock()
+
+    def reader(seed: int) -> None:
+        rnd = random.Random(seed)
+        n = 0
+        while not stop.is_set():
+            day = date(2020, 1, 1) + timedelta(days=rnd.randrange(0, 2000))
+            dbm.upcoming_expenses(db_path, until_date=day.isoformat())
+            dbm.monthly_payment_summary(db_path, year=day.year, month=day.month)
+            dbm.list_payments(db_path, year_month=day.strftime("%Y-%m"))
+            n += 1
+        with lock:
+            counts["reads"] += n
+
+    def writer(seed: int) -> None:
+        rnd = random.Random(seed)
+        n = busy = 0
+        while not stop.is_set():
+            try:
+                dbm.pay_expense(db_path, rnd.randrange(1, expenses + 1), paid_date="2025-01-01")
+                n += 1
+            except sqlite3.OperationalError:
+                busy += 1
+        with lock:
+            counts["writes"] += n
+            counts["busy"] += busy
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    dbm.close_all()
+    return {
+        "profile": profile,
+        "reads_per_sec": counts["reads"] / seconds,
+        "writes_per_sec": counts["writes"] / seconds,
+        "busy_errors": counts["busy"],
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--readers", type=int, default=4)
+    p.add_argument("--writers", type=int, default=2)
+    p.add_argument("--expenses", type=int, default=2000)
+    p.add_argument("--payments", type=int, default=100_000)
+    p.add_argument("--profiles", nargs="+", default=["legacy", "default"], choices=sorted(dbm.PRAGMA_PROFILES))
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = Path(tmp) / "template.db"
+        generate(str(template), expenses=args.expenses, payments=args.payments)
+        dbm.close_all()
+        print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'busy':>6}")
+        for profile in args.profiles:
+            db_path = str(Path(tmp) / f"{profile}.db")
+            Path(db_path).write_bytes(template.read_bytes())
+            r = run_profile(
+                db_path,
+                profile,
+                seconds=args.seconds,
+                readers=args.readers,
+                writers=args.writers,
+                expenses=args.expenses,
+            )
+            print(f"{r['profile']:<10} {r['reads_per_sec']:>10.1f} {r['writes_per_sec']:>10.1f} {r['busy_errors']:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
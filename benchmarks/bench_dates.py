@@ -0,0 +1,117 @@
+"""Date layout: ISO TEXT indexes vs integer day-number indexes.
+
+Builds a database, adds TEXT-keyed twins of the day-number indexes, and
+compares their on-disk size (dbstat) and the speed of the same range scans
+forced through each with INDEXED BY. Also times decoding dates in Python.
+
+    python -m benchmarks.bench_dates [--expenses 2000] [--payments 500000] [--runs 7]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from expense_tracker import db as dbm
+from expense_tracker.recurrence import day_number, from_day_number, parse_date
+
+from .datagen import generate
+
+# (day-number index, TEXT twin, table, TEXT twin's columns)
+INDEX_PAIRS = [
+    ("idx_payments_paid_day", "bench_payments_paid_date", "payments", "paid_date"),
+    ("idx_payments_expense_day", "bench_payments_expense_date", "payments", "expense_id, paid_date"),
+    ("idx_expenses_next_due_day", "bench_expenses_next_due_date", "expenses", "next_due_date"),
+]
+
+# (name, start, end) half-open ranges of paid_date
+RANGES = [
+    ("1 week", date(2023, 6, 5), date(2023, 6, 12)),
+    ("1 month", date(2023, 6, 1), date(2023, 7, 1)),
+    ("1 year", date(2023, 1, 1), date(2024, 1, 1)),
+]
+
+
+def index_sizes(conn: sqlite3.Connection) -> dict[str, int]:
+    return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+
+
+def time_sql(conn: sqlite3.Connection, sql: str, params, runs: int) -> tuple[float, int]:
+    """Median seconds to fetch all rows, and the row count."""
+    samples = []
+    rows = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), rows
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--expenses", type=int, default=2000)
+    p.add_argument("--payments", type=int, default=500000)
+    p.add_argument("--runs", type=int, default=7)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        generate(db_path, expenses=args.expenses, payments=args.payments)
+        dbm.close_all()
+        conn = sqlite3.connect(db_path)
+        for _, twin, table, columns in INDEX_PAIRS:
+            conn.execute(f"CREATE INDEX {twin} ON {table}({columns})")
+        conn.execute("ANALYZE")
+
+        sizes = index_sizes(conn)
+        print(f"{args.expenses} expenses / {args.payments} payments\n")
+        print(f"{'index':<30} {'TEXT KiB':>9} {'day KiB':>9} {'saved':>6}")
+        for index, twin, _, _ in INDEX_PAIRS:
+            text, day = sizes[twin], sizes[index]
+            print(f"{index:<30} {text // 1024:>9} {day // 1024:>9} {1 - day / text:>6.0%}")
+
+        print(f"\n{'range scan':<26} {'rows':>7} {'TEXT ms':>8} {'day ms':>8}")
+        for name, start, end in RANGES:
+            for what, select in (("ids", "id"), ("rows", "id, amount_cents, paid_date")):
+                text_ms, rows = time_sql(
+                    conn,
+                    f"SELECT {select} FROM payments INDEXED BY bench_payments_paid_date "
+                    "WHERE paid_date >= ? AND paid_date < ?",
+                    (start.isoformat(), end.isoformat()),
+                    args.runs,
+                )
+                day_ms, _ = time_sql(
+                    conn,
+                    f"SELECT {select} FROM payments INDEXED BY idx_payments_paid_day "
+                    "WHERE paid_day >= ? AND paid_day < ?",
+                    (day_number(start), day_number(end)),
+                    args.runs,
+                )
+                print(f"{name + ', ' + what:<26} {rows:>7} {text_ms * 1000:>8.2f} {day_ms * 1000:>8.2f}")
+        conn.close()
+
+    texts = [date.fromordinal(730000 + i % 5000).isoformat() for i in range(200000)]
+    days = [day_number(t) for t in texts]
+    decoders = {
+        "strptime": lambda: [datetime.strptime(t, "%Y-%m-%d").date() for t in texts],
+        "parse_date": lambda: [parse_date(t) for t in texts],
+        "from_day_number": lambda: [from_day_number(d) for d in days],
+    }
+    print(f"\n{'decode 200k dates':<26} {'ms':>8}")
+    for name, decode in decoders.items():
+        samples = []
+        for _ in range(3):
+            started = time.perf_counter()
+            decode()
+            samples.append(time.perf_counter() - started)
+        print(f"{name:<26} {statistics.median(samples) * 1000:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Multi-database (sharded) queries: serial loop vs thread pool, 1 to 64 shards.
+
+One shard is generated and copied, so every shard holds the same amount of
+data and the time should grow linearly with the shard count; the pool's
+job is to keep the slope flat. Connections are closed before every run,
+as each CLI invocation opens them afresh.
+
+    python -m benchmarks.bench_shards [--shards 1,2,4,8,16,32,64] [--runs 5] [--workers 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable
+
+from expense_tracker import db as dbm
+from expense_tracker import shards
+
+from .datagen import generate
+
+AS_OF = date(2023, 6, 15)
+
+
+def _upcoming(paths: list[str], run: Callable) -> int:
+    results = run(paths, dbm.upcoming_expenses, until_date="2023-07-15")
+    merged = shards.merge_sorted(paths, results, key=lambda r: (r["next_due_date"], r["name"]))
+    return sum(1 for _ in merged)
+
+
+def _month(paths: list[str], run: Callable) -> int:
+    summaries = run(paths, dbm.monthly_currency_summary, year=AS_OF.year, month=AS_OF.month, base="USD")
+    return sum(r["count"] for r in shards.merge_currency_summaries(summaries))
+
+
+def _payments(paths: list[str], run: Callable) -> int:
+    results = run(paths, dbm.list_payments, year_month="2023-06", limit=100)
+    merged = shards.merge_sorted(paths, results, key=lambda r: (r["paid_date"], r["id"]), reverse=True)
+    return len(list(merged)[:100])
+
+
+QUERIES = {"upcoming": _upcoming, "month": _month, "payments --limit 100": _payments}
+
+
+def _serial(paths, fn, **kwargs):
+    return [fn(path, **kwargs) for path in paths]
+
+
+def time_query(query: Callable, paths: list[str], run: Callable, runs: int) -> tuple[float, int]:
+    """Median seconds over runs, and the row count of the last run."""
+    samples = []
+    rows = 0
+    for _ in range(runs):
+        dbm.close_all()
+        started = time.perf_counter()
+        rows = query(paths, run)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), rows
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--shards", default="1,2,4,8,16,32,64", help="Comma-separated shard counts")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--workers", type=int, default=shards.DEFAULT_WORKERS)
+    p.add_argument("--expenses", type=int, default=500, help="Expenses per shard")
+    p.add_argument("--payments", type=int, default=20000, help="Payments per shard")
+    args = p.parse_args(argv)
+    counts = sorted(int(n) for n in args.shards.split(","))
+
+    def pooled(paths, fn, **kwargs):
+        return shards.map_shards(paths, fn, workers=args.workers, **kwargs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = Path(tmp) / "shard0.db"
+        generate(str(template), expenses=args.expenses, payments=args.payments)
+        dbm.close_all()
+        paths = [str(template)]
+        with sqlite3.connect(template) as source:
+            for i in range(1, counts[-1]):
+                paths.append(str(Path(tmp) / f"shard{i}.db"))
+                # backup() copies pages still in the WAL too; a file copy would miss them.
+                with sqlite3.connect(paths[-1]) as target:
+                    source.backup(target)
+                target.close()
+        source.close()
+
+        print(f"{args.expenses} expenses / {args.payments} payments per shard, {args.workers} workers")
+        print(f"{'query':<22} {'shards':>6} {'rows':>7} {'serial ms':>10} {'pooled ms':>10} {'speedup':>8}")
+        for name, query in QUERIES.items():
+            for n in counts:
+                serial, rows = time_query(query, paths[:n], _serial, args.runs)
+                parallel, _ = time_query(query, paths[:n], pooled, args.runs)
+                print(
+                    f"{name:<22} {n:>6} {rows:>7} {serial * 1000:>10.1f} {parallel * 1000:>10.1f}"
+                    f" {serial / parallel:>7.2f}x"
+                )
+        dbm.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
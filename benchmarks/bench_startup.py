@@ -0,0 +1,112 @@
+"""CLI cold-start latency: wall time per command and a per-module import profile.
+
+Every run is a fresh interpreter, as when the CLI is invoked from cron or a
+shell hook. The bare interpreter start-up (python -c pass) is reported too,
+so the CLI's own overhead is the difference.
+
+    python -m benchmarks.bench_startup [--runs 20] [--target-ms 60] [--top 15]
+
+Exits 1 when the median overhead of `list` over a bare interpreter exceeds
+--target-ms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .datagen import generate
+
+COMMANDS = {
+    "python -c pass": ["-c", "pass"],
+    "--help": ["-m", "expense_tracker", "--help"],
+    "list": ["-m", "expense_tracker", "--db", "{db}", "list"],
+    "upcoming": ["-m", "expense_tracker", "--db", "{db}", "upcoming", "--days", "30"],
+    "month": ["-m", "expense_tracker", "--db", "{db}", "month", "--month", "2023-06"],
+}
+
+
+def _env() -> dict:
+    root = str(Path(__file__).resolve().parent.parent)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    return env
+
+
+def time_command(args: list[str], *, runs: int, env: dict) -> float:
+    """Median wall time in seconds of `python <args>` over runs fresh processes."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def import_profile(args: list[str], *, env: dict) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for each module imported by `python -X importtime <args>`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--expenses", type=int, default=200)
+    p.add_argument("--payments", type=int, default=5000)
+    p.add_argument("--top", type=int, default=15, help="Modules to show in the import profile")
+    p.add_argument("--target-ms", type=float, default=60.0, help="Budget for list's overhead over python -c pass")
+    args = p.parse_args(argv)
+
+    env = _env()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        generate(db_path, expenses=args.expenses, payments=args.payments)
+        # Warm the bytecode cache and the page cache; the first run is not representative.
+        for cmd in COMMANDS.values():
+            subprocess.run([sys.executable, *(a.format(db=db_path) for a in cmd)], env=env, stdout=subprocess.DEVNULL)
+
+        timings = {
+            name: time_command([a.format(db=db_path) for a in cmd], runs=args.runs, env=env)
+            for name, cmd in COMMANDS.items()
+        }
+        baseline = timings["python -c pass"]
+        print(f"{'command':<16} {'median ms':>10} {'overhead ms':>12}")
+        for name, seconds in timings.items():
+            print(f"{name:<16} {seconds * 1000:>10.1f} {(seconds - baseline) * 1000:>12.1f}")
+
+        modules = import_profile([a.format(db=db_path) for a in COMMANDS["list"]], env=env)
+        print(f"\nimports for `list` (top {args.top} by self time)")
+        print(f"{'module':<40} {'self ms':>8} {'cumulative ms':>14}")
+        for module, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)[: args.top]:
+            print(f"{module.strip():<40} {self_us / 1000:>8.2f} {cumulative_us / 1000:>14.2f}")
+
+    overhead_ms = (timings["list"] - baseline) * 1000
+    if overhead_ms > args.target_ms:
+        print(f"\nlist overhead {overhead_ms:.1f} ms exceeds target {args.target_ms:.0f} ms")
+        return 1
+    print(f"\nlist overhead {overhead_ms:.1f} ms within target {args.target_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
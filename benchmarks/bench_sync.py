@@ -0,0 +1,82 @@
+"""Sync: time to apply N changes between two copies, at several database sizes.
+
+For each size, generates a ledger, copies it to a second node (`sync
+new-id`), makes N changes on the first (payments recorded, expenses
+edited and deleted) and times `sync` pushing them to the copy. The time
+should follow N, not the number of rows in the database.
+
+    python -m benchmarks.bench_sync [--payments 50000,500000] [--changes 10,100,1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from expense_tracker import db as dbm
+from expense_tracker.sync import sync
+
+from .datagen import generate
+
+
+def make_changes(db_path: str, n: int, rnd: random.Random) -> None:
+    """n changes on db_path: mostly new payments, some edits and a few deletes."""
+    with dbm.write_transaction(db_path) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM expenses ORDER BY id")]
+        for i in range(n):
+            expense_id = rnd.choice(ids)
+            kind = i % 10
+            if kind < 7:
+                conn.execute(
+                    "INSERT INTO payments (expense_id, amount_cents, paid_date, method, created_at)"
+                    " VALUES (?, ?, '2024-12-01', 'Visa', '2024-12-01T00:00:00Z')",
+                    (expense_id, rnd.randrange(99, 250_000)),
+                )
+            elif kind < 9:
+                conn.execute(
+                    "UPDATE expenses SET notes = ?, updated_at = strftime('%Y-%m-%dT%H:%M:%SZ', 'now') WHERE id = ?",
+                    (f"edit {i}", expense_id),
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM payments WHERE id = (SELECT MAX(id) FROM payments WHERE expense_id = ?)", (expense_id,)
+                )
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--expenses", type=int, default=2000)
+    p.add_argument("--payments", default="50000,500000", help="Comma-separated database sizes")
+    p.add_argument("--changes", default="10,100,1000", help="Comma-separated change counts")
+    args = p.parse_args(argv)
+    sizes = [int(s) for s in args.payments.split(",")]
+    counts = [int(c) for c in args.changes.split(",")]
+    rnd = random.Random(0)
+
+    print(f"{'payments':>9} {'changes':>8} {'applied':>8} {'sync ms':>9} {'no-op ms':>9}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            source, target = str(Path(tmp) / "a.db"), str(Path(tmp) / "b.db")
+            generate(source, expenses=args.expenses, payments=size)
+            dbm.close_all()
+            shutil.copy(source, target)
+            dbm.reset_node_id(target)
+            for n in counts:
+                make_changes(source, n, rnd)
+                started = time.perf_counter()
+                result = sync(source, target)
+                elapsed = time.perf_counter() - started
+                started = time.perf_counter()
+                sync(source, target)
+                idle = time.perf_counter() - started
+                print(f"{size:>9} {n:>8} {result.changes:>8} {elapsed * 1000:>9.1f} {idle * 1000:>9.2f}")
+            dbm.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""Deterministic synthetic dataset for benchmarks.
+
+    python -m benchmarks.datagen bench.db --expenses 10000 --payments 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from expense_tracker import db as dbm
+from expense_tracker.recurrence import SUPPORTED_RECURRENCES
+
+CATEGORIES = ["Housing", "Utilities", "Entertainment", "Insurance", "Transport", "Health", "Food", None]
+CURRENCIES = ["USD", "USD", "USD", "EUR", "GBP"]
+# Weighted towards the schedules real ledgers are made of.
+RECURRENCE_WEIGHTS = {
+    "monthly": 40,
+    "yearly": 15,
+    "weekly": 10,
+    "quarterly": 10,
+    "biweekly": 8,
+    "daily": 2,
+    "none": 15,
+}
+assert set(RECURRENCE_WEIGHTS) == SUPPORTED_RECURRENCES
+
+
+def _expense_rows(rnd: random.Random, n: int, start: date, days: int) -> Iterator[dict]:
+    recurrences = list(RECURRENCE_WEIGHTS)
+    weights = list(RECURRENCE_WEIGHTS.values())
+    stamp = datetime(start.year, start.month, start.day)
+    for i in range(1, n + 1):
+        first = start + timedelta(days=rnd.randrange(days))
+        created = (stamp + timedelta(seconds=i * 37)).isoformat() + "Z"
+        row = {
+            "id": i,
+            "name": f"{rnd.choice(['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli'])} {rnd.choice(['Plan', 'Bill', 'Service', 'Rent', 'Pass'])} {i}",
+            "amount_cents": rnd.randrange(99, 250_000),
+            "currency": rnd.choice(CURRENCIES),
+            "category": rnd.choice(CATEGORIES),
+            "recurrence": rnd.choices(recurrences, weights)[0],
+            "start_date": first.isoformat(),
+            "next_due_date": (first + timedelta(days=rnd.randrange(days))).isoformat(),
+            "notes": rnd.choice([None, None, "autopay", "shared", "work expense"]),
+            "active": 0 if rnd.random() < 0.1 else 1,
+            "created_at": created,
+            "updated_at": created,
+        }
+        # Derived rather than drawn, so the random stream (and every other column) is unchanged.
+        row["autopay"] = 1 if row["notes"] == "autopay" else 0
+        yield row
+
+
+def _payment_rows(rnd: random.Random, n: int, expenses: int, start: date, days: int) -> Iterator[dict]:
+    stamp = datetime(start.year, start.month, start.day)
+    for i in range(1, n + 1):
+        paid = start + timedelta(days=rnd.randrange(days))
+        yield {
+            "id": i,
+            "expense_id": rnd.randrange(1, expenses + 1),
+            "amount_cents": rnd.randrange(99, 250_000),
+            "paid_date": paid.isoformat(),
+            "method": rnd.choice([None, "Visa", "ACH", "Cash"]),
+            "notes": None,
+            "created_at": (stamp + timedelta(seconds=i * 7)).isoformat() + "Z",
+        }
+
+
+def generate(
+    db_path: str,
+    *,
+    expenses: int,
+    payments: int,
+    seed: int = 0,
+    start: date = date(2019, 1, 1),
+    years: int = 6,
+) -> None:
+    """Fill db_path with `expenses` expenses and `payments` payments.
+
+    The same arguments always produce the same rows, so results taken on
+    different commits are comparable. db_path should be a new, empty file.
+    """
+    rnd = random.Random(seed)
+    days = 365 * years
+    dbm.bulk_insert_expenses(db_path, _expense_rows(rnd, expenses, start, days))
+    if expenses and payments:
+        dbm.bulk_insert_payments(db_path, _payment_rows(rnd, payments, expenses, start, days))
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Generate a synthetic expense-tracker database")
+    p.add_argument("db", help="Path of the database to create")
+    p.add_argument("--expenses", type=int, default=10_000)
+    p.add_argument("--payments", type=int, default=200_000)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+    generate(args.db, expenses=args.expenses, payments=args.payments, seed=args.seed)
+    print(f"Generated {args.expenses} expenses and {args.payments} payments in {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,259 @@
+"""Benchmark suite: database queries, recurrence math and CLI commands.
+
+Builds a deterministic dataset (benchmarks.datagen), times each case and
+writes machine-readable results so runs from different commits can be
+compared:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from expense_tracker import __version__
+from expense_tracker import cli
+from expense_tracker import db as dbm
+from expense_tracker.forecast import build_forecast
+from expense_tracker.reconcile import reconcile
+from expense_tracker.recurrence import SUPPORTED_RECURRENCES, compute_next_due_date
+
+from .datagen import generate
+
+# Fixed reference date inside the generated data range, so results do not
+# depend on the day the suite runs.
+AS_OF = date(2023, 6, 15)
+
+CASES: list[tuple[str, str, Callable[[dict], object]]] = []
+
+
+def case(group: str, name: str):
+    def register(fn: Callable[[dict], object]) -> Callable[[dict], object]:
+        CASES.append((group, name, fn))
+        return fn
+
+    return register
+
+
+@case("db", "list_expenses")
+def _list_expenses(ctx: dict) -> object:
+    return dbm.list_expenses(ctx["db"])
+
+
+@case("db", "upcoming_expenses_30d")
+def _upcoming(ctx: dict) -> object:
+    return dbm.upcoming_expenses(ctx["db"], until_date=(AS_OF + timedelta(days=30)).isoformat())
+
+
+@case("db", "list_payments_month")
+def _payments_month(ctx: dict) -> object:
+    return dbm.list_payments(ctx["db"], year_month=AS_OF.strftime("%Y-%m"))
+
+
+@case("db", "list_payments_expense")
+def _payments_expense(ctx: dict) -> object:
+    return dbm.list_payments(ctx["db"], expense_id=1)
+
+
+@case("db", "monthly_summary_12_months")
+def _monthly_year(ctx: dict) -> object:
+    return [dbm.monthly_payment_summary(ctx["db"], year=AS_OF.year, month=m) for m in range(1, 13)]
+
+
+@case("db", "payment_report_year_by_category")
+def _report_year(ctx: dict) -> object:
+    return dbm.payment_report(ctx["db"], year=AS_OF.year, by="category")
+
+
+@case("recurrence", "reconcile_all")
+def _reconcile(ctx: dict) -> object:
+    return reconcile(ctx["db"], as_of=AS_OF)
+
+
+@case("db", "get_expense_by_name")
+def _by_name(ctx: dict) -> object:
+    return dbm.get_expense_by_name(ctx["db"], ctx["name"])
+
+
+@case("db", "search_expenses")
+def _search(ctx: dict) -> object:
+    return dbm.search_expenses(ctx["db"], "acme pla")
+
+
+@case("db", "iter_payments_all")
+def _iter_payments(ctx: dict) -> object:
+    n = 0
+    for _ in dbm.iter_payments(ctx["db"]):
+        n += 1
+    return n
+
+
+@case("recurrence", "compute_next_due_date_x10000")
+def _next_due(ctx: dict) -> object:
+    return [compute_next_due_date(base, None, r, from_date=AS_OF) for base, r in ctx["schedules"]]
+
+
+@case("recurrence", "build_forecast_36_months")
+def _forecast(ctx: dict) -> object:
+    f = build_forecast(ctx["expense_rows"], AS_OF, AS_OF + timedelta(days=3 * 365))
+    return f.totals_by_month(), f.totals_by_category()
+
+
+def _run_cli(ctx: dict, *argv: str) -> None:
+    with redirect_stdout(io.StringIO()):
+        cli.main(["--db", ctx["db"], *argv])
+
+
+@case("cli", "list")
+def _cli_list(ctx: dict) -> object:
+    return _run_cli(ctx, "list")
+
+
+@case("cli", "upcoming")
+def _cli_upcoming(ctx: dict) -> object:
+    return _run_cli(ctx, "upcoming", "--days", "30")
+
+
+@case("cli", "month")
+def _cli_month(ctx: dict) -> object:
+    return _run_cli(ctx, "month", "--month", AS_OF.strftime("%Y-%m"))
+
+
+@case("cli", "payments_month")
+def _cli_payments(ctx: dict) -> object:
+    return _run_cli(ctx, "payments", "--month", AS_OF.strftime("%Y-%m"))
+
+
+@case("cli", "forecast")
+def _cli_forecast(ctx: dict) -> object:
+    return _run_cli(ctx, "forecast", "--months", "12", "--start", AS_OF.isoformat())
+
+
+@case("cli", "export_all")
+def _cli_export(ctx: dict) -> object:
+    return _run_cli(ctx, "export", str(Path(ctx["tmp"]) / "export.csv"))
+
+
+def _time(fn: Callable[[dict], object], ctx: dict, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(ctx)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _compare(results: list[dict], baseline_path: str, threshold: float) -> int:
+    baseline = {r["name"]: r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    regressions = 0
+    print()
+    print(f"{'case':<42} {'before':>10} {'after':>10} {'ratio':>7}")
+    for r in results:
+        before = baseline.get(r["name"])
+        if before is None:
+            continue
+        ratio = r["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{r['name']:<42} {before['median_s']:>10.5f} {r['median_s']:>10.5f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Run the expense-tracker benchmark suite")
+    p.add_argument("--expenses", type=int, default=10_000)
+    p.add_argument("--payments", type=int, default=200_000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default 5)")
+    p.add_argument("--filter", help="Only run cases whose name contains this text")
+    p.add_argument("--output", help="Write JSON results to this path")
+    p.add_argument("--compare", help="Baseline JSON results to compare against")
+    p.add_argument("--threshold", type=float, default=0.10, help="Regression threshold for --compare (default 0.10)")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        started = time.perf_counter()
+        generate(db_path, expenses=args.expenses, payments=args.payments, seed=args.seed)
+        print(f"Generated {args.expenses} expenses / {args.payments} payments in {time.perf_counter() - started:.1f}s")
+
+        expense_rows = [dict(r) for r in dbm.list_expenses(db_path)]
+        recurrences = sorted(SUPPORTED_RECURRENCES)
+        ctx = {
+            "db": db_path,
+            "tmp": tmp,
+            "name": expense_rows[len(expense_rows) // 2]["name"] if expense_rows else "",
+            "expense_rows": expense_rows,
+            "schedules": [
+                (date(2019, 1, 1) + timedelta(days=i % 1500), recurrences[i % len(recurrences)])
+                for i in range(10_000)
+            ],
+        }
+
+        results = []
+        print(f"{'case':<42} {'median':>10} {'min':>10}")
+        for group, name, fn in CASES:
+            full_name = f"{group}.{name}"
+            if args.filter and args.filter not in full_name:
+                continue
+            fn(ctx)  # warm-up
+            timings = _time(fn, ctx, args.repeat)
+            result = {
+                "name": full_name,
+                "runs": len(timings),
+                "min_s": min(timings),
+                "median_s": statistics.median(timings),
+                "mean_s": statistics.fmean(timings),
+            }
+            results.append(result)
+            print(f"{full_name:<42} {result['median_s']:>10.5f} {result['min_s']:>10.5f}")
+        dbm.close_all()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "commit": _git_commit(),
+            "version": __version__,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "expenses": args.expenses,
+            "payments": args.payments,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+    if args.compare:
+        return 1 if _compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
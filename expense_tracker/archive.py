@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date
+from pathlib import Path
+from typing import Iterator, Optional
+
+from . import db as dbm
+from .recurrence import day_number, from_day_number, month_bounds
+
+# Cold storage for payments of closed years.
+#
+# Each archived year is one segment file next to the database, in
+# "<db file>-archive/". The int64 columns are read through mmap and
+# memoryview without loading them, and rows are sorted by (paid_day, id),
+# so a month or a date range is two bisects and its total is sum() over a
+# slice. Text columns (method, notes, created_at) follow as one JSON block
+# and are loaded only when whole rows are needed (listing and export).
+# The payment_archive table is the manifest: a segment counts only once
+# its row is committed, in the same transaction that deletes the payments.
+#
+# Layout: header (magic, format version, byte order of the columns, rows,
+# JSON length), then the columns in SEGMENT_COLUMNS order, rows * 8 bytes
+# each, then the JSON block.
+
+MAGIC = b"ETPAYSEG"
+FORMAT_VERSION = 1
+SEGMENT_COLUMNS = ("id", "expense_id", "amount_cents", "paid_day", "method")
+_HEADER = struct.Struct("<8sIc3xQQ")
+
+
+def archive_dir(db_path: str) -> Path:
+    return Path(f"{db_path}-archive")
+
+
+class Segment:
+    """One archived year of payments, memory-mapped read-only."""
+
+    def __init__(self, path: Path, year: int) -> None:
+        self.path = path
+        self.year = year
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, order, rows, json_len = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a payment segment (format {FORMAT_VERSION})")
+        self.rows = rows
+        start = _HEADER.size
+        end = start + 8 * rows * len(SEGMENT_COLUMNS)
+        if order == (b"L" if sys.byteorder == "little" else b"B"):
+            data = memoryview(self._map)[start:end].cast("q")
+        else:
+            data = array("q", self._map[start:end])
+            data.byteswap()
+        columns = [data[i * rows:(i + 1) * rows] for i in range(len(SEGMENT_COLUMNS))]
+        self.ids, self.expense_ids, self.amount_cents, self.paid_days, self.methods = columns
+        self._json = (end, end + json_len)
+        self._text: Optional[dict] = None
+
+    def day_range(self, start: Optional[int] = None, end: Optional[int] = None) -> tuple[int, int]:
+        """Row range [lo, hi) with start <= paid_day < end (either bound may be None)."""
+        lo = 0 if start is None else bisect_left(self.paid_days, start)
+        hi = self.rows if end is None else bisect_left(self.paid_days, end, lo)
+        return lo, hi
+
+    @property
+    def text(self) -> dict:
+        if self._text is None:
+            self._text = json.loads(self._map[self._json[0]:self._json[1]])
+        return self._text
+
+    def record(self, i: int) -> tuple:
+        """Row i as a tuple in db.PAYMENT_COLUMNS order."""
+        text = self.text
+        code = self.methods[i]
+        return (
+            self.ids[i],
+            self.expense_ids[i],
+            self.amount_cents[i],
+            from_day_number(self.paid_days[i]).isoformat(),
+            None if code < 0 else text["methods"][code],
+            text["notes"][i],
+            text["created_at"][i],
+        )
+
+
+def write_segment(path: Path, rows: list[tuple]) -> None:
+    """Write rows (tuples in db.PAYMENT_COLUMNS order) as a segment file, synced to disk."""
+    keyed = sorted((day_number(r[3]), r[0], r) for r in rows)
+    rows = [r for _, _, r in keyed]
+    methods: dict[str, int] = {}
+    columns = [array("q") for _ in SEGMENT_COLUMNS]
+    for day, _, r in keyed:
+        columns[0].append(r[0])
+        columns[1].append(r[1])
+        columns[2].append(r[2])
+        columns[3].append(day)
+        columns[4].append(-1 if r[4] is None else methods.setdefault(r[4], len(methods)))
+    text = json.dumps(
+        {"methods": list(methods), "notes": [r[5] for r in rows], "created_at": [r[6] for r in rows]},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    order = b"L" if sys.byteorder == "little" else b"B"
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, order, len(rows), len(text)))
+        for column in columns:
+            column.tofile(f)
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Open segments by path. Files are never modified in place (a rewrite gets
+# a new name), so a path identifies its contents for the process lifetime.
+_segments: dict[Path, Segment] = {}
+
+
+def segments(db_path: str, *, years: Optional[range] = None) -> list[Segment]:
+    """The archived segments of db_path, oldest year first."""
+    with dbm.get_connection(db_path) as conn:
+        catalog = conn.execute("SELECT year, file FROM payment_archive ORDER BY year").fetchall()
+    directory = archive_dir(db_path)
+    result = []
+    for year, file in catalog:
+        if years is not None and year not in years:
+            continue
+        path = directory / file
+        segment = _segments.get(path)
+        if segment is None:
+            if not path.exists():
+                raise FileNotFoundError(f"Archived payments for {year} are missing: {path}")
+            segment = _segments[path] = Segment(path, year)
+        result.append(segment)
+    return result
+
+
+def archived_before(db_path: str) -> Optional[date]:
+    """First day after the newest archived year, or None if nothing is archived."""
+    with dbm.get_connection(db_path) as conn:
+        year = conn.execute("SELECT MAX(year) FROM payment_archive").fetchone()[0]
+    return None if year is None else date(year + 1, 1, 1)
+
+
+def archive_payments(db_path: str, *, before_year: int) -> list[dict]:
+    """Move every payment dated before January 1st of before_year into segments.
+
+    One segment per year; a year archived before is rewritten with its new
+    rows added. Segment files are written and synced first, then one
+    transaction registers them in payment_archive and deletes the payments
+    (and their monthly rollups), so a crash leaves at most an unused file.
+    Segments do not keep payment uuids or journal entries, so this raises
+    ValueError if any of the payments has changes a sync peer has not
+    received yet. Returns {year, rows, total_cents, file} per year written.
+    """
+    cutoff = date(before_year, 1, 1)
+    directory = archive_dir(db_path)
+    written: list[dict] = []
+    replaced: list[Path] = []
+    fields = ", ".join(dbm.PAYMENT_COLUMNS)
+    try:
+        with dbm.write_transaction(db_path) as conn:
+            first = conn.execute("SELECT MIN(paid_day) FROM payments WHERE paid_day < ?", (day_number(cutoff),))
+            first_day = first.fetchone()[0]
+            if first_day is None:
+                return []
+            unsynced = dbm.unsynced_payments_before(conn, cutoff)
+            if unsynced:
+                raise ValueError(
+                    f"{unsynced} payments dated before {before_year} have changes not yet synced to every peer; "
+                    "run `sync push` to each peer first"
+                )
+            directory.mkdir(exist_ok=True)
+            catalog = dict(conn.execute("SELECT year, file FROM payment_archive").fetchall())
+            for year in range(from_day_number(first_day).year, before_year):
+                cur = conn.cursor()
+                cur.row_factory = None
+                cur.execute(
+                    f"SELECT {fields} FROM payments WHERE paid_day >= ? AND paid_day < ?",
+                    (day_number(date(year, 1, 1)), day_number(date(year + 1, 1, 1))),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    continue
+                if year in catalog:
+                    old = Segment(directory / catalog[year], year)
+                    rows.extend(old.record(i) for i in range(old.rows))
+                    replaced.append(old.path)
+                file = f"payments-{year}-{os.urandom(4).hex()}.seg"
+                write_segment(directory / file, rows)
+                total = sum(r[2] for r in rows)
+                written.append({"year": year, "rows": len(rows), "total_cents": total, "file": file})
+                dbm.record_archive_segment(conn, year=year, file=file, row_count=len(rows), total_cents=total)
+            dbm.delete_payments_before(conn, cutoff)
+    except BaseException:
+        for w in written:
+            (directory / w["file"]).unlink(missing_ok=True)
+        raise
+    for path in replaced:
+        _segments.pop(path, None)
+        path.unlink(missing_ok=True)
+    return written
+
+
+def _year_segment(db_path: str, year: int) -> Optional[Segment]:
+    return next(iter(segments(db_path, years=range(year, year + 1))), None)
+
+
+def month_total(db_path: str, *, year: int, month: int) -> tuple[int, int]:
+    """(total_cents, payment_count) of archived payments in a month: a sum over one column slice."""
+    segment = _year_segment(db_path, year)
+    if segment is None:
+        return 0, 0
+    start, end = month_bounds(year, month)
+    lo, hi = segment.day_range(day_number(start), day_number(end))
+    return sum(segment.amount_cents[lo:hi]), hi - lo
+
+
+def year_total(db_path: str, year: int) -> tuple[int, int]:
+    """(total_cents, payment_count) of an archived year, summed straight off the column."""
+    segment = _year_segment(db_path, year)
+    if segment is None:
+        return 0, 0
+    return sum(segment.amount_cents), segment.rows
+
+
+def expense_totals(db_path: str, *, year: int, month: Optional[int] = None) -> dict[tuple[str, int], list[int]]:
+    """{(year_month, expense_id): [total_cents, payment_count]} of archived payments in a year or one month.
+
+    The same shape as payment_monthly_rollup, for queries that need totals
+    per expense (and so per currency) rather than one grand total.
+    """
+    segment = _year_segment(db_path, year)
+    if segment is None:
+        return {}
+    totals: dict[tuple[str, int], list[int]] = {}
+    for m in range(1, 13) if month is None else (month,):
+        start, end = month_bounds(year, m)
+        lo, hi = segment.day_range(day_number(start), day_number(end))
+        ym = f"{year:04d}-{m:02d}"
+        for expense_id, amount in zip(segment.expense_ids[lo:hi], segment.amount_cents[lo:hi]):
+            entry = totals.get((ym, expense_id))
+            if entry is None:
+                totals[ym, expense_id] = [amount, 1]
+            else:
+                entry[0] += amount
+                entry[1] += 1
+    return totals
+
+
+def iter_newest_first(
+    db_path: str,
+    *,
+    expense_id: Optional[int] = None,
+    start: Optional[int] = None,  # day number, inclusive
+    end: Optional[int] = None,  # day number, exclusive
+    after: Optional[tuple[int, int]] = None,  # (paid_day, id), exclusive
+) -> Iterator[tuple]:
+    """Archived payments newest first, by (paid_day, id) descending, as PAYMENT_COLUMNS tuples."""
+    for segment in reversed(segments(db_path)):
+        lo, hi = segment.day_range(start, end)
+        if after is not None:
+            # Rows are ascending by (paid_day, id): keep those before `after`.
+            cut = bisect_left(segment.paid_days, after[0], lo, hi)
+            while cut < hi and segment.paid_days[cut] == after[0] and segment.ids[cut] < after[1]:
+                cut += 1
+            hi = cut
+        expense_ids = segment.expense_ids
+        for i in range(hi - 1, lo - 1, -1):
+            if expense_id is None or expense_ids[i] == expense_id:
+                yield segment.record(i)
+
+
+def iter_by_id(db_path: str, *, since: Optional[str] = None) -> Iterator[dict]:
+    """Archived payments in id order as dicts, optionally only created after since."""
+
+    def rows(segment: Segment) -> Iterator[tuple]:
+        ids = segment.ids
+        created = segment.text["created_at"]
+        for i in sorted(range(segment.rows), key=ids.__getitem__):
+            if since is None or created[i] > since:
+                yield segment.record(i)
+
+    for r in heapq.merge(*(rows(s) for s in segments(db_path))):
+        yield dict(zip(dbm.PAYMENT_COLUMNS, r))
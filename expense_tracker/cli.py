@@ -1,26 +1,24 @@
 from __future__ import annotations
 
 import argparse
-import csv
+import os
+import sys
 from datetime import date, timedelta
-from decimal import Decimal, ROUND_HALF_UP
-from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from . import __version__
-from . import db as dbm
-from .recurrence import (
-    compute_next_due_date,
-    normalize_recurrence,
-    parse_date,
-    parse_yyyy_mm,
-)
+
+# Only argparse is imported up front: the cron/shell-hook case is dominated by
+# interpreter start-up, so each command imports the modules it needs (db,
+# recurrence, csv, gzip, ...) when it runs, and --help loads none of them.
 
 
 DEFAULT_DB = "expenses.db"
 
 
 def _amount_to_cents(amount_text: str) -> int:
+    from decimal import Decimal, ROUND_HALF_UP
+
     d = Decimal(amount_text).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
     return int(d * 100)
 
@@ -31,31 +29,100 @@ def _cents_to_amount(cents: int) -> str:
     return f"{sign}{cents // 100}.{cents % 100:02d}"
 
 
-def _print_rows(rows, *, fields: list[str]) -> None:
-    if not rows:
+# Rows the table renderer looks at to size its columns; later rows are
+# streamed straight to stdout and a longer value just widens its line.
+TABLE_SAMPLE_ROWS = 500
+
+
+def _print_table(rows, columns: list[tuple[str, Callable]]) -> int:
+    """Print rows as an aligned table; each column is (header, row -> str).
+
+    Rows are consumed lazily and only the first TABLE_SAMPLE_ROWS are held
+    (to size the columns), so any iterable of any length can be printed.
+    Returns the number of rows printed.
+    """
+    from itertools import islice
+
+    rows = iter(rows)
+    getters = [get for _, get in columns]
+    sample = [[get(r) for get in getters] for r in islice(rows, TABLE_SAMPLE_ROWS)]
+    if not sample:
         print("(none)")
-        return
-    widths = {f: max(len(f), max(len(str(r[f])) if r[f] is not None else 0 for r in rows)) for f in fields}
-    header = "  ".join(f.ljust(widths[f]) for f in fields)
-    print(header)
-    print("  ".join("-" * widths[f] for f in fields))
+        return 0
+    widths = [max(len(header), *(len(cells[i]) for cells in sample)) for i, (header, _) in enumerate(columns)]
+    write = sys.stdout.write
+    write("  ".join(header.ljust(w) for (header, _), w in zip(columns, widths)) + "\n")
+    write("  ".join("-" * w for w in widths) + "\n")
+    for cells in sample:
+        write("  ".join(c.ljust(w) for c, w in zip(cells, widths)) + "\n")
+    count = len(sample)
     for r in rows:
-        print("  ".join((str(r[f]) if r[f] is not None else "").ljust(widths[f]) for f in fields))
+        write("  ".join(get(r).ljust(w) for get, w in zip(getters, widths)) + "\n")
+        count += 1
+    return count
+
+
+def _text(field: str) -> Callable:
+    return lambda r: "" if r[field] is None else str(r[field])
+
 
+def _money(field: str = "amount_cents", currency: bool = False) -> Callable:
+    if currency:
+        return lambda r: f"{r['currency']} {_cents_to_amount(r[field])}"
+    return lambda r: _cents_to_amount(r[field])
+
+
+def _print_rows(rows, *, fields: list[str]) -> None:
+    _print_table(rows, [(f, _text(f)) for f in fields])
 
-def _resolve_db_path(arg: Optional[str]) -> str:
-    return str(Path(arg or DEFAULT_DB))
+
+def _resolve_db_path(paths: Optional[list[str]]) -> str:
+    """The single database a command works on (main has already expanded --db)."""
+    return paths[0] if paths else os.path.normpath(DEFAULT_DB)
+
+
+def _resolve_db_paths(values: Optional[list[str]]) -> list[str]:
+    """Expand --db values, which may repeat and may be glob patterns."""
+    if not values:
+        return [os.path.normpath(DEFAULT_DB)]
+    from .shards import resolve_paths
+
+    return resolve_paths(values, DEFAULT_DB)
+
+
+def _with_shard(columns: list[tuple[str, Callable]]) -> list[tuple[str, Callable]]:
+    """Columns for (path, row) pairs from shards.merge_sorted, led by the database path."""
+    return [("db", lambda item: item[0])] + [(header, lambda item, get=get: get(item[1])) for header, get in columns]
 
 
 def cmd_init(args: argparse.Namespace) -> None:
+    from . import db as dbm
+
     db_path = _resolve_db_path(args.db)
     dbm.init_db(db_path)
     print(f"Initialized database at {db_path}")
 
 
+def cmd_migrate(args: argparse.Namespace) -> None:
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    db = dbm.Database(db_path, auto_migrate=False)
+    try:
+        old, new = db.migrate()
+    finally:
+        db.close()
+    if old == new:
+        print(f"Database {db_path} is up to date (schema version {new})")
+    else:
+        print(f"Migrated {db_path} from schema version {old} to {new}")
+
+
 def cmd_add(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .recurrence import normalize_recurrence, parse_date
+
     db_path = _resolve_db_path(args.db)
-    dbm.init_db(db_path)
 
     recurrence = normalize_recurrence(args.recurrence)
     amount_cents = _amount_to_cents(args.amount)
@@ -80,163 +147,762 @@ def cmd_add(args: argparse.Namespace) -> None:
         next_due_date=next_due.isoformat() if next_due else None,
         notes=args.notes,
         active=True,
+        autopay=args.autopay,
     )
-    print(f"Added expense #{expense_id}: {args.name} {args.currency} {_cents_to_amount(amount_cents)} ({recurrence})")
+    autopay = ", autopay" if args.autopay else ""
+    print(f"Added expense #{expense_id}: {args.name} {args.currency} {_cents_to_amount(amount_cents)} ({recurrence}{autopay})")
 
 
 def cmd_list(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .profiling import phase
+
+    columns = [
+        ("id", _text("id")),
+        ("name", _text("name")),
+        ("amount", _money(currency=True)),
+        ("recurrence", _text("recurrence")),
+        ("next_due", _text("next_due_date")),
+        ("active", lambda r: "yes" if r["active"] else "no"),
+        ("autopay", lambda r: "yes" if r["autopay"] else ""),
+        ("category", _text("category")),
+    ]
+    include_inactive = args.all or args.inactive
+    if len(args.db) > 1:
+        from . import shards
+
+        with phase("query"):
+            results = shards.map_shards(args.db, dbm.list_expenses, include_inactive=include_inactive)
+        with phase("format"):
+            rows = shards.merge_sorted(
+                args.db, results, key=lambda r: (r["next_due_date"] or "9999-12-31", r["name"])
+            )
+            _print_table(rows, _with_shard(columns))
+        return
     db_path = _resolve_db_path(args.db)
-    rows = dbm.list_expenses(db_path, include_inactive=args.all or args.inactive)
+    with phase("query"):
+        rows = dbm.list_expenses(db_path, include_inactive=include_inactive)
+    with phase("format"):
+        _print_table(rows, columns)
+
+
+def cmd_search(args: argparse.Namespace) -> None:
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    rows = dbm.search_expenses(db_path, " ".join(args.query), limit=args.limit)
     out = []
     for r in rows:
         out.append({
             "id": r["id"],
             "name": r["name"],
             "amount": f"{r['currency']} {_cents_to_amount(r['amount_cents'])}",
-            "recurrence": r["recurrence"],
-            "next_due": r["next_due_date"] or "",
-            "active": "yes" if r["active"] else "no",
             "category": r["category"] or "",
+            "active": "yes" if r["active"] else "no",
+            "notes": r["notes"] or "",
         })
-    _print_rows(out, fields=["id", "name", "amount", "recurrence", "next_due", "active", "category"])
+    _print_rows(out, fields=["id", "name", "amount", "category", "active", "notes"])
 
 
 def cmd_upcoming(args: argparse.Namespace) -> None:
-    db_path = _resolve_db_path(args.db)
+    from . import db as dbm
+    from .profiling import phase
+
     cutoff = date.today() + timedelta(days=args.days)
-    rows = dbm.upcoming_expenses(db_path, until_date=cutoff.isoformat())
-    out = []
-    for r in rows:
-        out.append({
-            "id": r["id"],
-            "name": r["name"],
-            "due": r["next_due_date"],
-            "amount": f"{r['currency']} {_cents_to_amount(r['amount_cents'])}",
-            "recurrence": r["recurrence"],
-            "category": r["category"] or "",
-        })
-    _print_rows(out, fields=["id", "name", "due", "amount", "recurrence", "category"])
+    columns = [
+        ("id", _text("id")),
+        ("name", _text("name")),
+        ("due", _text("next_due_date")),
+        ("amount", _money(currency=True)),
+        ("recurrence", _text("recurrence")),
+        ("category", _text("category")),
+    ]
+    if len(args.db) > 1:
+        from . import shards
+
+        with phase("query"):
+            results = shards.map_shards(args.db, dbm.upcoming_expenses, until_date=cutoff.isoformat())
+        with phase("format"):
+            rows = shards.merge_sorted(args.db, results, key=lambda r: (r["next_due_date"], r["name"]))
+            _print_table(rows, _with_shard(columns))
+        return
+    db_path = _resolve_db_path(args.db)
+    with phase("query"):
+        rows = dbm.upcoming_expenses(db_path, until_date=cutoff.isoformat())
+    with phase("format"):
+        _print_table(rows, columns)
 
 
-def _find_expense(db_path: str, identifier: str):
+def _find_expense(db_path: str, identifier: str, *, closest: bool = False):
+    """The expense with this id or exact (case-insensitive) name, else None.
+
+    Search matches for the identifier are printed as suggestions. With
+    closest, a single search match is used instead; only read-only commands
+    pass it, since the match may come from another expense's category or notes.
+    """
+    from . import db as dbm
+
     if identifier.isdigit():
         row = dbm.get_expense_by_id(db_path, int(identifier))
         return dict(row) if row else None
     row = dbm.get_expense_by_name(db_path, identifier)
-    return dict(row) if row else None
+    if row:
+        return dict(row)
+    matches = dbm.search_expenses(db_path, identifier, limit=5)
+    if closest and len(matches) == 1:
+        print(f"Using closest match: #{matches[0]['id']} {matches[0]['name']}")
+        return dict(matches[0])
+    if matches:
+        print("Did you mean: " + ", ".join(f"#{m['id']} {m['name']}" for m in matches), file=sys.stderr)
+    return None
+
+
+def _require_expense(db_path: str, identifier: str) -> dict:
+    """_find_expense for commands that write: exact id or name only, exit 1 otherwise."""
+    row = _find_expense(db_path, identifier)
+    if row is None:
+        raise SystemExit(f"Expense not found: {identifier}")
+    return row
 
 
 def cmd_pay(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_date
+
     db_path = _resolve_db_path(args.db)
-    row = _find_expense(db_path, args.expense)
-    if not row:
-        print(f"Expense not found: {args.expense}")
-        return
+    row = _require_expense(db_path, args.expense)
 
-    amount_cents = _amount_to_cents(args.amount) if args.amount else int(row["amount_cents"])
-    paid_date = parse_date(args.date).isoformat() if args.date else date.today().isoformat()
+    with phase("query"):
+        result = dbm.pay_expense(
+            db_path,
+            int(row["id"]),
+            amount_cents=_amount_to_cents(args.amount) if args.amount else None,
+            paid_date=parse_date(args.date).isoformat() if args.date else date.today().isoformat(),
+            method=args.method,
+            notes=args.notes,
+        )
+    if result is None:
+        raise SystemExit(f"Expense not found: {args.expense}")
+    if not result["active"]:
+        print(f"Recorded payment #{result['payment_id']}. Deactivated one-off expense '{result['name']}'.")
+    else:
+        print(f"Recorded payment #{result['payment_id']}. Next due on {result['next_due_date']}.")
 
-    payment_id = dbm.record_payment(
-        db_path,
-        expense_id=int(row["id"]),
-        amount_cents=amount_cents,
-        paid_date=paid_date,
-        method=args.method,
-        notes=args.notes,
-    )
 
-    recurrence = row["recurrence"]
-    start = parse_date(row["start_date"]) if row["start_date"] else None
-    current_due = parse_date(row["next_due_date"]) if row["next_due_date"] else None
-    if recurrence == "none":
-        dbm.update_expense_next_due_and_active(db_path, int(row["id"]), next_due_date=None, active=False)
-        print(f"Recorded payment #{payment_id}. Deactivated one-off expense '{row['name']}'.")
+def cmd_pay_batch(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .recurrence import parse_date
+
+    db_path = _resolve_db_path(args.db)
+    paid_date = parse_date(args.date).isoformat() if args.date else date.today().isoformat()
+    if args.expenses:
+        ids = [int(_require_expense(db_path, identifier)["id"]) for identifier in args.expenses]
+        results = dbm.pay_expenses(db_path, expense_ids=ids, paid_date=paid_date, method=args.method, notes=args.notes)
+    elif args.all_due:
+        through = parse_date(args.through).isoformat() if args.through else date.today().isoformat()
+        results = dbm.pay_expenses(db_path, due_through=through, paid_date=paid_date, method=args.method, notes=args.notes)
     else:
-        next_due = compute_next_due_date(current_due, start, recurrence, from_date=parse_date(paid_date))
-        dbm.update_expense_next_due_and_active(db_path, int(row["id"]), next_due_date=next_due.isoformat(), active=True)
-        print(f"Recorded payment #{payment_id}. Next due on {next_due.isoformat()}.")
+        print("Nothing to pay: give expense ids/names or --all-due")
+        return
+    out = [
+        {
+            "id": r["expense_id"],
+            "name": r["name"],
+            "amount": _cents_to_amount(r["amount_cents"]),
+            "next_due": r["next_due_date"] if r["active"] else "(deactivated)",
+        }
+        for r in results
+    ]
+    _print_rows(out, fields=["id", "name", "amount", "next_due"])
+    print(f"Recorded {len(results)} payments dated {paid_date}.")
 
 
 def cmd_month(args: argparse.Namespace) -> None:
-    db_path = _resolve_db_path(args.db)
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_yyyy_mm
+
     if args.month:
         year, month = parse_yyyy_mm(args.month)
     else:
         today = date.today()
         year, month = today.year, today.month
-    summary = dbm.monthly_payment_summary(db_path, year=year, month=month)
-    total = _cents_to_amount(summary["total_cents"])
-    print(f"Payments in {year:04d}-{month:02d}: {total} across {summary['count']} payments")
+    base = args.base.upper() if args.base else None
+    with phase("query"):
+        if len(args.db) > 1:
+            from . import shards
+
+            by_currency = shards.merge_currency_summaries(
+                shards.map_shards(args.db, dbm.monthly_currency_summary, year=year, month=month, base=base)
+            )
+        else:
+            by_currency = dbm.monthly_currency_summary(_resolve_db_path(args.db), year=year, month=month, base=base)
+    label = f"{year:04d}-{month:02d}"
+    if base:
+        converted = [r for r in by_currency if r["rate"] is not None]
+        if args.by_currency:
+            _print_table(by_currency, [
+                ("currency", _text("currency")),
+                ("total", _money("total_cents")),
+                ("count", _text("count")),
+                ("rate", lambda r: "" if r["rate"] is None else f"{r['rate']:.6g}"),
+                (base, lambda r: "" if r["rate"] is None else _cents_to_amount(r["converted_cents"])),
+            ])
+        total = _cents_to_amount(sum(r["converted_cents"] for r in converted))
+        count = sum(r["count"] for r in converted)
+        print(f"Payments in {label}: {base} {total} across {count} payments (month-end rates)")
+        missing = [r["currency"] for r in by_currency if r["rate"] is None]
+        if missing:
+            print(f"No {base} rate for {', '.join(missing)}; those payments are not in the total (see 'import-fx')")
+        return
+    if len(by_currency) > 1 or args.by_currency:
+        print(f"Payments in {label} by currency:")
+        _print_table(by_currency, [
+            ("currency", _text("currency")),
+            ("total", _money("total_cents")),
+            ("count", _text("count")),
+        ])
+        if len(by_currency) > 1:
+            print("Amounts are in different currencies; use --base CUR to convert them to one.")
+        return
+    total_cents = by_currency[0]["total_cents"] if by_currency else 0
+    count = by_currency[0]["count"] if by_currency else 0
+    print(f"Payments in {label}: {_cents_to_amount(total_cents)} across {count} payments")
+
+
+def cmd_report(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_yyyy_mm
+
+    db_path = _resolve_db_path(args.db)
+    month = None
+    if args.month:
+        year, month = parse_yyyy_mm(args.month)
+    else:
+        year = args.year or date.today().year
+    with phase("query"):
+        rows = dbm.payment_report(db_path, year=year, by=args.by, month=month)
+    with phase("format"):
+        print(f"Payments by {args.by}, {args.month or year}")
+
+        def delta(r) -> str:
+            cents = r["mom_delta_cents"]
+            return ("+" if cents > 0 else "") + _cents_to_amount(cents)
+
+        _print_table(rows, [
+            ("month", _text("month")),
+            (args.by, lambda r: r["label"] or "(none)"),
+            ("currency", _text("currency")),
+            ("total", _money("total_cents")),
+            ("count", _text("payment_count")),
+            ("average", _money("avg_cents")),
+            ("vs prev", delta),
+            ("ytd", _money("ytd_cents")),
+        ])
+
+
+def cmd_reconcile(args: argparse.Namespace) -> None:
+    import time
+    from itertools import islice
+
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_date
+    from .reconcile import reconcile
+
+    db_path = _resolve_db_path(args.db)
+    as_of = parse_date(args.as_of) if args.as_of else date.today()
+    started = time.perf_counter()
+    with phase("recurrence"):
+        result = reconcile(db_path, as_of=as_of, early=args.early, grace=args.grace)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Reconciled {result.expenses} expenses as of {as_of.isoformat()}: "
+        f"{result.expected} expected payments, {result.payments} recorded ({elapsed:.2f}s)"
+    )
+    print(f"Missed: {len(result.missed)}  Late: {len(result.late)}  Duplicate: {len(result.duplicates)}")
+    if result.undated:
+        print(f"Ignored {result.undated} payments whose paid_date is not a YYYY-MM-DD date")
+    names: dict[int, str] = {}
+
+    def name(expense_id: int) -> str:
+        if expense_id not in names:
+            row = dbm.get_expense_by_id(db_path, expense_id)
+            names[expense_id] = row["name"] if row else "?"
+        return names[expense_id]
+
+    with phase("format"):
+        if len(result.missed) and args.kind in (None, "missed"):
+            print("\nMissed payments")
+            rows = zip(result.missed.expense_ids, result.missed.dates(), result.missed.amount_cents)
+            _print_table(islice(rows, args.limit), [
+                ("expense_id", lambda r: str(r[0])),
+                ("name", lambda r: name(r[0])),
+                ("due", lambda r: r[1].isoformat()),
+                ("amount", lambda r: _cents_to_amount(r[2])),
+            ])
+        if result.late and args.kind in (None, "late"):
+            print("\nLate payments")
+            _print_table(islice(result.late, args.limit), [
+                ("payment_id", lambda f: str(f.payment_id)),
+                ("name", lambda f: name(f.expense_id)),
+                ("due", lambda f: f.due_date.isoformat()),
+                ("paid", lambda f: f.paid_date.isoformat()),
+                ("days_late", lambda f: str(f.days_late)),
+            ])
+        if result.duplicates and args.kind in (None, "duplicate"):
+            print("\nDuplicate payments (nothing left to settle)")
+            _print_table(islice(result.duplicates, args.limit), [
+                ("payment_id", lambda f: str(f.payment_id)),
+                ("name", lambda f: name(f.expense_id)),
+                ("paid", lambda f: f.paid_date.isoformat()),
+            ])
+
+
+def cmd_autopay_run(args: argparse.Namespace) -> None:
+    from itertools import islice
+
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_date
+
+    db_path = _resolve_db_path(args.db)
+    through = parse_date(args.through).isoformat() if args.through else date.today().isoformat()
+    with phase("query"):
+        results = dbm.run_autopay(db_path, through=through, method=args.method, notes=args.notes)
+    with phase("format"):
+        _print_table(islice(results, args.limit), [
+            ("id", _text("expense_id")),
+            ("name", _text("name")),
+            ("payments", _text("payments")),
+            ("from", _text("first_due")),
+            ("amount", _money(currency=True)),
+            ("next_due", lambda r: r["next_due_date"] if r["active"] else "(deactivated)"),
+        ])
+    if len(results) > args.limit:
+        print(f"... and {len(results) - args.limit} more")
+    count = sum(r["payments"] for r in results)
+    print(f"Posted {count} autopay payments for {len(results)} expenses through {through}.")
+
+
+def cmd_autopay_set(args: argparse.Namespace) -> None:
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    rows = [_require_expense(db_path, identifier) for identifier in args.expenses]
+    for row in rows:
+        dbm.set_expense_autopay(db_path, int(row["id"]), args.autopay)
+    state = "on" if args.autopay else "off"
+    print(f"Autopay {state} for " + ", ".join(f"#{r['id']} {r['name']}" for r in rows))
+
+
+def cmd_archive(args: argparse.Namespace) -> None:
+    from . import archive
+    from . import db as dbm
+    from .profiling import phase
+
+    db_path = _resolve_db_path(args.db)
+    if args.before is not None:
+        if args.before > date.today().year:
+            raise SystemExit("archive: --before must not be after the current year (only closed years are archived)")
+        try:
+            with phase("archive"):
+                written = archive.archive_payments(db_path, before_year=args.before)
+        except ValueError as exc:
+            raise SystemExit(f"archive: {exc}")
+        count = sum(w["rows"] for w in written)
+        print(f"Archived {count} payments dated before {args.before} into {len(written)} segments in {archive.archive_dir(db_path)}")
+        if args.vacuum:
+            size = os.path.getsize(db_path)
+            with phase("vacuum"):
+                dbm.vacuum(db_path)
+            print(f"Vacuumed {db_path}: {size // 1024} KiB -> {os.path.getsize(db_path) // 1024} KiB")
+    if args.list or args.before is None:
+        with phase("query"):
+            segments = archive.segments(db_path)
+        with phase("format"):
+            _print_table(segments, [
+                ("year", lambda s: str(s.year)),
+                ("payments", lambda s: str(s.rows)),
+                ("total", lambda s: _cents_to_amount(archive.year_total(db_path, s.year)[0])),
+                ("KiB", lambda s: str(s.path.stat().st_size // 1024)),
+                ("file", lambda s: s.path.name),
+            ])
+
+
+def cmd_rebuild_rollups(args: argparse.Namespace) -> None:
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    count = dbm.rebuild_rollups(db_path)
+    print(f"Rebuilt monthly rollups: {count} rows")
+
+
+def cmd_forecast(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .forecast import build_forecast
+    from .profiling import phase
+    from .recurrence import add_months, parse_date
+
+    db_path = _resolve_db_path(args.db)
+    start = parse_date(args.start) if args.start else date.today()
+    end = add_months(start, args.months) - timedelta(days=1)
+    convert = None
+    if args.base:
+        from .fx import Converter
+
+        # Future amounts are converted at the latest rate known on the first day.
+        converter = Converter(db_path)
+
+        def convert_to_base(cents: int, currency: str) -> int:
+            return converter.convert(cents, currency, args.base, start)
+
+        convert = convert_to_base
+    with phase("query"):
+        rows = dbm.list_expenses(db_path)
+    with phase("recurrence"):
+        try:
+            forecast = build_forecast(rows, start, end, convert=convert)
+        except LookupError as exc:
+            print(exc)
+            return
+        month_totals = forecast.totals_by_month()
+        category_totals = forecast.totals_by_category()
+    with phase("format"):
+        print(f"Forecast {start.isoformat()} to {end.isoformat()}" + (f" in {args.base.upper()}" if args.base else ""))
+        by_month = [
+            {"month": m, "total": _cents_to_amount(total), "count": count}
+            for m, (total, count) in month_totals.items()
+        ]
+        _print_rows(by_month, fields=["month", "total", "count"])
+        print()
+        by_category = [
+            {"category": c or "(none)", "total": _cents_to_amount(total), "count": count}
+            for c, (total, count) in category_totals.items()
+        ]
+        _print_rows(by_category, fields=["category", "total", "count"])
+
+
+def _parse_after(text: str) -> tuple[str, int]:
+    from .recurrence import parse_date
+
+    paid_date, _, payment_id = text.rpartition(":")
+    if not paid_date or not payment_id.isdigit():
+        raise SystemExit(f"--after expects PAID_DATE:ID, e.g. 2025-01-31:1234 (got {text!r})")
+    return parse_date(paid_date).isoformat(), int(payment_id)
 
 
 def cmd_payments(args: argparse.Namespace) -> None:
+    from itertools import chain, islice
+
+    from . import db as dbm
+    from .profiling import phase
+    from .recurrence import parse_date
+
+    filters = dict(
+        year_month=args.month,
+        date_from=parse_date(args.date_from).isoformat() if args.date_from else None,
+        date_to=parse_date(args.date_to).isoformat() if args.date_to else None,
+    )
+    columns = [
+        ("id", _text("id")),
+        ("expense_id", _text("expense_id")),
+        ("paid_date", _text("paid_date")),
+        ("amount", _money()),
+        ("method", _text("method")),
+    ]
+    if len(args.db) > 1:
+        _print_sharded_payments(args, filters, columns)
+        return
+
     db_path = _resolve_db_path(args.db)
     expense_id: Optional[int] = int(args.id) if args.id else None
     if args.name and not expense_id:
-        row = dbm.get_expense_by_name(db_path, args.name)
-        if row:
-            expense_id = int(row["id"])
-    rows = dbm.list_payments(db_path, expense_id=expense_id, year_month=args.month)
-    out = []
+        row = _find_expense(db_path, args.name, closest=True)
+        if not row:
+            raise SystemExit(f"Expense not found: {args.name}")
+        expense_id = int(row["id"])
+    filters["expense_id"] = expense_id
+    page_size = min(args.limit, dbm.DEFAULT_FETCH_SIZE) if args.limit else dbm.DEFAULT_FETCH_SIZE
+    pages = dbm.iter_payment_pages(
+        db_path,
+        page_size=page_size,
+        offset=args.offset,
+        after=_parse_after(args.after) if args.after else None,
+        **filters,
+    )
+    rows = chain.from_iterable(pages)
+    if args.limit:
+        rows = islice(rows, args.limit)
+    last = None
+
+    def track(records):
+        nonlocal last
+        for last in records:
+            yield last
+
+    with phase("format"):
+        _print_table(track(rows), columns)
+    if args.limit and last is not None:
+        key = (last["paid_date"], last["id"])
+        if len(dbm.list_payments(db_path, limit=1, after=key, **filters)):
+            print(f"-- more: --after {key[0]}:{key[1]}")
+
+
+def _print_sharded_payments(args: argparse.Namespace, filters: dict, columns: list[tuple[str, Callable]]) -> None:
+    """payments over several databases, newest first across all of them.
+
+    Expense and payment ids are per database, so --id/--name and the
+    --after/--offset paging cursor only make sense for one database.
+    """
+    from itertools import chain, islice
+
+    from . import db as dbm
+    from . import shards
+    from .profiling import phase
+
+    for option, value in (("--id", args.id), ("--name", args.name), ("--after", args.after), ("--offset", args.offset)):
+        if value:
+            raise SystemExit(f"payments: {option} needs a single --db (expense and payment ids are per database)")
+    if args.limit:
+        # Each shard contributes at most --limit rows, fetched in parallel.
+        with phase("query"):
+            results = shards.map_shards(args.db, dbm.list_payments, limit=args.limit, **filters)
+    else:
+        # Unbounded: stream every shard page by page and merge lazily.
+        results = [
+            chain.from_iterable(dbm.iter_payment_pages(path, page_size=dbm.DEFAULT_FETCH_SIZE, **filters))
+            for path in args.db
+        ]
+    rows = shards.merge_sorted(args.db, results, key=lambda r: (r["paid_date"], r["id"]), reverse=True)
+    if args.limit:
+        rows = islice(rows, args.limit)
+    with phase("format"):
+        _print_table(rows, _with_shard(columns))
+
+
+def _open_export(file, compress: bool):
+    import gzip
+
+    if compress:
+        return gzip.open(file, "wt", newline="", encoding="utf-8")
+    return file.open("w", newline="", encoding="utf-8")
+
+
+def _write_rows(f, rows, fields: list[str], fmt: str) -> int:
+    import csv
+    import json
+
+    count = 0
+    if fmt == "jsonl":
+        for r in rows:
+            f.write(json.dumps({k: r[k] for k in fields}) + "\n")
+            count += 1
+        return count
+    writer = csv.writer(f)
+    writer.writerow(fields)
     for r in rows:
-        out.append({
-            "id": r["id"],
-            "expense_id": r["expense_id"],
-            "paid_date": r["paid_date"],
-            "amount": _cents_to_amount(r["amount_cents"]),
-            "method": r["method"] or "",
-        })
-    _print_rows(out, fields=["id", "expense_id", "paid_date", "amount", "method"])
+        writer.writerow([r[k] for k in fields])
+        count += 1
+    return count
 
 
 def cmd_export(args: argparse.Namespace) -> None:
+    from pathlib import Path
+
+    from . import db as dbm
+
     db_path = _resolve_db_path(args.db)
     output = Path(args.output)
     output.parent.mkdir(parents=True, exist_ok=True)
     table = args.table
+    ext = (".jsonl" if args.format == "jsonl" else ".csv") + (".gz" if args.gzip else "")
+    # "out.csv.gz" -> "out", so table=all writes out_expenses.csv.gz and out_payments.csv.gz
+    base = output.name[: -len(".gz")] if output.name.endswith(".gz") else output.name
+    base = Path(base).stem
 
-    def write_csv(file: Path, rows, fields: list[str]) -> None:
-        with file.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(fields)
-            for r in rows:
-                writer.writerow([r[f] for f in fields])
+    def target(name: str) -> Path:
+        return output if table == name else output.with_name(f"{base}_{name}{ext}")
 
     if table in ("expenses", "all"):
-        rows = dbm.list_expenses(db_path, include_inactive=True)
-        fields = [
-            "id",
-            "name",
-            "amount_cents",
-            "currency",
-            "category",
-            "recurrence",
-            "start_date",
-            "next_due_date",
-            "notes",
-            "active",
-            "created_at",
-            "updated_at",
-        ]
-        write_csv(output if table == "expenses" else output.with_name(output.stem + "_expenses.csv"), rows, fields)
+        rows = dbm.iter_expenses(db_path, since=args.since)
+        with _open_export(target("expenses"), args.gzip) as f:
+            count = _write_rows(f, rows, list(dbm.EXPENSE_COLUMNS), args.format)
+        print(f"Exported {count} expenses to {target('expenses')}")
 
     if table in ("payments", "all"):
-        rows = dbm.list_payments(db_path)
-        fields = ["id", "expense_id", "amount_cents", "paid_date", "method", "notes", "created_at"]
-        write_csv(output if table == "payments" else output.with_name(output.stem + "_payments.csv"), rows, fields)
+        rows = dbm.iter_payments(db_path, since=args.since)
+        with _open_export(target("payments"), args.gzip) as f:
+            count = _write_rows(f, rows, list(dbm.PAYMENT_COLUMNS), args.format)
+        print(f"Exported {count} payments to {target('payments')}")
+
+
+def cmd_import(args: argparse.Namespace) -> None:
+    import csv
+    import sqlite3
+    import time
+    from pathlib import Path
+
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    source = Path(args.input)
+    table = args.table
+    if table == "all":
+        files = [
+            ("expenses", source.with_name(source.stem + "_expenses.csv")),
+            ("payments", source.with_name(source.stem + "_payments.csv")),
+        ]
+    else:
+        files = [(table, source)]
+    # Expenses go first so payments can reference them.
+    inserters = {"expenses": dbm.bulk_insert_expenses, "payments": dbm.bulk_insert_payments}
+    for name, file in files:
+        if not file.exists():
+            print(f"File not found: {file}")
+            return
+        started = time.perf_counter()
+        with file.open(newline="", encoding="utf-8") as f:
+            try:
+                count = inserters[name](
+                    db_path, csv.DictReader(f), batch_size=args.batch_size or dbm.DEFAULT_BATCH_SIZE
+                )
+            except (sqlite3.IntegrityError, KeyError, ValueError) as exc:
+                print(f"Import of {file} failed, nothing imported from it: {exc}")
+                return
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else float(count)
+        print(f"Imported {count} {name} from {file} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
 
-    print(f"Exported {table} to {output if table != 'all' else output.with_name(output.stem + '_{expenses,payments}.csv')}")
+
+def cmd_import_fx(args: argparse.Namespace) -> None:
+    import csv
+    import sqlite3
+    from pathlib import Path
+
+    from . import db as dbm
+
+    db_path = _resolve_db_path(args.db)
+    source = Path(args.input)
+    if not source.exists():
+        print(f"File not found: {source}")
+        return
+    with source.open(newline="", encoding="utf-8") as f:
+        try:
+            count = dbm.import_fx_rates(db_path, csv.DictReader(f))
+        except (sqlite3.IntegrityError, KeyError, ValueError) as exc:
+            print(f"Import of {source} failed, no rates imported: {exc}")
+            return
+    print(f"Imported {count} exchange rates from {source}")
+
+
+def cmd_serve(args: argparse.Namespace) -> None:
+    import asyncio
+
+    from .server import serve
+
+    db_path = _resolve_db_path(args.db)
+    try:
+        asyncio.run(
+            serve(
+                db_path,
+                host=args.host,
+                port=args.port,
+                unix_socket=args.socket,
+                workers=args.workers,
+                ready=lambda address: print(f"Serving {db_path} on {address}", flush=True),
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_remind(args: argparse.Namespace) -> None:
+    import asyncio
+    from datetime import time
+
+    from .remind import make_sink, run_reminders
+
+    db_path = _resolve_db_path(args.db)
+    try:
+        sink = make_sink(args.sink)
+        at = time.fromisoformat(args.at)
+    except ValueError as exc:
+        raise SystemExit(f"remind: {exc}")
+    try:
+        sent = asyncio.run(
+            run_reminders(db_path, sink, lead_days=args.days, at=at, poll_seconds=args.poll, once=args.once)
+        )
+    except KeyboardInterrupt:
+        return
+    print(f"Sent {sent} reminders.", file=sys.stderr)
+
+
+def cmd_sync(args: argparse.Namespace) -> None:
+    from . import db as dbm
+    from .profiling import phase
+    from .sync import sync
+
+    db_path = _resolve_db_path(args.db)
+    if args.sync_cmd == "new-id":
+        print(f"{db_path} is now sync node {dbm.reset_node_id(db_path)}")
+        return
+    if not os.path.exists(args.peer):
+        raise SystemExit(f"sync: no database at {args.peer}")
+    if os.path.samefile(args.peer, db_path):
+        raise SystemExit("sync: --peer is the same database as --db")
+    source, target = (args.peer, db_path) if args.sync_cmd == "pull" else (db_path, args.peer)
+    try:
+        with phase("sync"):
+            result = sync(source, target)
+    except ValueError as exc:
+        raise SystemExit(f"sync: {exc}")
+    if not result.changes:
+        print(f"No new changes from {source} for {target}.")
+        return
+    print(
+        f"Applied {result.changes} changes from {source} (journal {result.first_seq + 1}-{result.last_seq}) to {target}: "
+        f"{result.expenses_added} expenses added, {result.expenses_updated} updated, "
+        f"{result.payments_added} payments added, {result.deleted} rows deleted, "
+        f"{result.kept} newer local changes kept"
+    )
 
 
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="expense-tracker", description="Expense tracker CLI")
-    p.add_argument("--db", help="Path to SQLite database file (default: expenses.db)")
+    p.add_argument(
+        "--db",
+        action="append",
+        metavar="PATH",
+        help="SQLite database file (default: expenses.db). Repeat it or use a glob such as 'ledgers/*.db' "
+        "to run list, upcoming, month or payments across several databases",
+    )
+    p.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-phase and per-query timings to stderr after the command",
+    )
+    p.add_argument(
+        "--profile-output",
+        help="Write profiling data to this file: cProfile stats if it ends in .prof/.pstats, JSON otherwise",
+    )
+    p.add_argument("--trace-sql", action="store_true", help="Echo every SQL statement to stderr as it runs")
+    p.add_argument(
+        "--db-profile",
+        metavar="NAME",
+        help="SQLite PRAGMA profile: default, durable, bulk or legacy (default: $EXPENSE_TRACKER_DB_PROFILE or 'default')",
+    )
 
     sub = p.add_subparsers(dest="cmd", required=True)
 
     sp = sub.add_parser("init", help="Initialize the database")
     sp.set_defaults(func=cmd_init)
 
+    sp = sub.add_parser("migrate", help="Upgrade the database schema to the current version")
+    sp.set_defaults(func=cmd_migrate)
+
     sp = sub.add_parser("add", help="Add a new expense/subscription/bill")
     sp.add_argument("name", help="Name of the expense")
     sp.add_argument("amount", help="Amount, e.g. 12.34")
@@ -246,16 +912,22 @@ def build_parser() -> argparse.ArgumentParser:
     sp.add_argument("--start", help="Start date YYYY-MM-DD")
     sp.add_argument("--next", help="Next due date YYYY-MM-DD (override)")
     sp.add_argument("--notes", help="Notes")
+    sp.add_argument("--autopay", action="store_true", help="Paid automatically; 'autopay run' records its payments")
     sp.set_defaults(func=cmd_add)
 
     sp = sub.add_parser("list", help="List expenses")
     sp.add_argument("--all", action="store_true", help="Include inactive expenses")
     sp.add_argument("--inactive", action="store_true", help="Only inactive expenses")
-    sp.set_defaults(func=cmd_list)
+    sp.set_defaults(func=cmd_list, sharded=True)
+
+    sp = sub.add_parser("search", help="Search expenses by name, category or notes")
+    sp.add_argument("query", nargs="+", help="Words to match (prefixes allowed)")
+    sp.add_argument("--limit", type=int, default=10, help="Maximum results (default 10)")
+    sp.set_defaults(func=cmd_search)
 
     sp = sub.add_parser("upcoming", help="Show upcoming due expenses")
     sp.add_argument("--days", type=int, default=30, help="Days ahead to include (default 30)")
-    sp.set_defaults(func=cmd_upcoming)
+    sp.set_defaults(func=cmd_upcoming, sharded=True)
 
     sp = sub.add_parser("pay", help="Record a payment for an expense")
     sp.add_argument("expense", help="Expense id or name")
@@ -265,26 +937,178 @@ def build_parser() -> argparse.ArgumentParser:
     sp.add_argument("--notes", help="Notes")
     sp.set_defaults(func=cmd_pay)
 
+    sp = sub.add_parser("pay-batch", help="Record payments for many expenses in one transaction")
+    sp.add_argument("expenses", nargs="*", help="Expense ids or names")
+    sp.add_argument("--all-due", action="store_true", help="Pay every active expense that is due")
+    sp.add_argument("--through", help="With --all-due, include expenses due on or before YYYY-MM-DD (default today)")
+    sp.add_argument("--date", help="Payment date YYYY-MM-DD (default today)")
+    sp.add_argument("--method", help="Payment method (note)")
+    sp.add_argument("--notes", help="Notes")
+    sp.set_defaults(func=cmd_pay_batch)
+
     sp = sub.add_parser("month", help="Show payment summary for a month")
     sp.add_argument("--month", help="YYYY-MM (default current month)")
-    sp.set_defaults(func=cmd_month)
+    sp.add_argument("--base", help="Convert every currency to this one at month-end rates (see import-fx)")
+    sp.add_argument("--by-currency", action="store_true", help="Show a row per currency")
+    sp.set_defaults(func=cmd_month, sharded=True)
+
+    sp = sub.add_parser("report", help="Totals, averages, month-over-month change and YTD per category or expense")
+    sp.add_argument("--year", type=int, help="Calendar year (default current year)")
+    sp.add_argument("--month", help="Only show YYYY-MM (deltas and YTD still count earlier months of its year)")
+    sp.add_argument("--by", choices=["category", "expense"], default="category", help="Group rows by (default category)")
+    sp.set_defaults(func=cmd_report)
+
+    sp = sub.add_parser("reconcile", help="Find missed, late and duplicate payments")
+    sp.add_argument("--as-of", help="Check occurrences due up to YYYY-MM-DD (default today)")
+    sp.add_argument("--grace", type=int, default=3, help="Days after the due date before a payment is late (default 3)")
+    sp.add_argument("--early", type=int, default=5, help="Days before the due date a payment may be made (default 5)")
+    sp.add_argument("--kind", choices=["missed", "late", "duplicate"], help="Only list this kind of finding")
+    sp.add_argument("--limit", type=int, default=20, help="Rows to list per kind (default 20)")
+    sp.set_defaults(func=cmd_reconcile)
+
+    sp = sub.add_parser("autopay", help="Record payments of auto-debited expenses in bulk")
+    autopay = sp.add_subparsers(dest="autopay_cmd", required=True)
+    asp = autopay.add_parser("run", help="Pay every autopay occurrence due up to a date in one transaction")
+    asp.add_argument("--through", help="Pay occurrences due on or before YYYY-MM-DD (default today)")
+    asp.add_argument("--method", default="autopay", help="Payment method to record (default autopay)")
+    asp.add_argument("--notes", help="Notes for every payment")
+    asp.add_argument("--limit", type=int, default=20, help="Expenses to list (default 20)")
+    asp.set_defaults(func=cmd_autopay_run)
+    for state, help_text in (("on", "Mark expenses as auto-debited"), ("off", "Stop paying expenses automatically")):
+        asp = autopay.add_parser(state, help=help_text)
+        asp.add_argument("expenses", nargs="+", help="Expense ids or names")
+        asp.set_defaults(func=cmd_autopay_set, autopay=state == "on")
+
+    sp = sub.add_parser("archive", help="Move payments of closed years into read-only columnar files")
+    sp.add_argument("--before", type=int, metavar="YYYY", help="Archive payments dated before January 1st of this year")
+    sp.add_argument("--vacuum", action="store_true", help="Shrink the database file afterwards (rewrites it)")
+    sp.add_argument("--list", action="store_true", help="List archived years (the default without --before)")
+    sp.set_defaults(func=cmd_archive)
+
+    sp = sub.add_parser("remind", help="Send due-date reminders as expenses come due (runs until interrupted)")
+    sp.add_argument("--days", type=int, default=3, help="Remind this many days before the due date (default 3)")
+    sp.add_argument("--at", default="09:00", help="Local time of day reminders go out, HH:MM (default 09:00)")
+    sp.add_argument(
+        "--sink",
+        default="stdout",
+        help="Where reminders go: stdout, file:PATH (JSON lines) or webhook:URL (JSON POST) (default stdout)",
+    )
+    sp.add_argument("--poll", type=float, default=5.0, help="Seconds between checks for changed expenses (default 5)")
+    sp.add_argument("--once", action="store_true", help="Send the reminders due now and exit (for cron)")
+    sp.set_defaults(func=cmd_remind)
+
+    sp = sub.add_parser("sync", help="Exchange changes with another copy of the database")
+    sync = sp.add_subparsers(dest="sync_cmd", required=True)
+    for direction, help_text in (
+        ("pull", "Apply the peer's changes that this database has not seen yet"),
+        ("push", "Apply this database's changes that the peer has not seen yet"),
+    ):
+        ssp = sync.add_parser(direction, help=help_text)
+        ssp.add_argument("--peer", required=True, metavar="PATH", help="The other database file")
+        ssp.set_defaults(func=cmd_sync)
+    ssp = sync.add_parser("new-id", help="Give this database a new node id (run on a freshly copied file)")
+    ssp.set_defaults(func=cmd_sync)
+
+    sp = sub.add_parser("rebuild-rollups", help="Recompute the monthly payment rollup table")
+    sp.set_defaults(func=cmd_rebuild_rollups)
+
+    sp = sub.add_parser("forecast", help="Project amounts due per month and category")
+    sp.add_argument("--months", type=int, default=12, help="Months ahead to include (default 12)")
+    sp.add_argument("--start", help="First day of the window YYYY-MM-DD (default today)")
+    sp.add_argument("--base", help="Convert amounts to this currency at the rate on the first day (see import-fx)")
+    sp.set_defaults(func=cmd_forecast)
 
     sp = sub.add_parser("payments", help="List payments")
     sp.add_argument("--month", help="YYYY-MM to filter")
+    sp.add_argument("--from", dest="date_from", help="Only payments on or after YYYY-MM-DD")
+    sp.add_argument("--to", dest="date_to", help="Only payments on or before YYYY-MM-DD")
     sp.add_argument("--id", help="Filter by expense id")
     sp.add_argument("--name", help="Filter by expense name")
-    sp.set_defaults(func=cmd_payments)
+    sp.add_argument("--limit", type=int, help="Show at most N payments")
+    sp.add_argument("--offset", type=int, default=0, help="Skip the first N payments")
+    sp.add_argument("--after", metavar="PAID_DATE:ID", help="Start after this payment (keyset paging; see the '-- more' hint)")
+    sp.set_defaults(func=cmd_payments, sharded=True)
 
-    sp = sub.add_parser("export", help="Export to CSV")
-    sp.add_argument("output", help="Output CSV path (basename if table=all)")
+    sp = sub.add_parser("export", help="Export to CSV or JSON Lines")
+    sp.add_argument("output", help="Output path (basename if table=all)")
     sp.add_argument("--table", choices=["expenses", "payments", "all"], default="all")
+    sp.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Output format (default csv)")
+    sp.add_argument("--gzip", action="store_true", help="Compress output with gzip")
+    sp.add_argument(
+        "--since",
+        help="Only rows changed after this timestamp (expenses: updated_at, payments: created_at)",
+    )
     sp.set_defaults(func=cmd_export)
 
+    sp = sub.add_parser("import", help="Import from CSV (same layout as export)")
+    sp.add_argument("input", help="Input CSV path (basename if table=all)")
+    sp.add_argument("--table", choices=["expenses", "payments", "all"], default="all")
+    sp.add_argument(
+        "--batch-size",
+        type=int,
+        help="Rows per insert batch (default 5000)",
+    )
+    sp.set_defaults(func=cmd_import)
+
+    sp = sub.add_parser("import-fx", help="Import exchange rates from CSV (date,base,quote,rate)")
+    sp.add_argument("input", help="CSV with a header row: date,base,quote,rate (1 base = rate quote)")
+    sp.set_defaults(func=cmd_import_fx)
+
+    sp = sub.add_parser("serve", help="Run a local HTTP JSON API with warm connections and caches")
+    sp.add_argument("--host", default="127.0.0.1", help="Address to bind (default 127.0.0.1)")
+    sp.add_argument("--port", type=int, default=8765, help="TCP port (default 8765; 0 picks a free port)")
+    sp.add_argument("--socket", help="Listen on this unix socket path instead of TCP")
+    sp.add_argument("--workers", type=int, default=4, help="Database worker threads (default 4)")
+    sp.set_defaults(func=cmd_serve)
+
     return p
 
 
 def main(argv: Optional[list[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
-    args.func(args)
+    try:
+        args.db = _resolve_db_paths(args.db)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if len(args.db) > 1 and not getattr(args, "sharded", False):
+        parser.error(f"{args.cmd} works on one database at a time; --db gave {len(args.db)}")
+    from . import db as dbm
+
+    if args.db_profile:
+        try:
+            dbm.set_default_profile(args.db_profile)
+        except ValueError as exc:
+            parser.error(str(exc))
+    if not (args.profile or args.profile_output or args.trace_sql):
+        try:
+            args.func(args)
+        finally:
+            dbm.close_all()
+        return 0
+
+    import cProfile
+    import json
+    from pathlib import Path
+
+    from . import profiling
+
+    profiler = profiling.enable(trace_sql=args.trace_sql)
+    output = Path(args.profile_output) if args.profile_output else None
+    cprof = cProfile.Profile() if output and output.suffix in (".prof", ".pstats") else None
+    try:
+        with profiler.phase("total"):
+            if cprof is not None:
+                cprof.runcall(args.func, args)
+            else:
+                args.func(args)
+    finally:
+        dbm.close_all()
+        profiling.disable()
+    if args.profile:
+        profiler.print_summary(sys.stderr)
+    if cprof is not None:
+        cprof.dump_stats(str(output))
+    elif output is not None:
+        output.write_text(json.dumps(profiler.to_dict(), indent=2) + "\n", encoding="utf-8")
     return 0
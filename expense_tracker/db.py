@@ -1,76 +1,741 @@
 from __future__ import annotations
 
+import atexit
+import heapq
+import os
+import re
 import sqlite3
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Iterator, Mapping, Optional, Sequence
+
+from . import profiling
+from .recurrence import compute_next_due_date, day_number, day_number_sql, month_bounds, parse_date, parse_yyyy_mm
+from .results import ResultSet
+
+
+# Number of prepared statements sqlite3 keeps per connection. The module
+# functions below use a small, fixed set of SQL strings, so with long-lived
+# connections every statement is compiled once and then reused.
+STATEMENT_CACHE_SIZE = 256
+
+# Rows per executemany() call for bulk inserts. The whole import is still a
+# single transaction; the batch size only bounds memory held for parameters.
+DEFAULT_BATCH_SIZE = 5000
+
+# Rows fetched per round trip by the streaming iter_* readers; memory use of
+# a streamed export is bounded by this, not by the size of the table.
+DEFAULT_FETCH_SIZE = 1000
+
+# Column layout shared by CSV export and import.
+EXPENSE_COLUMNS = (
+    "id",
+    "name",
+    "amount_cents",
+    "currency",
+    "category",
+    "recurrence",
+    "start_date",
+    "next_due_date",
+    "notes",
+    "active",
+    "autopay",
+    "created_at",
+    "updated_at",
+)
+PAYMENT_COLUMNS = ("id", "expense_id", "amount_cents", "paid_date", "method", "notes", "created_at")
+FX_RATE_COLUMNS = ("date", "base", "quote", "rate")
+
+# Readers select these explicitly rather than *, so the generated *_day
+# columns stay an indexing detail and rows look the same as before them.
+_EXPENSE_FIELDS = ", ".join(EXPENSE_COLUMNS)
+_PAYMENT_FIELDS = ", ".join(PAYMENT_COLUMNS)
+
+# How list_* results are stored (see results.ResultSet): NOT NULL integer
+# columns go into arrays, low-cardinality text columns share string objects.
+_EXPENSE_INTS = ("id", "amount_cents", "active", "autopay")
+_EXPENSE_REPEATED = ("currency", "category", "recurrence", "start_date", "next_due_date")
+_PAYMENT_INTS = ("id", "expense_id", "amount_cents")
+_PAYMENT_REPEATED = ("paid_date", "method")
+
+
+# PRAGMA settings applied to every new connection, by profile name.
+# "default" uses WAL so readers never block the writer (and vice versa);
+# "legacy" reproduces SQLite's out-of-the-box rollback-journal behaviour.
+PRAGMA_PROFILES: dict[str, dict[str, object]] = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,  # KiB
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # ms
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+}
+PROFILE_ENV_VAR = "EXPENSE_TRACKER_DB_PROFILE"
+
+_default_profile = os.environ.get(PROFILE_ENV_VAR) or "default"
+
+
+def set_default_profile(name: str) -> None:
+    """Select the PRAGMA profile for databases opened from now on."""
+    global _default_profile
+    if name not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown database profile: {name}. Supported: {', '.join(sorted(PRAGMA_PROFILES))}")
+    _default_profile = name
 
 
 def _utc_now_iso() -> str:
     return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
+class Database:
+    """Owns one configured SQLite connection per thread for a database file.
+
+    Connections are opened lazily on first use in each thread and kept until
+    close() is called, so repeated calls reuse the same handle and its
+    prepared-statement cache instead of reconnecting every time.
+    """
+
+    def __init__(self, db_path: str, profile: Optional[str] = None, *, auto_migrate: bool = True) -> None:
+        profile = profile or _default_profile
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(
+                f"Unknown database profile: {profile}. Supported: {', '.join(sorted(PRAGMA_PROFILES))}"
+            )
+        self.db_path = db_path
+        self.profile = profile
+        self.auto_migrate = auto_migrate
+        self._schema_checked = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with profiling.phase("connect"):
+                conn = self._open()
+                self._local.conn = conn
+                if self.auto_migrate and not self._schema_checked:
+                    # One PRAGMA read per Database; DDL runs only when it is behind.
+                    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                        _apply_migrations(conn)
+                    self._schema_checked = True
+        return conn
+
+    def migrate(self) -> tuple[int, int]:
+        """Bring the schema up to SCHEMA_VERSION. Returns (old_version, new_version)."""
+        result = _apply_migrations(self.connection())
+        self._schema_checked = True
+        return result
+
+    def _open(self) -> sqlite3.Connection:
+        profiler = profiling.active()
+        if profiler is None:
+            return self._connect(sqlite3.Connection)
+        conn = self._connect(profiling.ProfiledConnection)
+        if profiler.trace_sql:
+            conn.set_trace_callback(profiler.on_statement)
+        return conn
+
+    def _connect(self, factory: type) -> sqlite3.Connection:
+        # check_same_thread is disabled only so close() can release handles
+        # opened by other threads; each connection is still used by one thread.
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            factory=factory,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        settings = dict(PRAGMA_PROFILES[self.profile])
+        conn.execute(f"PRAGMA busy_timeout = {settings.pop('busy_timeout')}")
+        # journal_mode is stored in the database file. Switching it needs the
+        # file to itself, so only try when it differs and keep the current
+        # mode if another connection is using the database.
+        journal_mode = str(settings.pop("journal_mode")).lower()
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() not in (journal_mode, "memory"):
+            try:
+                conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            except sqlite3.OperationalError:
+                pass
+        for name, value in settings.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every connection opened for this database, in all threads."""
+        with self._lock:
+            conns, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+
+_databases: dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_path: str) -> Database:
+    """Return the shared Database for db_path, creating it on first use."""
+    db = _databases.get(db_path)
+    if db is None:
+        with _databases_lock:
+            db = _databases.get(db_path)
+            if db is None:
+                db = Database(db_path)
+                _databases[db_path] = db
+    return db
+
+
+def close_database(db_path: str) -> None:
+    with _databases_lock:
+        db = _databases.pop(db_path, None)
+    if db is not None:
+        db.close()
+
+
+def close_all() -> None:
+    with _databases_lock:
+        dbs = list(_databases.values())
+        _databases.clear()
+    for db in dbs:
+        db.close()
+
+
+atexit.register(close_all)
+
+
 def get_connection(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return this thread's pooled connection for db_path.
+
+    Using the connection as a context manager commits (or rolls back) the
+    current transaction; it does not close the connection.
+    """
+    return get_database(db_path).connection()
+
+
+@contextmanager
+def write_transaction(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Run a block in a BEGIN IMMEDIATE transaction on this thread's connection.
+
+    The write lock is taken up front, so rows read inside the block cannot be
+    changed by another writer before the block commits. Rolls back on error.
+    """
+    conn = get_connection(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+@contextmanager
+def read_transaction(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Run a block in a read transaction on this thread's connection.
+
+    Every query in the block sees the same snapshot of the database, even
+    if other connections commit meanwhile.
+    """
+    conn = get_connection(db_path)
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
 
 
 def init_db(db_path: str) -> None:
-    with get_connection(db_path) as conn:
+    """Create or upgrade the schema of db_path to SCHEMA_VERSION."""
+    get_database(db_path).migrate()
+
+
+def _apply_migrations(conn: sqlite3.Connection) -> tuple[int, int]:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock: another process may have migrated.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema version {version} is newer than this expense-tracker supports ({SCHEMA_VERSION})"
+            )
         cur = conn.cursor()
+        for step in MIGRATIONS[version:]:
+            step(cur)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return version, SCHEMA_VERSION
+
+
+# Schema migrations, in order. Step N (1-based) upgrades a database from
+# PRAGMA user_version N-1 to N. Steps use IF NOT EXISTS so databases created
+# before versioning (user_version 0) upgrade cleanly. Append new steps to
+# MIGRATIONS; never change a step that has shipped. Steps run statements one
+# at a time with cur.execute: executescript() would commit the migration
+# transaction halfway and drop its write lock.
+
+
+def _migrate_base_schema(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            category TEXT,
+            recurrence TEXT NOT NULL,
+            start_date TEXT,
+            next_due_date TEXT,
+            notes TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY,
+            expense_id INTEGER NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            paid_date TEXT NOT NULL,
+            method TEXT,
+            notes TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(expense_id) REFERENCES expenses(id) ON DELETE CASCADE
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_expenses_next_due ON expenses(next_due_date);
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_payments_expense ON payments(expense_id);
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_payments_paid_date ON payments(paid_date);
+        """
+    )
+
+
+# Per-month payment totals, kept in step with `payments` by the triggers below
+# so monthly reports read a handful of rows instead of scanning payments.
+# An expense has a single currency at a time, so (year_month, expense_id)
+# identifies a row; currency is part of the key for reporting.
+_ROLLUP_ADD_NEW = """
+    INSERT INTO payment_monthly_rollup (year_month, expense_id, currency, total_cents, payment_count)
+    SELECT substr(NEW.paid_date, 1, 7), NEW.expense_id, currency, NEW.amount_cents, 1
+    FROM expenses WHERE id = NEW.expense_id
+    ON CONFLICT (year_month, expense_id, currency) DO UPDATE SET
+        total_cents = total_cents + excluded.total_cents,
+        payment_count = payment_count + 1;
+"""
+
+_ROLLUP_REMOVE_OLD = """
+    UPDATE payment_monthly_rollup
+    SET total_cents = total_cents - OLD.amount_cents, payment_count = payment_count - 1
+    WHERE year_month = substr(OLD.paid_date, 1, 7) AND expense_id = OLD.expense_id;
+    DELETE FROM payment_monthly_rollup
+    WHERE year_month = substr(OLD.paid_date, 1, 7) AND expense_id = OLD.expense_id AND payment_count <= 0;
+"""
+
+_ROLLUP_INSERT_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_insert AFTER INSERT ON payments
+    BEGIN {_ROLLUP_ADD_NEW} END;
+"""
+_ROLLUP_DELETE_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_delete AFTER DELETE ON payments
+    BEGIN {_ROLLUP_REMOVE_OLD} END;
+"""
+
+
+def _migrate_monthly_rollup(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payment_monthly_rollup (
+            year_month TEXT NOT NULL,
+            expense_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            total_cents INTEGER NOT NULL,
+            payment_count INTEGER NOT NULL,
+            PRIMARY KEY (year_month, expense_id, currency)
+        ) WITHOUT ROWID;
+        """
+    )
+    cur.execute(_ROLLUP_INSERT_TRIGGER)
+    cur.execute(_ROLLUP_DELETE_TRIGGER)
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_update
+        AFTER UPDATE OF expense_id, amount_cents, paid_date ON payments
+        BEGIN {_ROLLUP_REMOVE_OLD} {_ROLLUP_ADD_NEW} END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_currency
+        AFTER UPDATE OF currency ON expenses WHEN NEW.currency IS NOT OLD.currency
+        BEGIN
+            UPDATE payment_monthly_rollup SET currency = NEW.currency WHERE expense_id = NEW.id;
+        END;
+        """
+    )
+    # Backfill from payments recorded before the rollup existed.
+    _rebuild_rollups(cur)
+
+
+def _rebuild_rollups(cur: sqlite3.Cursor) -> int:
+    cur.execute("DELETE FROM payment_monthly_rollup")
+    cur.execute(
+        """
+        INSERT INTO payment_monthly_rollup (year_month, expense_id, currency, total_cents, payment_count)
+        SELECT substr(p.paid_date, 1, 7), p.expense_id, e.currency, SUM(p.amount_cents), COUNT(*)
+        FROM payments p JOIN expenses e ON e.id = p.expense_id
+        GROUP BY 1, 2, 3
+        """
+    )
+    return cur.rowcount
+
+
+def _migrate_change_indexes(cur: sqlite3.Cursor) -> None:
+    # Used by incremental (export --since) readers.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_updated_at ON expenses(updated_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments(created_at)")
+
+
+def _migrate_name_search(cur: sqlite3.Cursor) -> None:
+    # Case-insensitive equality on name (get_expense_by_name) uses this index.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_name_nocase ON expenses(name COLLATE NOCASE)")
+    try:
         cur.execute(
             """
-            PRAGMA foreign_keys = ON;
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                amount_cents INTEGER NOT NULL,
-                currency TEXT NOT NULL,
-                category TEXT,
-                recurrence TEXT NOT NULL,
-                start_date TEXT,
-                next_due_date TEXT,
-                notes TEXT,
-                active INTEGER NOT NULL DEFAULT 1,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+                name, category, notes,
+                content='expenses', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS payments (
-                id INTEGER PRIMARY KEY,
-                expense_id INTEGER NOT NULL,
-                amount_cents INTEGER NOT NULL,
-                paid_date TEXT NOT NULL,
-                method TEXT,
-                notes TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY(expense_id) REFERENCES expenses(id) ON DELETE CASCADE
-            );
-            """
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search_expenses falls back to LIKE.
+        return
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (rowid, name, category, notes)
+            VALUES (NEW.id, NEW.name, NEW.category, NEW.notes);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, name, category, notes)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.notes);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_update AFTER UPDATE OF name, category, notes ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, name, category, notes)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.notes);
+            INSERT INTO expenses_fts (rowid, name, category, notes)
+            VALUES (NEW.id, NEW.name, NEW.category, NEW.notes);
+        END;
+        """
+    )
+    cur.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+
+def _migrate_fx_rates(cur: sqlite3.Cursor) -> None:
+    # 1 unit of base was worth `rate` units of quote on rate_date. The primary
+    # key answers "latest rate on or before a date" with a single index seek.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            base TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            rate_date TEXT NOT NULL,
+            rate REAL NOT NULL CHECK (rate > 0),
+            PRIMARY KEY (base, quote, rate_date)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _migrate_report_index(cur: sqlite3.Cursor) -> None:
+    # Covering index for payment_report: the date-range scan reads expense_id
+    # and amount_cents from the index and never visits payments' rows.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_payments_date_expense_amount ON payments(paid_date, expense_id, amount_cents)"
+    )
+
+
+def _migrate_payments_by_expense_index(cur: sqlite3.Cursor) -> None:
+    # (expense_id, paid_date) replaces the expense_id-only index: it still
+    # serves expense_id lookups, returns one expense's payments already in
+    # date order, and covers iter_payment_dates' full scan (reconciliation).
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_expense_date ON payments(expense_id, paid_date)")
+    cur.execute("DROP INDEX IF EXISTS idx_payments_expense")
+
+
+def _migrate_day_numbers(cur: sqlite3.Cursor) -> None:
+    # Integer day numbers (recurrence.day_number) alongside the ISO TEXT dates,
+    # which stay the stored and exchanged form. The columns are VIRTUAL, so
+    # they take no space in the table and writers never set them; only the
+    # indexes store them, at 3 bytes a key instead of 11. Date filters,
+    # ordering and reconciliation use these indexes; payment_report keeps its
+    # TEXT covering index because it buckets payments by substr(paid_date).
+    cur.execute(
+        "ALTER TABLE expenses ADD COLUMN next_due_day INTEGER "
+        f"GENERATED ALWAYS AS ({day_number_sql('next_due_date')}) VIRTUAL"
+    )
+    cur.execute(
+        f"ALTER TABLE payments ADD COLUMN paid_day INTEGER GENERATED ALWAYS AS ({day_number_sql('paid_date')}) VIRTUAL"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_next_due_day ON expenses(next_due_day)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_paid_day ON payments(paid_day)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_expense_day ON payments(expense_id, paid_day)")
+    cur.execute("DROP INDEX IF EXISTS idx_expenses_next_due")
+    cur.execute("DROP INDEX IF EXISTS idx_payments_paid_date")
+    cur.execute("DROP INDEX IF EXISTS idx_payments_expense_date")
+
+
+def _migrate_autopay(cur: sqlite3.Cursor) -> None:
+    cur.execute("ALTER TABLE expenses ADD COLUMN autopay INTEGER NOT NULL DEFAULT 0")
+    # run_autopay's "what is due" lookup; small because most expenses are not autopay.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_autopay_due ON expenses(next_due_day) WHERE active = 1 AND autopay = 1"
+    )
+
+
+def _migrate_payment_archive(cur: sqlite3.Cursor) -> None:
+    # Manifest of archived years (see archive.py): one segment file per year.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payment_archive (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
         )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_expenses_next_due ON expenses(next_due_date);
-            """
+        """
+    )
+    # Archived payments keep their ids, and SQLite hands out MAX(id) + 1, so
+    # archiving the newest rows would let new payments reuse archived ids.
+    # AUTOINCREMENT never reuses one; it needs the table rebuilt, with its
+    # indexes and triggers recreated from their stored SQL.
+    table_sql = cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'payments'").fetchone()[0]
+    if "AUTOINCREMENT" in table_sql.upper():
+        return
+    dependents = [
+        sql
+        for (sql,) in cur.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'payments' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
         )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_payments_expense ON payments(expense_id);
-            """
+    ]
+    rebuilt, n = re.subn(r"\bid INTEGER PRIMARY KEY\b", "id INTEGER PRIMARY KEY AUTOINCREMENT", table_sql, count=1)
+    if not n:
+        raise RuntimeError("Unexpected payments table definition; cannot add AUTOINCREMENT")
+    cur.execute(rebuilt.replace("payments", "payments_rebuild", 1))
+    cur.execute(f"INSERT INTO payments_rebuild ({_PAYMENT_FIELDS}) SELECT {_PAYMENT_FIELDS} FROM payments")
+    cur.execute("DROP TABLE payments")
+    cur.execute("ALTER TABLE payments_rebuild RENAME TO payments")
+    for sql in dependents:
+        cur.execute(sql)
+
+
+def _migrate_reminders_sent(cur: sqlite3.Cursor) -> None:
+    # One row per delivered reminder (see remind.py), so each due date is
+    # reminded once however many reminder processes or restarts there are.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reminders_sent (
+            expense_id INTEGER NOT NULL,
+            due_date TEXT NOT NULL,
+            sink TEXT NOT NULL,
+            sent_at TEXT NOT NULL,
+            PRIMARY KEY (expense_id, due_date)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+# Change journal (see sync.py). Every insert, update and delete of an
+# expense or payment appends one row; seq only grows. Rows are identified
+# across databases by `uuid` (16 random bytes, filled in by the insert
+# trigger when the writer leaves it NULL), since ids are per database.
+# Entries point at the row by row_id; a delete also keeps the row's uuid,
+# as the row is gone. origin is the sync node the change was pulled from,
+# NULL if made here.
+_JOURNAL_NOW = "strftime('%Y-%m-%dT%H:%M:%SZ', 'now')"
+
+
+def _journal_triggers(table: str) -> dict[str, str]:
+    """CREATE TRIGGER statements journaling changes to table, by operation."""
+    return {
+        "insert": f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET uuid = randomblob(16) WHERE NEW.uuid IS NULL AND id = NEW.id;
+                INSERT INTO change_journal (table_name, row_id, op, changed_at)
+                VALUES ('{table}', NEW.id, 'upsert', {_JOURNAL_NOW});
+            END;
+        """,
+        # The insert trigger's own uuid fill-in (OLD.uuid IS NULL) is not a change.
+        "update": f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_update AFTER UPDATE ON {table}
+            WHEN OLD.uuid IS NOT NULL
+            BEGIN
+                INSERT INTO change_journal (table_name, row_id, op, changed_at)
+                VALUES ('{table}', NEW.id, 'upsert', {_JOURNAL_NOW});
+            END;
+        """,
+        "delete": f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_journal (table_name, row_id, row_uuid, op, changed_at)
+                VALUES ('{table}', OLD.id, OLD.uuid, 'delete', {_JOURNAL_NOW});
+            END;
+        """,
+    }
+
+
+def _backfill_uuid(*key) -> bytes:
+    # Derived from the row rather than random, so two copies of one database
+    # that are migrated separately give their shared rows the same uuid.
+    import uuid  # only when migrating; importing it loads platform
+
+    return uuid.uuid5(uuid.NAMESPACE_OID, "|".join(map(str, key))).bytes
+
+
+def _migrate_change_journal(cur: sqlite3.Cursor) -> None:
+    cur.connection.create_function("backfill_uuid", -1, _backfill_uuid, deterministic=True)
+    cur.execute("ALTER TABLE expenses ADD COLUMN uuid BLOB")
+    cur.execute("ALTER TABLE payments ADD COLUMN uuid BLOB")
+    cur.execute("UPDATE expenses SET uuid = backfill_uuid('expenses', id, name, created_at)")
+    cur.execute(
+        "UPDATE payments SET uuid = backfill_uuid('payments', id, expense_id, amount_cents, paid_date, created_at)"
+    )
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_uuid ON expenses(uuid)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_uuid ON payments(uuid)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_uuid BLOB,
+            op TEXT NOT NULL,
+            origin TEXT,
+            changed_at TEXT NOT NULL
         )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_payments_paid_date ON payments(paid_date);
-            """
+        """
+    )
+    # Lets sync check whether a row it is about to insert was deleted here.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_journal_deletes ON change_journal(row_uuid) WHERE op = 'delete'")
+    for table in ("expenses", "payments"):
+        for sql in _journal_triggers(table).values():
+            cur.execute(sql)
+    # This database's identity as a sync node, and how far it has applied
+    # each peer's journal.
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_node (id TEXT NOT NULL)")
+    cur.execute("INSERT INTO sync_node (id) SELECT lower(hex(randomblob(16))) WHERE NOT EXISTS (SELECT 1 FROM sync_node)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            node TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            synced_at TEXT NOT NULL
         )
+        """
+    )
+
+
+def _migrate_sync_sent(cur: sqlite3.Cursor) -> None:
+    # How far each peer has applied this database's journal, so archive can
+    # tell which local changes no peer has received yet.
+    cur.execute("ALTER TABLE sync_peers ADD COLUMN sent_seq INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_monthly_rollup,
+    _migrate_change_indexes,
+    _migrate_name_search,
+    _migrate_fx_rates,
+    _migrate_report_index,
+    _migrate_payments_by_expense_index,
+    _migrate_day_numbers,
+    _migrate_autopay,
+    _migrate_payment_archive,
+    _migrate_reminders_sent,
+    _migrate_change_journal,
+    _migrate_sync_sent,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def vacuum(db_path: str) -> None:
+    """Rewrite the database file so the space of deleted rows is returned to the filesystem."""
+    get_connection(db_path).execute("VACUUM")
+
+
+def rebuild_rollups(db_path: str) -> int:
+    """Recompute payment_monthly_rollup from payments. Returns the number of rollup rows."""
+    with get_connection(db_path) as conn:
+        count = _rebuild_rollups(conn.cursor())
         conn.commit()
+        return count
 
 
 def add_expense(
@@ -85,6 +750,7 @@ def add_expense(
     next_due_date: Optional[str] = None,  # YYYY-MM-DD
     notes: Optional[str] = None,
     active: bool = True,
+    autopay: bool = False,
 ) -> int:
     now = _utc_now_iso()
     with get_connection(db_path) as conn:
@@ -93,8 +759,8 @@ def add_expense(
             """
             INSERT INTO expenses (
                 name, amount_cents, currency, category, recurrence,
-                start_date, next_due_date, notes, active, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                start_date, next_due_date, notes, active, autopay, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 name,
@@ -106,6 +772,7 @@ def add_expense(
                 next_due_date,
                 notes,
                 1 if active else 0,
+                1 if autopay else 0,
                 now,
                 now,
             ),
@@ -144,28 +811,240 @@ def set_expense_active(db_path: str, expense_id: int, active: bool) -> None:
         conn.commit()
 
 
+def set_expense_autopay(db_path: str, expense_id: int, autopay: bool) -> None:
+    now = _utc_now_iso()
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE expenses SET autopay = ?, updated_at = ? WHERE id = ?",
+            (1 if autopay else 0, now, expense_id),
+        )
+        conn.commit()
+
+
 def get_expense_by_id(db_path: str, expense_id: int):
     with get_connection(db_path) as conn:
-        cur = conn.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
+        cur = conn.execute(f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE id = ?", (expense_id,))
         return cur.fetchone()
 
 
 def get_expense_by_name(db_path: str, name: str):
     with get_connection(db_path) as conn:
         cur = conn.execute(
-            "SELECT * FROM expenses WHERE lower(name) = lower(?) ORDER BY id LIMIT 1",
+            f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1",
             (name,),
         )
         return cur.fetchone()
 
 
-def list_expenses(db_path: str, *, include_inactive: bool = False):
-    sql = "SELECT * FROM expenses"
+def _fts_query(text: str) -> str:
+    # Every word must match as a prefix; quoting keeps FTS5 syntax characters literal.
+    terms = ['"' + t.replace('"', '""') + '"*' for t in text.split()]
+    return " ".join(terms)
+
+
+def search_expenses(db_path: str, query: str, *, limit: int = 10, fuzzy: bool = True) -> list:
+    """Return expenses matching query, best match first.
+
+    Words are matched as prefixes against name, category and notes through the
+    expenses_fts index and ranked by bm25. If nothing matches and fuzzy is set,
+    falls back to names similar to the whole query (difflib ratio).
+    """
+    if not query.split():
+        return []
+    with get_connection(db_path) as conn:
+        has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expenses_fts'"
+        ).fetchone()
+        if has_fts:
+            rows = list(
+                conn.execute(
+                    f"""
+                    SELECT {", ".join("e." + c for c in EXPENSE_COLUMNS)}
+                    FROM expenses_fts f JOIN expenses e ON e.id = f.rowid
+                    WHERE expenses_fts MATCH ?
+                    ORDER BY f.rank, e.id
+                    LIMIT ?
+                    """,
+                    (_fts_query(query), limit),
+                )
+            )
+        else:
+            rows = list(
+                conn.execute(
+                    f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE name LIKE ? ORDER BY name, id LIMIT ?",
+                    ("%" + query.strip() + "%", limit),
+                )
+            )
+        if rows or not fuzzy:
+            return rows
+        names = {r["id"]: r["name"] for r in conn.execute("SELECT id, name FROM expenses")}
+        lowered = {i: n.lower() for i, n in names.items()}
+        import difflib
+
+        close = difflib.get_close_matches(query.lower(), set(lowered.values()), n=limit, cutoff=0.6)
+        ranked = [i for c in close for i, n in sorted(lowered.items()) if n == c][:limit]
+        if not ranked:
+            return []
+        by_id = {
+            r["id"]: r
+            for r in conn.execute(
+                f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE id IN ({', '.join('?' * len(ranked))})", ranked
+            )
+        }
+        return [by_id[i] for i in ranked]
+
+
+def _result_set(db_path: str, sql: str, params, *, ints, repeated) -> ResultSet:
+    cur = get_connection(db_path).cursor()
+    cur.row_factory = None  # plain tuples; ResultSet splits them into columns
+    try:
+        cur.execute(sql, params)
+        return ResultSet.from_cursor(cur, ints=ints, repeated=repeated, chunk_size=DEFAULT_FETCH_SIZE)
+    finally:
+        cur.close()
+
+
+def list_expenses(db_path: str, *, include_inactive: bool = False) -> ResultSet:
+    sql = f"SELECT {_EXPENSE_FIELDS} FROM expenses"
     if not include_inactive:
         sql += " WHERE active = 1"
-    sql += " ORDER BY COALESCE(next_due_date, '9999-12-31'), name"
+    sql += " ORDER BY next_due_day IS NULL, next_due_day, name"
+    return _result_set(db_path, sql, (), ints=_EXPENSE_INTS, repeated=_EXPENSE_REPEATED)
+
+
+def _iter_query(db_path: str, sql: str, params, chunk_size: int) -> Iterator[sqlite3.Row]:
+    cur = get_connection(db_path).execute(sql, params)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cur.close()
+
+
+def iter_expenses(
+    db_path: str,
+    *,
+    include_inactive: bool = True,
+    since: Optional[str] = None,  # created_at/updated_at timestamp, exclusive
+    chunk_size: int = DEFAULT_FETCH_SIZE,
+) -> Iterator[sqlite3.Row]:
+    """Stream expenses in id order, fetching chunk_size rows at a time.
+
+    With since, only rows updated after that timestamp are returned.
+    """
+    clauses: list[str] = []
+    params: list[object] = []
+    if not include_inactive:
+        clauses.append("active = 1")
+    if since is not None:
+        clauses.append("updated_at > ?")
+        params.append(since)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return _iter_query(db_path, f"SELECT {_EXPENSE_FIELDS} FROM expenses{where} ORDER BY id", params, chunk_size)
+
+
+def iter_payments(
+    db_path: str,
+    *,
+    since: Optional[str] = None,  # created_at timestamp, exclusive
+    chunk_size: int = DEFAULT_FETCH_SIZE,
+) -> Iterator[sqlite3.Row]:
+    """Stream payments in id order, fetching chunk_size rows at a time.
+
+    Payments are never updated, so since filters on created_at. Archived
+    payments are merged in (as dicts) by id.
+    """
+    from . import archive
+
+    if since is None:
+        hot = _iter_query(db_path, f"SELECT {_PAYMENT_FIELDS} FROM payments ORDER BY id", (), chunk_size)
+    else:
+        hot = _iter_query(
+            db_path, f"SELECT {_PAYMENT_FIELDS} FROM payments WHERE created_at > ? ORDER BY id", (since,), chunk_size
+        )
+    if archive.archived_before(db_path) is None:
+        return hot
+    return heapq.merge(hot, archive.iter_by_id(db_path, since=since), key=itemgetter("id"))
+
+
+def iter_payment_dates(db_path: str, *, chunk_size: int = DEFAULT_FETCH_SIZE) -> Iterator[sqlite3.Row]:
+    """Stream (expense_id, id, paid_day) of every payment ordered by expense, then date.
+
+    paid_day is the day number (date.toordinal()) of paid_date. The order
+    matches iter_expenses (by id), so the two can be merge-joined.
+    """
+    return _iter_query(
+        db_path,
+        "SELECT expense_id, id, paid_day FROM payments ORDER BY expense_id, paid_day, id",
+        (),
+        chunk_size,
+    )
+
+
+def undated_payment_count(db_path: str) -> int:
+    """Payments whose paid_date is not a valid YYYY-MM-DD date, so paid_day is NULL."""
+    with get_connection(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM payments WHERE paid_day IS NULL").fetchone()[0]
+
+
+def journal_seq(db_path: str) -> int:
+    """Sequence number of the newest change_journal entry (0 if there is none)."""
     with get_connection(db_path) as conn:
-        return list(conn.execute(sql))
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+
+
+def expense_changes(db_path: str, *, after_seq: int) -> tuple[int, list[sqlite3.Row], list[int]]:
+    """Expenses changed after journal entry after_seq.
+
+    Returns (newest seq read, current rows of the changed expenses, ids of
+    changed expenses that no longer exist). Reads only the new journal
+    entries, however large the tables are.
+    """
+    with get_connection(db_path) as conn:
+        changes = conn.execute(
+            "SELECT seq, table_name, row_id FROM change_journal WHERE seq > ? ORDER BY seq", (after_seq,)
+        ).fetchall()
+        last = changes[-1]["seq"] if changes else after_seq
+        ids = sorted({r["row_id"] for r in changes if r["table_name"] == "expenses"})
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.extend(
+                conn.execute(f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            )
+    found = {r["id"] for r in rows}
+    return last, rows, [i for i in ids if i not in found]
+
+
+def node_id(db_path: str) -> str:
+    """This database's identity as a sync node."""
+    with get_connection(db_path) as conn:
+        return conn.execute("SELECT id FROM sync_node").fetchone()[0]
+
+
+def reset_node_id(db_path: str) -> str:
+    """Make db_path, a copy of another node's file, a sync node of its own. Returns its new id.
+
+    The copy already holds everything the original had journaled, so that
+    journal is attributed to the original and marked as applied: neither
+    side sends it to the other.
+    """
+    with write_transaction(db_path) as conn:
+        original = conn.execute("SELECT id FROM sync_node").fetchone()[0]
+        conn.execute("UPDATE change_journal SET origin = ? WHERE origin IS NULL", (original,))
+        conn.execute(
+            """
+            INSERT INTO sync_peers (node, last_seq, synced_at)
+            SELECT ?, COALESCE(MAX(seq), 0), ? FROM change_journal WHERE true
+            ON CONFLICT(node) DO UPDATE SET last_seq = excluded.last_seq, synced_at = excluded.synced_at
+            """,
+            (original, _utc_now_iso()),
+        )
+        conn.execute("UPDATE sync_node SET id = lower(hex(randomblob(16)))")
+        return conn.execute("SELECT id FROM sync_node").fetchone()[0]
 
 
 def record_payment(
@@ -192,46 +1071,806 @@ def record_payment(
         return int(payment_id)
 
 
+def _blank_to_none(value):
+    return None if value is None or value == "" else value
+
+
+def _iso_date(row: Mapping, field: str) -> Optional[str]:
+    # Stored dates must be canonical YYYY-MM-DD: the *_day columns, rollup
+    # months and date filters are all derived from the text.
+    value = _blank_to_none(row.get(field))
+    if value is None:
+        return None
+    try:
+        return parse_date(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{field}: expected YYYY-MM-DD, got {value!r}") from None
+
+
+def _numbered(rows: Iterable[Mapping], build, now: str) -> Iterator[tuple]:
+    """build(row, now) for each row; a ValueError names the (1-based) row it came from."""
+    for number, row in enumerate(rows, 1):
+        try:
+            yield build(row, now)
+        except ValueError as exc:
+            raise ValueError(f"row {number}: {exc}") from None
+
+
+def _expense_params(row: Mapping, now: str) -> tuple:
+    id_ = _blank_to_none(row.get("id"))
+    active = _blank_to_none(row.get("active"))
+    autopay = _blank_to_none(row.get("autopay"))
+    return (
+        int(id_) if id_ is not None else None,
+        row["name"],
+        int(row["amount_cents"]),
+        _blank_to_none(row.get("currency")) or "USD",
+        _blank_to_none(row.get("category")),
+        _blank_to_none(row.get("recurrence")) or "none",
+        _iso_date(row, "start_date"),
+        _iso_date(row, "next_due_date"),
+        _blank_to_none(row.get("notes")),
+        1 if active is None else int(active),
+        0 if autopay is None else int(autopay),
+        _blank_to_none(row.get("created_at")) or now,
+        _blank_to_none(row.get("updated_at")) or now,
+    )
+
+
+def _payment_params(row: Mapping, now: str) -> tuple:
+    id_ = _blank_to_none(row.get("id"))
+    paid_date = _iso_date(row, "paid_date")
+    if paid_date is None:
+        raise ValueError("paid_date is required")
+    return (
+        int(id_) if id_ is not None else None,
+        int(row["expense_id"]),
+        int(row["amount_cents"]),
+        paid_date,
+        _blank_to_none(row.get("method")),
+        _blank_to_none(row.get("notes")),
+        _blank_to_none(row.get("created_at")) or now,
+    )
+
+
+def _insert_batches(
+    cur: sqlite3.Cursor, table: str, columns: tuple, params, batch_size: int, *, verb: str = "INSERT"
+) -> int:
+    sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    count = 0
+    while True:
+        batch = list(islice(params, batch_size))
+        if not batch:
+            break
+        cur.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def bulk_insert_expenses(
+    db_path: str, rows: Iterable[Mapping], *, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Insert expense rows (keyed by EXPENSE_COLUMNS) in one transaction.
+
+    Values may be strings as read from CSV; blank optional fields become NULL
+    and a blank id lets SQLite assign one. Dates are checked and stored as
+    YYYY-MM-DD. Nothing is written if any row fails; a ValueError names the
+    row.
+    The per-row journal trigger is suspended and the new rows are journaled
+    in one statement at the end. Returns the number of rows inserted.
+    """
+    now = _utc_now_iso()
+    explicit_ids: list[int] = []
+    with write_transaction(db_path) as conn:
+        cur = conn.cursor()
+        after_id = _suspend_journal_insert(cur, "expenses")
+        params = _with_uuids(_numbered(rows, _expense_params, now), explicit_ids)
+        count = _insert_batches(cur, "expenses", EXPENSE_COLUMNS + ("uuid",), params, batch_size)
+        _journal_bulk_inserts(cur, "expenses", after_id, explicit_ids, now)
+    return count
+
+
+def bulk_insert_payments(
+    db_path: str, rows: Iterable[Mapping], *, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Insert payment rows (keyed by PAYMENT_COLUMNS) in one transaction.
+
+    Same conventions as bulk_insert_expenses. The per-row rollup trigger is
+    suspended inside the transaction and payment_monthly_rollup is updated
+    once per (month, expense) instead, which keeps large imports fast.
+    """
+    now = _utc_now_iso()
+    deltas: dict[tuple[str, int], list[int]] = {}
+    explicit_ids: list[int] = []
+
+    def params():
+        for p in _numbered(rows, _payment_params, now):
+            delta = deltas.get((p[3][:7], p[1]))
+            if delta is None:
+                deltas[(p[3][:7], p[1])] = [p[2], 1]
+            else:
+                delta[0] += p[2]
+                delta[1] += 1
+            yield p
+
+    # The explicit transaction also makes dropping and recreating the trigger
+    # (DDL never opens a transaction implicitly) atomic with the inserts.
+    with write_transaction(db_path) as conn:
+        cur = conn.cursor()
+        cur.execute("DROP TRIGGER IF EXISTS trg_payments_rollup_insert")
+        after_id = _suspend_journal_insert(cur, "payments")
+        count = _insert_batches(
+            cur, "payments", PAYMENT_COLUMNS + ("uuid",), _with_uuids(params(), explicit_ids), batch_size
+        )
+        _add_rollup_deltas(cur, deltas)
+        cur.execute(_ROLLUP_INSERT_TRIGGER)
+        _journal_bulk_inserts(cur, "payments", after_id, explicit_ids, now)
+    return count
+
+
+def _suspend_journal_insert(cur: sqlite3.Cursor, table: str) -> int:
+    """Drop table's journal insert trigger for a bulk insert. Returns the largest id before it."""
+    cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_journal_insert")
+    return cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+
+def _new_uuid() -> bytes:
+    # UUIDv7 layout: milliseconds since the epoch, then random bits. Rows
+    # inserted together get neighbouring keys, so a bulk insert appends to
+    # idx_*_uuid instead of touching a random page per row.
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) & ~(0x3 << 62) | 0x7 << 76 | 0x2 << 62
+    return value.to_bytes(16, "big")
+
+
+def _with_uuids(params: Iterable[tuple], explicit_ids: list[int]) -> Iterator[tuple]:
+    # The suspended trigger would have filled in uuid; note the ids given
+    # explicitly, as they may fall below the ones SQLite assigns.
+    for p in params:
+        if p[0] is not None:
+            explicit_ids.append(p[0])
+        yield (*p, _new_uuid())
+
+
+def _journal_bulk_inserts(cur: sqlite3.Cursor, table: str, after_id: int, explicit_ids: list[int], now: str) -> None:
+    """Journal the rows of a bulk insert into table and restore its journal insert trigger."""
+    cur.execute(
+        f"INSERT INTO change_journal (table_name, row_id, op, changed_at) SELECT ?, id, 'upsert', ? FROM {table} WHERE id > ?",
+        (table, now, after_id),
+    )
+    cur.executemany(
+        "INSERT INTO change_journal (table_name, row_id, op, changed_at) VALUES (?, ?, 'upsert', ?)",
+        ((table, i, now) for i in explicit_ids if i <= after_id),
+    )
+    cur.execute(_journal_triggers(table)["insert"])
+
+
+def _add_rollup_deltas(cur: sqlite3.Cursor, deltas: Mapping[tuple[str, int], Sequence[int]]) -> None:
+    """Add {(year_month, expense_id): (total_cents, payment_count)} to payment_monthly_rollup.
+
+    For writers that suspend trg_payments_rollup_insert around a batch.
+    """
+    cur.executemany(
+        """
+        INSERT INTO payment_monthly_rollup (year_month, expense_id, currency, total_cents, payment_count)
+        SELECT ?, id, currency, ?, ? FROM expenses WHERE id = ?
+        ON CONFLICT (year_month, expense_id, currency) DO UPDATE SET
+            total_cents = total_cents + excluded.total_cents,
+            payment_count = payment_count + excluded.payment_count
+        """,
+        [(ym, total, n, expense_id) for (ym, expense_id), (total, n) in deltas.items()],
+    )
+
+
+def _advance_schedule(row: Mapping, paid_date: str) -> tuple[Optional[str], bool]:
+    """Return (next_due_date, active) for an expense after a payment on paid_date."""
+    if row["recurrence"] == "none":
+        return None, False
+    start = parse_date(row["start_date"]) if row["start_date"] else None
+    current_due = parse_date(row["next_due_date"]) if row["next_due_date"] else None
+    next_due = compute_next_due_date(current_due, start, row["recurrence"], from_date=parse_date(paid_date))
+    return (next_due.isoformat() if next_due else None), True
+
+
+def pay_expense(
+    db_path: str,
+    expense_id: int,
+    *,
+    paid_date: str,  # YYYY-MM-DD
+    amount_cents: Optional[int] = None,
+    method: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> Optional[dict]:
+    """Record a payment and advance the expense's schedule in one transaction.
+
+    amount_cents defaults to the expense's amount. One-off expenses are
+    deactivated. Returns None if the expense does not exist, otherwise a dict
+    with payment_id, expense_id, name, amount_cents, next_due_date and active.
+    """
+    now = _utc_now_iso()
+    with write_transaction(db_path) as conn:
+        row = conn.execute(f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE id = ?", (expense_id,)).fetchone()
+        if row is None:
+            return None
+        amount = int(row["amount_cents"]) if amount_cents is None else amount_cents
+        cur = conn.execute(
+            """
+            INSERT INTO payments (expense_id, amount_cents, paid_date, method, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (expense_id, amount, paid_date, method, notes, now),
+        )
+        payment_id = int(cur.lastrowid)
+        next_due, active = _advance_schedule(row, paid_date)
+        conn.execute(
+            "UPDATE expenses SET next_due_date = ?, active = ?, updated_at = ? WHERE id = ?",
+            (next_due, 1 if active else 0, now, expense_id),
+        )
+    return {
+        "payment_id": payment_id,
+        "expense_id": expense_id,
+        "name": row["name"],
+        "amount_cents": amount,
+        "next_due_date": next_due,
+        "active": active,
+    }
+
+
+def pay_expenses(
+    db_path: str,
+    *,
+    expense_ids: Optional[Iterable[int]] = None,
+    due_through: Optional[str] = None,  # YYYY-MM-DD
+    paid_date: str,  # YYYY-MM-DD
+    method: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> list[dict]:
+    """Settle many expenses at their configured amounts in one transaction.
+
+    Pays the given expense_ids, or with due_through every active expense due
+    on or before that date. Payments are inserted and schedules advanced with
+    one executemany each. Returns one dict per expense paid (as pay_expense,
+    without payment_id); unknown ids are skipped.
+    """
+    now = _utc_now_iso()
+    with write_transaction(db_path) as conn:
+        rows: list[sqlite3.Row] = []
+        if expense_ids is not None:
+            ids = list(dict.fromkeys(expense_ids))
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows.extend(
+                    conn.execute(
+                        f"SELECT {_EXPENSE_FIELDS} FROM expenses WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+                        chunk,
+                    )
+                )
+        elif due_through is not None:
+            rows = list(
+                conn.execute(
+                    f"""
+                    SELECT {_EXPENSE_FIELDS} FROM expenses
+                    WHERE active = 1 AND next_due_day <= ?
+                    ORDER BY next_due_day, name
+                    """,
+                    (day_number(due_through),),
+                )
+            )
+        results = []
+        for row in rows:
+            next_due, active = _advance_schedule(row, paid_date)
+            results.append({
+                "expense_id": int(row["id"]),
+                "name": row["name"],
+                "amount_cents": int(row["amount_cents"]),
+                "next_due_date": next_due,
+                "active": active,
+            })
+        conn.executemany(
+            """
+            INSERT INTO payments (expense_id, amount_cents, paid_date, method, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(r["expense_id"], r["amount_cents"], paid_date, method, notes, now) for r in results],
+        )
+        conn.executemany(
+            "UPDATE expenses SET next_due_date = ?, active = ?, updated_at = ? WHERE id = ?",
+            [(r["next_due_date"], 1 if r["active"] else 0, now, r["expense_id"]) for r in results],
+        )
+    return results
+
+
+AUTOPAY_METHOD = "autopay"
+
+
+def run_autopay(
+    db_path: str,
+    *,
+    through: str,  # YYYY-MM-DD
+    method: Optional[str] = AUTOPAY_METHOD,
+    notes: Optional[str] = None,
+) -> list[dict]:
+    """Post every occurrence of autopay expenses due on or before through.
+
+    Each active autopay expense gets one payment per occurrence from its
+    next_due_date through `through`, dated on the due date at its configured
+    amount. Its next_due_date then moves to the first occurrence after the
+    last one paid; one-off expenses are deactivated, as after pay. All of it
+    happens in one transaction. The payments go in with one executemany, and
+    every schedule moves with one UPDATE joined to a temp table, whatever the
+    number of expenses. As in bulk_insert_payments, the rollup trigger is
+    suspended and the rollup gets one update per (month, expense).
+    Occurrences come from forecast.schedule_days and are shared by expenses
+    on the same schedule.
+
+    Returns one dict per expense paid: expense_id, name, currency, payments,
+    amount_cents (the sum posted), first_due, next_due_date and active.
+    """
+    from .forecast import schedule_days
+    from .recurrence import from_day_number, next_after, normalize_recurrence
+
+    end = parse_date(through)
+    now = _utc_now_iso()
+    # (next_due_date, recurrence) -> (due dates, {month: payments}, new next_due_date)
+    schedules: dict[tuple[str, str], tuple] = {}
+    payments: list[tuple] = []
+    deltas: dict[tuple[str, int], tuple[int, int]] = {}
+    results: list[dict] = []
+    with write_transaction(db_path) as conn:
+        rows = conn.execute(
+            """
+            SELECT id, name, amount_cents, currency, recurrence, next_due_date FROM expenses
+            WHERE active = 1 AND autopay = 1 AND next_due_day <= ?
+            ORDER BY next_due_day, name
+            """,
+            (end.toordinal(),),
+        ).fetchall()
+        for expense_id, name, amount_cents, currency, recurrence, next_due in rows:
+            schedule = schedules.get((next_due, recurrence))
+            if schedule is None:
+                r = normalize_recurrence(recurrence)
+                days = schedule_days(parse_date(next_due), r, end)
+                due = [from_day_number(d).isoformat() for d in days]
+                months: dict[str, int] = {}
+                for d in due:
+                    months[d[:7]] = months.get(d[:7], 0) + 1
+                after = None if r == "none" else next_after(from_day_number(days[-1]), r).isoformat()
+                schedule = schedules[(next_due, recurrence)] = (due, months, after)
+            due, months, after = schedule
+            payments.extend((expense_id, amount_cents, d, method, notes, now) for d in due)
+            for month, n in months.items():
+                deltas[(month, expense_id)] = (amount_cents * n, n)
+            results.append({
+                "expense_id": expense_id,
+                "name": name,
+                "currency": currency,
+                "payments": len(due),
+                "amount_cents": amount_cents * len(due),
+                "first_due": due[0],
+                "next_due_date": after,
+                "active": after is not None,
+            })
+        cur = conn.cursor()
+        cur.execute("DROP TRIGGER IF EXISTS trg_payments_rollup_insert")
+        cur.executemany(
+            """
+            INSERT INTO payments (expense_id, amount_cents, paid_date, method, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            payments,
+        )
+        _add_rollup_deltas(cur, deltas)
+        cur.execute(_ROLLUP_INSERT_TRIGGER)
+        conn.execute(
+            "CREATE TEMP TABLE autopay_advance (id INTEGER PRIMARY KEY, next_due_date TEXT, active INTEGER NOT NULL)"
+        )
+        try:
+            conn.executemany(
+                "INSERT INTO temp.autopay_advance VALUES (?, ?, ?)",
+                [(r["expense_id"], r["next_due_date"], 1 if r["active"] else 0) for r in results],
+            )
+            conn.execute(
+                """
+                UPDATE expenses
+                SET (next_due_date, active) = (
+                        SELECT a.next_due_date, a.active FROM temp.autopay_advance AS a WHERE a.id = expenses.id
+                    ),
+                    updated_at = ?
+                WHERE id IN (SELECT id FROM temp.autopay_advance)
+                """,
+                (now,),
+            )
+        finally:
+            conn.execute("DROP TABLE temp.autopay_advance")
+    return results
+
+
+def record_archive_segment(
+    conn: sqlite3.Connection, *, year: int, file: str, row_count: int, total_cents: int
+) -> None:
+    """Register (or replace) the archive segment of a year, in conn's open transaction."""
+    conn.execute(
+        "INSERT OR REPLACE INTO payment_archive (year, file, row_count, total_cents, archived_at) VALUES (?, ?, ?, ?, ?)",
+        (year, file, row_count, total_cents, _utc_now_iso()),
+    )
+
+
+def delete_payments_before(conn: sqlite3.Connection, before: date) -> int:
+    """Delete payments dated before January 1st `before` and their rollups, in conn's open transaction.
+
+    Whole months go at once, so the per-row rollup trigger is suspended and
+    the rollup rows of those months are dropped instead. The journal trigger
+    is suspended too: the payments are moved, not deleted, and sync must not
+    delete them from peers. Returns the number of payments deleted.
+    """
+    cur = conn.cursor()
+    cur.execute("DROP TRIGGER IF EXISTS trg_payments_rollup_delete")
+    cur.execute("DROP TRIGGER IF EXISTS trg_payments_journal_delete")
+    cur.execute("DELETE FROM payments WHERE paid_day < ?", (day_number(before),))
+    count = cur.rowcount
+    cur.execute("DELETE FROM payment_monthly_rollup WHERE year_month < ?", (f"{before.year:04d}-01",))
+    cur.execute(_ROLLUP_DELETE_TRIGGER)
+    cur.execute(_journal_triggers("payments")["delete"])
+    return count
+
+
+def unsynced_payments_before(conn: sqlite3.Connection, before: date) -> int:
+    """Payments dated before January 1st `before` with journal entries some peer has not applied yet.
+
+    A peer is any node in sync_peers; entries that came from a peer do not
+    need to go back to it. Reads only the journal after the oldest sent_seq.
+    """
+    return conn.execute(
+        """
+        SELECT COUNT(DISTINCT p.id) FROM change_journal j JOIN payments p ON p.id = j.row_id
+        WHERE j.seq > (SELECT MIN(sent_seq) FROM sync_peers) AND j.table_name = 'payments' AND p.paid_day < ?
+          AND EXISTS (
+              SELECT 1 FROM sync_peers s WHERE s.sent_seq < j.seq AND (j.origin IS NULL OR j.origin != s.node)
+          )
+        """,
+        (day_number(before),),
+    ).fetchone()[0]
+
+
+@contextmanager
+def _archived_totals(
+    conn: sqlite3.Connection, db_path: str, periods: Sequence[tuple[int, Optional[int]]]
+) -> Iterator[str]:
+    """Totals of archived payments as a temp table shaped like payment_monthly_rollup.
+
+    periods are (year, month) pairs; month None is the whole year. Yields SQL to select (year_month, expense_id, currency, total_cents,
+    payment_count) from, so queries over the rollup or payments can UNION ALL
+    the archived months. When nothing in range is archived that is an empty
+    subquery and no table is created.
+    """
+    from . import archive
+
+    totals = {}
+    for year, month in periods:
+        totals.update(archive.expense_totals(db_path, year=year, month=month))
+    if not totals:
+        yield "(SELECT NULL AS year_month, NULL AS expense_id, NULL AS currency, 0 AS total_cents, 0 AS payment_count WHERE 0)"
+        return
+    conn.execute(
+        "CREATE TEMP TABLE archived_totals "
+        "(year_month TEXT, expense_id INTEGER, currency TEXT, total_cents INTEGER, payment_count INTEGER)"
+    )
+    try:
+        conn.executemany(
+            "INSERT INTO temp.archived_totals SELECT ?, id, currency, ?, ? FROM expenses WHERE id = ?",
+            [(ym, total, n, expense_id) for (ym, expense_id), (total, n) in totals.items()],
+        )
+        yield "temp.archived_totals"
+    finally:
+        conn.execute("DROP TABLE temp.archived_totals")
+
+
 def list_payments(
     db_path: str,
     *,
     expense_id: Optional[int] = None,
     year_month: Optional[str] = None,  # YYYY-MM
-):
+    date_from: Optional[str] = None,  # YYYY-MM-DD, inclusive
+    date_to: Optional[str] = None,  # YYYY-MM-DD, inclusive
+    limit: Optional[int] = None,
+    offset: int = 0,
+    after: Optional[tuple[str, int]] = None,  # (paid_date, id) of the previous page's last row
+) -> ResultSet:
+    """Return payments newest first, optionally one page at a time.
+
+    Prefer `after` (keyset paging) to `offset` for walking a long history:
+    it seeks straight to the page in idx_payments_paid_day instead of
+    reading and discarding every earlier row. Archived payments (see
+    archive.py) in the requested range are merged in by date.
+    """
+    # Date filters are plain range comparisons on the paid_day day number so
+    # that idx_payments_paid_day can be used; never wrap the column in a function.
     clauses: list[str] = []
     params: list[object] = []
+    start_day: Optional[int] = None  # paid_day range [start_day, end_day), for the archive
+    end_day: Optional[int] = None
     if expense_id is not None:
         clauses.append("expense_id = ?")
         params.append(expense_id)
     if year_month is not None:
-        clauses.append("substr(paid_date, 1, 7) = ?")
-        params.append(year_month)
+        start, end = month_bounds(*parse_yyyy_mm(year_month))
+        start_day, end_day = day_number(start), day_number(end)
+        clauses.append("paid_day >= ? AND paid_day < ?")
+        params.extend([start_day, end_day])
+    if date_from is not None:
+        day = day_number(date_from)
+        start_day = day if start_day is None else max(start_day, day)
+        clauses.append("paid_day >= ?")
+        params.append(day)
+    if date_to is not None:
+        day = day_number(date_to)
+        end_day = day + 1 if end_day is None else min(end_day, day + 1)
+        clauses.append("paid_day <= ?")
+        params.append(day)
+    if after is not None:
+        clauses.append("(paid_day, id) < (?, ?)")
+        params.extend([day_number(after[0]), after[1]])
     where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
-    sql = f"SELECT * FROM payments{where} ORDER BY paid_date DESC, id DESC"
-    with get_connection(db_path) as conn:
-        return list(conn.execute(sql, params))
+    sql = f"SELECT {_PAYMENT_FIELDS} FROM payments{where} ORDER BY paid_day DESC, id DESC"
+
+    from . import archive
 
+    cold_before = archive.archived_before(db_path)
+    if cold_before is None or (start_day is not None and start_day >= day_number(cold_before)):
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        return _result_set(db_path, sql, params, ints=_PAYMENT_INTS, repeated=_PAYMENT_REPEATED)
 
-def upcoming_expenses(db_path: str, *, until_date: str):
+    # Both sides are newest first, so the page is the merge's [offset, offset + limit).
+    stop = None if limit is None else offset + limit
+    if stop is not None:
+        sql += " LIMIT ?"
+        params.append(stop)
+    cur = get_connection(db_path).cursor()
+    cur.row_factory = None
+    try:
+        hot = cur.execute(sql, params)
+        cold = archive.iter_newest_first(
+            db_path,
+            expense_id=expense_id,
+            start=start_day,
+            end=end_day,
+            after=None if after is None else (day_number(after[0]), after[1]),
+        )
+        merged = heapq.merge(hot, cold, key=itemgetter(3, 0), reverse=True)  # (paid_date, id)
+        return ResultSet.from_rows(
+            PAYMENT_COLUMNS, islice(merged, offset, stop), ints=_PAYMENT_INTS, repeated=_PAYMENT_REPEATED
+        )
+    finally:
+        cur.close()
+
+
+def iter_payment_pages(
+    db_path: str,
+    *,
+    page_size: int = DEFAULT_FETCH_SIZE,
+    offset: int = 0,
+    after: Optional[tuple[str, int]] = None,
+    **filters,
+) -> Iterator[ResultSet]:
+    """Yield list_payments() pages until the filters are exhausted.
+
+    Only one page is held at a time, so walking any number of payments uses
+    constant memory. offset applies to the first page only.
+    """
+    while True:
+        page = list_payments(db_path, limit=page_size, offset=offset, after=after, **filters)
+        if len(page):
+            yield page
+        if len(page) < page_size:
+            return
+        offset = 0
+        after = (page.column("paid_date")[-1], page.column("id")[-1])
+
+
+def upcoming_expenses(db_path: str, *, until_date: str) -> ResultSet:
     """Return active expenses with a next_due_date on or before until_date (YYYY-MM-DD)."""
+    return _result_set(
+        db_path,
+        f"""
+        SELECT {_EXPENSE_FIELDS} FROM expenses
+        WHERE active = 1 AND next_due_day <= ?
+        ORDER BY next_due_day, name
+        """,
+        (day_number(until_date),),
+        ints=_EXPENSE_INTS,
+        repeated=_EXPENSE_REPEATED,
+    )
+
+
+def data_version(db_path: str) -> int:
+    """PRAGMA data_version of this thread's connection: changes when another connection commits."""
+    return get_connection(db_path).execute("PRAGMA data_version").fetchone()[0]
+
+
+def claim_reminder(db_path: str, *, expense_id: int, due_date: str, sink: str) -> bool:
+    """Record that the reminder for (expense_id, due_date) is being sent.
+
+    Returns False if it was already claimed, by this or any other process.
+    """
     with get_connection(db_path) as conn:
         cur = conn.execute(
-            """
-            SELECT * FROM expenses
-            WHERE active = 1 AND next_due_date IS NOT NULL AND next_due_date <= ?
-            ORDER BY next_due_date, name
-            """,
-            (until_date,),
+            "INSERT OR IGNORE INTO reminders_sent (expense_id, due_date, sink, sent_at) VALUES (?, ?, ?, ?)",
+            (expense_id, due_date, sink, _utc_now_iso()),
         )
-        return list(cur)
+        return cur.rowcount == 1
+
+
+def release_reminder(db_path: str, *, expense_id: int, due_date: str) -> None:
+    """Undo claim_reminder after a failed delivery, so it is sent again later."""
+    with get_connection(db_path) as conn:
+        conn.execute("DELETE FROM reminders_sent WHERE expense_id = ? AND due_date = ?", (expense_id, due_date))
 
 
 def monthly_payment_summary(db_path: str, *, year: int, month: int) -> dict[str, int]:
+    from . import archive
+
     ym = f"{year:04d}-{month:02d}"
+    cold_total, cold_count = archive.month_total(db_path, year=year, month=month)
     with get_connection(db_path) as conn:
         cur = conn.execute(
-            "SELECT COALESCE(SUM(amount_cents), 0) AS total_cents, COUNT(*) AS cnt FROM payments WHERE substr(paid_date,1,7) = ?",
+            """
+            SELECT COALESCE(SUM(total_cents), 0) AS total_cents, COALESCE(SUM(payment_count), 0) AS cnt
+            FROM payment_monthly_rollup WHERE year_month = ?
+            """,
             (ym,),
         )
         row = cur.fetchone()
-        return {"total_cents": int(row[0] or 0), "count": int(row[1] or 0)}
+        return {"total_cents": int(row[0] or 0) + cold_total, "count": int(row[1] or 0) + cold_count}
+
+
+# SQL expression for the rate that converts {currency} into :base using the
+# latest fx_rates row on or before :on, read directly or as the inverse of
+# the opposite pair. NULL when neither pair has a rate yet.
+_FX_RATE_EXPR = """
+    COALESCE(
+        CASE WHEN {currency} = :base THEN 1.0 END,
+        (SELECT rate FROM fx_rates
+         WHERE base = {currency} AND quote = :base AND rate_date <= :on
+         ORDER BY rate_date DESC LIMIT 1),
+        (SELECT 1.0 / rate FROM fx_rates
+         WHERE base = :base AND quote = {currency} AND rate_date <= :on
+         ORDER BY rate_date DESC LIMIT 1)
+    )
+"""
+
+
+def import_fx_rates(db_path: str, rows: Iterable[Mapping], *, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Insert or replace rates (keyed by FX_RATE_COLUMNS) in one transaction.
+
+    A later import of the same (date, base, quote) overwrites the rate.
+    Returns the number of rows read.
+    """
+
+    def params():
+        for r in rows:
+            rate = float(r["rate"])
+            if not rate > 0:
+                raise ValueError(f"Rate must be positive: {r['rate']!r}")
+            yield (r["base"].strip().upper(), r["quote"].strip().upper(), parse_date(r["date"]).isoformat(), rate)
+
+    with get_connection(db_path) as conn:
+        count = _insert_batches(
+            conn.cursor(),
+            "fx_rates",
+            ("base", "quote", "rate_date", "rate"),
+            params(),
+            batch_size,
+            verb="INSERT OR REPLACE",
+        )
+        conn.commit()
+        return count
+
+
+def fx_rate(db_path: str, currency: str, base: str, on: str) -> Optional[float]:
+    """Rate converting currency into base as of on (YYYY-MM-DD), or None if unknown."""
+    with get_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT " + _FX_RATE_EXPR.format(currency=":currency"),
+            {"currency": currency, "base": base, "on": on},
+        ).fetchone()
+        return row[0]
+
+
+def monthly_currency_summary(db_path: str, *, year: int, month: int, base: Optional[str] = None) -> list[dict]:
+    """Per-currency payment totals for a month, from payment_monthly_rollup and the archive.
+
+    With base, each currency's total is also converted at the rate in effect
+    on the last day of the month (rate and converted_cents are None when no
+    rate is known). The conversion happens in the same query, once per
+    currency rather than once per payment.
+    """
+    start, end = month_bounds(year, month)
+    params = {"ym": f"{year:04d}-{month:02d}", "base": base, "on": (end - timedelta(days=1)).isoformat()}
+    grouped = """
+        SELECT currency, SUM(total_cents) AS total_cents, SUM(payment_count) AS count
+        FROM (
+            SELECT currency, total_cents, payment_count FROM payment_monthly_rollup WHERE year_month = :ym
+            UNION ALL
+            SELECT currency, total_cents, payment_count FROM {archived}
+        )
+        GROUP BY currency
+    """
+    if base is None:
+        sql = grouped + " ORDER BY currency"
+    else:
+        sql = f"""
+            SELECT currency, total_cents, count, rate,
+                   CAST(ROUND(total_cents * rate) AS INTEGER) AS converted_cents
+            FROM (
+                SELECT g.*, {_FX_RATE_EXPR.format(currency="g.currency")} AS rate
+                FROM ({grouped}) AS g
+            )
+            ORDER BY currency
+        """
+    with get_connection(db_path) as conn, _archived_totals(conn, db_path, [(year, month)]) as archived:
+        return [dict(r) for r in conn.execute(sql.format(archived=archived), params)]
+
+
+# Grouping for payment_report: (key expression, label expression) over the
+# per-expense monthly totals joined to expenses.
+REPORT_GROUPINGS = {
+    "category": ("COALESCE(e.category, '')", "COALESCE(e.category, '')"),
+    "expense": ("pe.expense_id", "e.name"),
+}
+
+
+def payment_report(db_path: str, *, year: int, by: str = "category", month: Optional[int] = None) -> list[dict]:
+    """Monthly payment analytics for one year, per category or per expense.
+
+    Each row is one (month, group, currency) with total_cents, payment_count,
+    avg_cents, mom_delta_cents (change from the previous calendar month,
+    January's from the December before; a month without payments counts as
+    0) and ytd_cents (running total since January). Everything is computed
+    in a single statement with window functions over the year and the
+    December before it; month, if given, only filters the output. Archived
+    months are read from their segment's per-expense totals.
+    """
+    if by not in REPORT_GROUPINGS:
+        raise ValueError(f"Unknown report grouping: {by}. Supported: {', '.join(sorted(REPORT_GROUPINGS))}")
+    key, label = REPORT_GROUPINGS[by]
+    start, _ = month_bounds(year - 1, 12)
+    _, end = month_bounds(year, 12)
+    sql = f"""
+        WITH per_expense AS (
+            SELECT substr(paid_date, 1, 7) AS month, expense_id,
+                   SUM(amount_cents) AS total_cents, COUNT(*) AS payment_count
+            FROM payments
+            WHERE paid_date >= :start AND paid_date < :end
+            GROUP BY month, expense_id
+            UNION ALL
+            SELECT year_month, expense_id, total_cents, payment_count FROM {{archived}}
+        ),
+        grouped AS (
+            SELECT pe.month, {key} AS group_key, MIN({label}) AS label, e.currency,
+                   SUM(pe.total_cents) AS total_cents, SUM(pe.payment_count) AS payment_count,
+                   CAST(substr(pe.month, 6, 2) AS INTEGER) AS month_number,
+                   CAST(substr(pe.month, 1, 4) AS INTEGER) * 12 + CAST(substr(pe.month, 6, 2) AS INTEGER) AS month_index
+            FROM per_expense AS pe JOIN expenses AS e ON e.id = pe.expense_id
+            GROUP BY pe.month, group_key, e.currency
+        ),
+        windowed AS (
+            SELECT month, month_number, label, currency, total_cents, payment_count,
+                   CAST(ROUND(total_cents * 1.0 / payment_count) AS INTEGER) AS avg_cents,
+                   total_cents - CASE WHEN LAG(month_index) OVER w = month_index - 1
+                                      THEN LAG(total_cents) OVER w ELSE 0 END AS mom_delta_cents,
+                   SUM(CASE WHEN month >= :first THEN total_cents ELSE 0 END)
+                       OVER (w ROWS UNBOUNDED PRECEDING) AS ytd_cents
+            FROM grouped
+            WINDOW w AS (PARTITION BY group_key, currency ORDER BY month)
+        )
+        SELECT month, label, currency, total_cents, payment_count, avg_cents, mom_delta_cents, ytd_cents
+        FROM windowed
+        WHERE month >= :first AND (:month IS NULL OR month_number = :month)
+        ORDER BY month, total_cents DESC, label
+    """
+    params = {"start": start.isoformat(), "end": end.isoformat(), "first": f"{year:04d}-01", "month": month}
+    periods = [(year - 1, 12), (year, None)]
+    with get_connection(db_path) as conn, _archived_totals(conn, db_path, periods) as archived:
+        return [dict(r) for r in conn.execute(sql.format(archived=archived), params)]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, Optional
+
+from .recurrence import _DAY_STEPS, first_occurrence_after, next_after, normalize_recurrence, parse_date
+
+
+@dataclass
+class Occurrences:
+    """Every due date inside a window, as parallel arrays.
+
+    due_days holds proleptic Gregorian ordinals (date.toordinal()), so whole
+    columns can be compared, sorted or bucketed without building date objects.
+    """
+
+    expense_ids: array = field(default_factory=lambda: array("q"))
+    due_days: array = field(default_factory=lambda: array("q"))
+    amount_cents: array = field(default_factory=lambda: array("q"))
+
+    def __len__(self) -> int:
+        return len(self.due_days)
+
+    def dates(self) -> Iterator[date]:
+        return map(date.fromordinal, self.due_days)
+
+
+@dataclass
+class _Group:
+    """Expenses that share a recurrence and first due date in the window.
+
+    They all have the same schedule, which is therefore expanded only once.
+    """
+
+    days: array
+    expense_ids: array = field(default_factory=lambda: array("q"))
+    amount_cents: array = field(default_factory=lambda: array("q"))
+    categories: list[str] = field(default_factory=list)
+
+
+def schedule_days(first: date, recurrence: str, end: date) -> array:
+    """Return ordinals of first and every later occurrence on or before end."""
+    r = normalize_recurrence(recurrence)
+    if first > end:
+        return array("q")
+    if r == "none":
+        return array("q", [first.toordinal()])
+    if r in _DAY_STEPS:
+        return array("q", range(first.toordinal(), end.toordinal() + 1, _DAY_STEPS[r]))
+    days = array("q")
+    d = first
+    while d <= end:
+        days.append(d.toordinal())
+        d = next_after(d, r)
+    return days
+
+
+class Forecast:
+    """Due dates of active expenses between start and end (inclusive)."""
+
+    def __init__(self, start: date, end: date) -> None:
+        self.start = start
+        self.end = end
+        self._groups: dict[tuple[str, int], _Group] = {}
+
+    def add(self, expense_id: int, amount_cents: int, recurrence: str, next_due: date, category: str = "") -> None:
+        r = normalize_recurrence(recurrence)
+        if r == "none" or next_due >= self.start:
+            first = next_due
+        else:
+            first = first_occurrence_after(next_due, r, self.start - timedelta(days=1))
+        if first < self.start or first > self.end:
+            return
+        key = (r, first.toordinal())
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(schedule_days(first, r, self.end))
+        group.expense_ids.append(expense_id)
+        group.amount_cents.append(amount_cents)
+        group.categories.append(category)
+
+    def occurrences(self) -> Occurrences:
+        """Materialize every (expense, due date) pair, ordered by expense group."""
+        occ = Occurrences()
+        for group in self._groups.values():
+            n = len(group.days)
+            for expense_id, amount in zip(group.expense_ids, group.amount_cents):
+                occ.expense_ids.extend(array("q", [expense_id]) * n)
+                occ.amount_cents.extend(array("q", [amount]) * n)
+                occ.due_days.extend(group.days)
+        return occ
+
+    def totals_by_month(self) -> dict[str, tuple[int, int]]:
+        """Return {"YYYY-MM": (total_cents, count)} for every month in the window."""
+        months = _month_starts(self.start, self.end)
+        bounds = array("q", (date.fromisoformat(m + "-01").toordinal() for m in months))
+        totals = {m: [0, 0] for m in months}
+        for group in self._groups.values():
+            group_total = sum(group.amount_cents)
+            size = len(group.expense_ids)
+            for day in group.days:
+                bucket = totals[months[bisect_right(bounds, day) - 1]]
+                bucket[0] += group_total
+                bucket[1] += size
+        return {m: (t[0], t[1]) for m, t in totals.items()}
+
+    def totals_by_category(self) -> dict[str, tuple[int, int]]:
+        """Return {category: (total_cents, count)} over the whole window."""
+        totals: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+        for group in self._groups.values():
+            n = len(group.days)
+            for category, amount in zip(group.categories, group.amount_cents):
+                bucket = totals[category]
+                bucket[0] += amount * n
+                bucket[1] += n
+        return {c: (t[0], t[1]) for c, t in sorted(totals.items())}
+
+
+def _month_starts(start: date, end: date) -> list[str]:
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def build_forecast(
+    rows: Iterable, start: date, end: date, *, convert: Optional[Callable[[int, str], int]] = None
+) -> Forecast:
+    """Expand expense rows (as returned by db.list_expenses) into a Forecast.
+
+    convert, if given, maps (amount_cents, currency) to the amount to use,
+    e.g. fx.Converter.convert bound to a base currency and date.
+    """
+    forecast = Forecast(start, end)
+    for r in rows:
+        if not r["active"] or not r["next_due_date"]:
+            continue
+        amount = int(r["amount_cents"])
+        if convert is not None:
+            amount = convert(amount, r["currency"])
+        forecast.add(
+            int(r["id"]),
+            amount,
+            r["recurrence"],
+            parse_date(r["next_due_date"]),
+            r["category"] or "",
+        )
+    return forecast
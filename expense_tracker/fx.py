@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Union
+
+from . import db as dbm
+
+# Currency conversion for code that works one amount at a time (e.g. the
+# forecast). Reports over stored payments convert in SQL instead; see
+# db.monthly_currency_summary.
+
+
+class MissingRateError(LookupError):
+    def __init__(self, currency: str, base: str, on: str) -> None:
+        super().__init__(f"No exchange rate from {currency} to {base} on or before {on}; import one with 'import-fx'")
+        self.currency = currency
+        self.base = base
+        self.on = on
+
+
+class Converter:
+    """Converts amounts using the fx_rates table of one database.
+
+    Each (currency, base, date) rate is looked up once and kept in an LRU
+    cache, so converting many amounts in a handful of currencies costs a
+    handful of queries. Rates imported after a lookup are not seen by this
+    Converter; create a new one.
+    """
+
+    def __init__(self, db_path: str, *, cache_size: int = 4096) -> None:
+        self.db_path = db_path
+        self._rate = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, currency: str, base: str, on: str) -> Optional[float]:
+        return dbm.fx_rate(self.db_path, currency, base, on)
+
+    def rate(self, currency: str, base: str, on: Union[date, str]) -> float:
+        on = on.isoformat() if isinstance(on, date) else on
+        rate = self._rate(currency.upper(), base.upper(), on)
+        if rate is None:
+            raise MissingRateError(currency.upper(), base.upper(), on)
+        return rate
+
+    def convert(self, amount_cents: int, currency: str, base: str, on: Union[date, str]) -> int:
+        """Convert amount_cents of currency into cents of base, rounded to the nearest cent."""
+        if currency.upper() == base.upper():
+            return amount_cents
+        return round(amount_cents * self.rate(currency, base, on))
+
+    def cache_info(self):
+        return self._rate.cache_info()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import IO, Iterator, Optional
+
+# Opt-in instrumentation for the CLI's --profile/--trace-sql options.
+#
+# Nothing here costs anything unless enable() has been called: db.Database
+# only installs the profiled connection class and trace callback on
+# connections opened while a Profiler is active, and phase() hands back a
+# shared no-op context manager otherwise.
+
+_NO_PHASE = nullcontext()
+_active: Optional["Profiler"] = None
+
+
+class QueryStats:
+    __slots__ = ("sql", "calls", "rows", "seconds")
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+
+class Profiler:
+    """Collects per-statement wall time and row counts, and named phase timings.
+
+    Query time covers execute() plus every fetch from the resulting cursor, so
+    lazily consumed result sets are attributed to the statement that produced
+    them. Phase timings are inclusive and may nest.
+    """
+
+    def __init__(self, *, trace_sql: bool = False, stream: IO[str] = sys.stderr) -> None:
+        self.trace_sql = trace_sql
+        self.stream = stream
+        self.queries: dict[str, QueryStats] = {}
+        self.phases: dict[str, list] = {}
+
+    def query(self, sql: str) -> QueryStats:
+        stats = self.queries.get(sql)
+        if stats is None:
+            stats = self.queries[sql] = QueryStats(sql)
+        return stats
+
+    def on_statement(self, statement: str) -> None:
+        """sqlite3 trace callback: echo each statement as SQLite runs it."""
+        print(f"-- {statement}", file=self.stream)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": [
+                {"name": name, "calls": calls, "seconds": seconds}
+                for name, (calls, seconds) in self.phases.items()
+            ],
+            "queries": [
+                {"sql": q.sql, "calls": q.calls, "rows": q.rows, "seconds": q.seconds}
+                for q in sorted(self.queries.values(), key=lambda q: q.seconds, reverse=True)
+            ],
+        }
+
+    def print_summary(self, stream: Optional[IO[str]] = None) -> None:
+        out = stream or self.stream
+        print(f"\n{'phase':<20} {'calls':>6} {'total ms':>10}", file=out)
+        for name, (calls, seconds) in self.phases.items():
+            print(f"{name:<20} {calls:>6} {seconds * 1000:>10.2f}", file=out)
+        print(f"\n{'query':<64} {'calls':>6} {'rows':>8} {'total ms':>10}", file=out)
+        for q in sorted(self.queries.values(), key=lambda q: q.seconds, reverse=True):
+            sql = " ".join(q.sql.split())
+            if len(sql) > 64:
+                sql = sql[:61] + "..."
+            print(f"{sql:<64} {q.calls:>6} {q.rows:>8} {q.seconds * 1000:>10.2f}", file=out)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that charges execute and fetch time to the statement's QueryStats."""
+
+    _stats: Optional[QueryStats] = None
+
+    def _run(self, method, sql, parameters):
+        stats = self._stats = _active.query(sql) if _active else QueryStats(sql)
+        started = time.perf_counter()
+        try:
+            return method(sql, parameters)
+        finally:
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - started
+            if self.rowcount > 0:
+                stats.rows += self.rowcount
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self._stats is not None:
+            self._stats.seconds += time.perf_counter() - started
+            if isinstance(result, list):
+                self._stats.rows += len(result)
+            elif result is not None:
+                self._stats.rows += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def enable(*, trace_sql: bool = False, stream: IO[str] = sys.stderr) -> Profiler:
+    """Start profiling connections opened from now on. Returns the Profiler."""
+    global _active
+    _active = Profiler(trace_sql=trace_sql, stream=stream)
+    return _active
+
+
+def disable() -> None:
+    global _active
+    _active = None
+
+
+def active() -> Optional[Profiler]:
+    return _active
+
+
+def phase(name: str):
+    """Time a block as a named phase when profiling; a no-op otherwise."""
+    if _active is None:
+        return _NO_PHASE
+    return _active.phase(name)
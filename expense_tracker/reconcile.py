@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, NamedTuple, Optional
+
+from . import archive
+from . import db as dbm
+from .forecast import Occurrences, schedule_days
+from .recurrence import normalize_recurrence
+
+# Payments may be recorded up to this many days before the due date they settle.
+DEFAULT_EARLY_DAYS = 5
+# A payment more than this many days after its due date is late, and an
+# unpaid occurrence only counts as missed once this many days have passed.
+DEFAULT_GRACE_DAYS = 3
+
+
+class PaymentFinding(NamedTuple):
+    expense_id: int
+    payment_id: int
+    paid_date: date
+    due_date: Optional[date]  # None for duplicates
+
+    @property
+    def days_late(self) -> int:
+        return (self.paid_date - self.due_date).days if self.due_date else 0
+
+
+@dataclass
+class Reconciliation:
+    """Expected occurrences matched against recorded payments as of a date."""
+
+    as_of: date
+    expenses: int = 0
+    expected: int = 0
+    payments: int = 0
+    undated: int = 0  # payments left out because paid_date is not a valid date (paid_day is NULL)
+    missed: Occurrences = field(default_factory=Occurrences)
+    late: list[PaymentFinding] = field(default_factory=list)
+    duplicates: list[PaymentFinding] = field(default_factory=list)
+
+
+def _schedule_bounds(row, as_of: date) -> Optional[tuple[date, str, date]]:
+    """(first due date, recurrence, last day to check) for an expense row, or None to skip it."""
+    # Stored dates are always ISO, so the strict (and slow) parse_date isn't needed.
+    r = normalize_recurrence(row["recurrence"])
+    anchor = row["start_date"] or (row["next_due_date"] if r == "none" else None) or row["created_at"][:10]
+    first = date.fromisoformat(anchor)
+    end = as_of
+    if not row["active"] and r != "none":
+        # Cancelled: nothing was expected after it was deactivated.
+        end = min(end, date.fromisoformat(row["updated_at"][:10]))
+    return (first, r, end) if first <= end else None
+
+
+def match_expense(
+    result: Reconciliation,
+    expense_id: int,
+    amount_cents: int,
+    days,
+    payments: Iterable[tuple[int, int]],
+    *,
+    early: int,
+    grace: int,
+) -> None:
+    """Merge one expense's due days (sorted ordinals) with its (paid ordinal, payment id) pairs.
+
+    Each payment settles the most recent unpaid occurrence due on or before
+    paid + early, so a catch-up payment settles the current period first and
+    an older one only if paid again. Payments with nothing left to settle are
+    duplicates. Unpaid occurrences are kept as [lo, hi) index ranges, so a long
+    run of missed periods costs one slice, not one step per occurrence.
+    """
+    unpaid: list[list[int]] = []
+    pushed = 0
+    for paid, payment_id in payments:
+        result.payments += 1
+        due_by = bisect_right(days, paid + early, pushed)
+        if due_by > pushed:
+            unpaid.append([pushed, due_by])
+            pushed = due_by
+        if not unpaid:
+            result.duplicates.append(PaymentFinding(expense_id, payment_id, date.fromordinal(paid), None))
+            continue
+        top = unpaid[-1]
+        top[1] -= 1
+        due = days[top[1]]
+        if top[0] == top[1]:
+            unpaid.pop()
+        if paid - due > grace:
+            result.late.append(PaymentFinding(expense_id, payment_id, date.fromordinal(paid), date.fromordinal(due)))
+    unpaid.append([pushed, len(days)])
+    overdue = bisect_left(days, result.as_of.toordinal() - grace)
+    missed = result.missed
+    for lo, hi in unpaid:
+        hi = min(hi, overdue)
+        if lo < hi:
+            missed.due_days.extend(days[lo:hi])
+            missed.expense_ids.extend(array("q", [expense_id]) * (hi - lo))
+            missed.amount_cents.extend(array("q", [amount_cents]) * (hi - lo))
+
+
+def reconcile(
+    db_path: str,
+    *,
+    as_of: Optional[date] = None,
+    early: int = DEFAULT_EARLY_DAYS,
+    grace: int = DEFAULT_GRACE_DAYS,
+) -> Reconciliation:
+    """Find missed, late and duplicate payments for every expense up to as_of.
+
+    Expected occurrences run from each expense's start_date (else its
+    created_at day) through as_of, or through the day an inactive recurring
+    expense was deactivated. Expenses and payments are streamed in expense id
+    order and merge-joined, so the database is read once and nothing is
+    queried per occurrence. Schedules are shared by expenses with the same
+    recurrence and dates. Archived years are closed: their occurrences and
+    any payments still dated in them are left out, as are payments dated
+    after as_of and payments without a valid date (counted in undated).
+    """
+    as_of = as_of or date.today()
+    result = Reconciliation(as_of)
+    schedules: dict[tuple[date, str, date], object] = {}
+    archived_before = archive.archived_before(db_path)
+    since = 0 if archived_before is None else archived_before.toordinal()
+    until = as_of.toordinal()
+    result.undated = dbm.undated_payment_count(db_path)
+
+    payment_rows = dbm.iter_payment_dates(db_path)
+    expense_rows = dbm.iter_expenses(db_path)
+    try:
+        by_expense = groupby(payment_rows, key=itemgetter(0))  # (expense_id, id, paid_day)
+        pending = next(by_expense, None)
+        for row in expense_rows:
+            expense_id = row["id"]
+            while pending is not None and pending[0] < expense_id:
+                pending = next(by_expense, None)  # payments of a deleted expense
+            payments = []
+            if pending is not None and pending[0] == expense_id:
+                # paid_day is already the ordinal that schedules are built from.
+                payments = [(paid, payment_id) for _, payment_id, paid in pending[1] if paid is not None and since <= paid <= until]
+                pending = next(by_expense, None)
+
+            bounds = _schedule_bounds(row, as_of)
+            if bounds is None:
+                days = ()
+            else:
+                days = schedules.get(bounds)
+                if days is None:
+                    days = schedule_days(*bounds)
+                    if since:
+                        days = days[bisect_left(days, since):]
+                    schedules[bounds] = days
+            result.expenses += 1
+            result.expected += len(days)
+            match_expense(result, expense_id, row["amount_cents"], days, payments, early=early, grace=grace)
+    finally:
+        payment_rows.close()
+        expense_rows.close()
+    return result
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 from datetime import date, datetime, timedelta
 import calendar
-from typing import Optional
+import math
+from typing import Optional, Union
 
 
 SUPPORTED_RECURRENCES = {
@@ -15,6 +16,25 @@ SUPPORTED_RECURRENCES = {
     "yearly",
 }
 
+RECURRENCE_ALIASES = {
+    "once": "none",
+    "one-time": "none",
+    "one time": "none",
+    "oneoff": "none",
+    "one-off": "none",
+    "week": "weekly",
+    "bi-weekly": "biweekly",
+    "2w": "biweekly",
+    "mo": "monthly",
+    "month": "monthly",
+    "q": "quarterly",
+    "quarter": "quarterly",
+    "3mo": "quarterly",
+    "yr": "yearly",
+    "year": "yearly",
+    "annual": "yearly",
+}
+
 
 def normalize_recurrence(value: str) -> str:
     """Normalize a user-provided recurrence string to a supported keyword.
@@ -22,25 +42,7 @@ def normalize_recurrence(value: str) -> str:
     Raises ValueError if unsupported.
     """
     v = (value or "none").strip().lower()
-    aliases = {
-        "once": "none",
-        "one-time": "none",
-        "one time": "none",
-        "oneoff": "none",
-        "one-off": "none",
-        "week": "weekly",
-        "bi-weekly": "biweekly",
-        "2w": "biweekly",
-        "mo": "monthly",
-        "month": "monthly",
-        "q": "quarterly",
-        "quarter": "quarterly",
-        "3mo": "quarterly",
-        "yr": "yearly",
-        "year": "yearly",
-        "annual": "yearly",
-    }
-    v = aliases.get(v, v)
+    v = RECURRENCE_ALIASES.get(v, v)
     if v not in SUPPORTED_RECURRENCES:
         raise ValueError(
             f"Unsupported recurrence: {value}. Supported: {', '.join(sorted(SUPPORTED_RECURRENCES))}"
@@ -53,7 +55,16 @@ def parse_yyyy_mm(text: str) -> tuple[int, int]:
     return int(year_str), int(month_str)
 
 
+def month_bounds(year: int, month: int) -> tuple[date, date]:
+    """Return the half-open range [first day of month, first day of next month)."""
+    start = date(year, month, 1)
+    return start, add_months(start, 1)
+
+
 def parse_date(text: str) -> date:
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        # Canonical YYYY-MM-DD (every stored date): ~10x faster than strptime.
+        return date.fromisoformat(text)
     return datetime.strptime(text, "%Y-%m-%d").date()
 
 
@@ -61,6 +72,29 @@ def format_date(d: Optional[date]) -> Optional[str]:
     return d.isoformat() if d else None
 
 
+# Day numbers are proleptic Gregorian ordinals (date.toordinal(), 0001-01-01
+# is day 1). SQLite derives the same integer from ISO text with
+# day_number_sql(), which is how the *_day columns of the schema are defined.
+JULIAN_DAY_OFFSET = 1721424.5
+
+
+def day_number(value: Union[date, str]) -> int:
+    """Encode a date or a YYYY-MM-DD string as a day number."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+def from_day_number(day: int) -> date:
+    """Decode a day number back into a date."""
+    return date.fromordinal(day)
+
+
+def day_number_sql(column: str) -> str:
+    """SQL expression computing the day number of an ISO date column (NULL stays NULL)."""
+    return f"CAST(julianday({column}) - {JULIAN_DAY_OFFSET} AS INTEGER)"
+
+
 def add_months(d: date, months: int) -> date:
     year = d.year + (d.month - 1 + months) // 12
     month = (d.month - 1 + months) % 12 + 1
@@ -95,6 +129,84 @@ def next_after(d: date, recurrence: str) -> date:
     raise ValueError(f"Unsupported recurrence: {recurrence}")
 
 
+# Fixed-length periods, in days, and calendar periods, in months.
+_DAY_STEPS = {"daily": 1, "weekly": 7, "biweekly": 14}
+_MONTH_STEPS = {"monthly": 1, "quarterly": 3}
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _chained_day(d: date, step: int, k: int) -> int:
+    """Day of month after k chained add_months(d, step) calls.
+
+    Chaining clamps cumulatively (Jan 31 -> Feb 28 -> Mar 28), so the result
+    is the smallest month length seen along the way. step must divide 12,
+    which means each visited month of the year recurs periodically and every
+    February in range is visited exactly once per year.
+    """
+    day = d.day
+    if day <= 28 or k <= 0:
+        return day
+    start = _month_index(d)
+    period = 12 // math.gcd(step, 12)
+    for j in range(1, min(k, period) + 1):
+        year, month0 = divmod(start + step * j, 12)
+        if month0 == 1:
+            last_feb_year = year + (k - j) // period * (step * period // 12)
+            if last_feb_year > year or not calendar.isleap(year):
+                return 28
+            day = min(day, 29)
+        elif month0 in (3, 5, 8, 10):
+            day = min(day, 30)
+    return day
+
+
+def _chained_add_months(d: date, step: int, k: int) -> date:
+    year, month0 = divmod(_month_index(d) + step * k, 12)
+    return date(year, month0 + 1, _chained_day(d, step, k))
+
+
+def _chained_add_years(d: date, k: int) -> date:
+    # The first add_years step turns Feb 29 into Feb 28 and it stays there.
+    if k >= 1 and d.month == 2 and d.day == 29:
+        return date(d.year + k, 2, 28)
+    return d.replace(year=d.year + k)
+
+
+def first_occurrence_after(base: date, recurrence: str, after: date) -> date:
+    """Return the first date of base's schedule that is strictly after `after`.
+
+    Equivalent to calling next_after repeatedly until the date passes `after`,
+    including month-end and Feb 29 clamping, but computed in constant time.
+    If base is already after `after` (or the schedule is one-off), returns base.
+    """
+    r = normalize_recurrence(recurrence)
+    if r == "none" or base > after:
+        return base
+    if r in _DAY_STEPS:
+        step = _DAY_STEPS[r]
+        k = (after - base).days // step + 1
+        return base + timedelta(days=k * step)
+    if r in _MONTH_STEPS:
+        step = _MONTH_STEPS[r]
+        k = (_month_index(after) - _month_index(base)) // step
+        if k >= 1:
+            candidate = _chained_add_months(base, step, k)
+            if candidate > after:
+                return candidate
+        return _chained_add_months(base, step, k + 1)
+    if r == "yearly":
+        k = after.year - base.year
+        if k >= 1:
+            candidate = _chained_add_years(base, k)
+            if candidate > after:
+                return candidate
+        return _chained_add_years(base, k + 1)
+    raise ValueError(f"Unsupported recurrence: {recurrence}")
+
+
 def compute_next_due_date(
     current_due: Optional[date],
     start_date: Optional[date],
@@ -104,7 +216,7 @@ def compute_next_due_date(
     """Compute the next due date strictly after from_date for a schedule.
 
     - If recurrence is none, returns current_due or start_date.
-    - Otherwise, advances until the next due date is > from_date.
+    - Otherwise, returns the first scheduled date that is > from_date.
     """
     r = normalize_recurrence(recurrence)
     if r == "none":
@@ -114,8 +226,4 @@ def compute_next_due_date(
     if base is None:
         return None
 
-    ref = from_date or date.today()
-    next_due = base
-    while next_due <= ref:
-        next_due = next_after(next_due, r)
-    return next_due
+    return first_occurrence_after(base, r, from_date or date.today())
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, Mapping, Optional
+
+from . import db as dbm
+
+# Due-date reminders from one long-running process.
+#
+# Active expenses are loaded once into a min-heap keyed on when their
+# reminder fires: next_due_date minus the lead time, at a fixed time of day.
+# The loop sleeps until the top entry fires or the next change poll, so an
+# idle tick costs one PRAGMA data_version read and firing or re-keying an
+# expense costs O(log n). Writes from other processes (pay, add, autopay,
+# import, sync, ...) are noticed when data_version moves; the new
+# change_journal entries say which expenses changed, and only those are
+# read back and re-keyed.
+#
+# A re-keyed expense gets a new heap entry; its old one is skipped when it
+# reaches the top (lazy deletion). Every delivery is first claimed in
+# reminders_sent, so a restart, a second process or a cron job overlapping
+# with the daemon never sends the same (expense, due date) twice.
+
+DEFAULT_LEAD_DAYS = 3
+DEFAULT_AT = time(9, 0)
+DEFAULT_POLL_SECONDS = 5.0
+RETRY_SECONDS = 60.0
+
+
+class ReminderQueue:
+    """Min-heap of (fire_at, expense_id, due_date) over the active expenses."""
+
+    def __init__(self, *, lead_days: int = DEFAULT_LEAD_DAYS, at: time = DEFAULT_AT) -> None:
+        self.lead = timedelta(days=lead_days)
+        self.at = at
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._due: dict[int, str] = {}  # expense_id -> due_date of its live heap entry
+        self._rows: dict[int, dict] = {}  # expense_id -> fields a reminder shows
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def fire_at(self, due_date: str) -> datetime:
+        return datetime.combine(date.fromisoformat(due_date) - self.lead, self.at)
+
+    def load(self, rows: Iterable[Mapping]) -> None:
+        """Replace the contents with rows (expense rows), in O(n)."""
+        self._heap, self._due, self._rows = [], {}, {}
+        for row in rows:
+            self._set(row, push=self._heap.append)
+        heapq.heapify(self._heap)
+
+    def update(self, row: Mapping) -> bool:
+        """Re-key one changed expense row. Returns True if its reminder time changed."""
+        return self._set(row, push=lambda entry: heapq.heappush(self._heap, entry))
+
+    def remove(self, expense_id: int) -> bool:
+        """Forget a deleted expense. Returns True if it had a pending reminder."""
+        self._rows.pop(expense_id, None)
+        return self._due.pop(expense_id, None) is not None
+
+    def _set(self, row: Mapping, *, push: Callable[[tuple], None]) -> bool:
+        expense_id = row["id"]
+        due = row["next_due_date"] if row["active"] else None
+        if due is None:
+            return self.remove(expense_id)
+        self._rows[expense_id] = {
+            "expense_id": expense_id,
+            "name": row["name"],
+            "amount_cents": row["amount_cents"],
+            "currency": row["currency"],
+            "due_date": due,
+        }
+        if self._due.get(expense_id) == due:
+            return False
+        self._due[expense_id] = due
+        push((self.fire_at(due), expense_id, due))
+        return True
+
+    def _live(self, entry: tuple[datetime, int, str]) -> bool:
+        return self._due.get(entry[1]) == entry[2]
+
+    def next_fire(self) -> Optional[datetime]:
+        """When the earliest live reminder fires, or None if there are none."""
+        heap = self._heap
+        while heap and not self._live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: datetime) -> list[dict]:
+        """Remove and return the reminders that fire at or before now, earliest first."""
+        fired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, expense_id, due = heapq.heappop(heap)
+            if self._due.get(expense_id) != due:
+                continue
+            del self._due[expense_id]
+            reminder = dict(self._rows[expense_id])
+            reminder["days_left"] = (date.fromisoformat(due) - now.date()).days
+            fired.append(reminder)
+        if len(heap) > 2 * len(self._due) + 1024:
+            # Mostly stale entries: rebuild from the live ones.
+            self._heap = [e for e in heap if self._live(e)]
+            heapq.heapify(self._heap)
+        return fired
+
+    def retry(self, reminder: Mapping, when: datetime) -> None:
+        """Fire reminder again at when, unless its expense changes first."""
+        expense_id, due = reminder["expense_id"], reminder["due_date"]
+        if expense_id in self._rows and self._rows[expense_id]["due_date"] == due:
+            self._due[expense_id] = due
+            heapq.heappush(self._heap, (when, expense_id, due))
+
+
+# -- sinks -------------------------------------------------------------------
+#
+# A sink delivers one reminder dict; raising OSError means "not delivered,
+# try again later". New sinks are added to SINKS and named in --sink as
+# "name" or "name:argument".
+
+
+def _describe(reminder: Mapping) -> str:
+    days = reminder["days_left"]
+    if days in (0, 1):
+        when = ("today", "tomorrow")[days]
+    else:
+        when = f"in {days} days" if days > 0 else f"{-days} day{'s' if days < -1 else ''} overdue"
+    cents = reminder["amount_cents"]
+    amount = f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+    return f"{reminder['name']}: {reminder['currency']} {amount} due {reminder['due_date']} ({when})"
+
+
+class StdoutSink:
+    name = "stdout"
+
+    async def send(self, reminder: Mapping) -> None:
+        print(f"Reminder #{reminder['expense_id']} {_describe(reminder)}", flush=True)
+
+
+class FileSink:
+    """Appends one JSON object per reminder to a file."""
+
+    name = "file"
+
+    def __init__(self, argument: Optional[str] = None) -> None:
+        if not argument:
+            raise ValueError("file sink needs a path: file:PATH")
+        self.path = argument
+
+    async def send(self, reminder: Mapping) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(reminder)) + "\n")
+
+
+class WebhookSink:
+    """POSTs each reminder as JSON to a URL (e.g. a local chat or mail relay)."""
+
+    name = "webhook"
+    timeout = 10.0
+
+    def __init__(self, argument: Optional[str] = None) -> None:
+        if not argument or not argument.startswith(("http://", "https://")):
+            raise ValueError("webhook sink needs a URL: webhook:http://host:port/path")
+        self.url = argument
+
+    async def send(self, reminder: Mapping) -> None:
+        await asyncio.to_thread(self._post, {**reminder, "text": _describe(reminder)})
+
+    def _post(self, payload: dict) -> None:
+        from urllib.request import Request, urlopen  # only the webhook sink needs urllib
+
+        request = Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urlopen(request, timeout=self.timeout):  # raises HTTPError (an OSError) on 4xx/5xx
+            pass
+
+
+SINKS = {"stdout": StdoutSink, "file": FileSink, "webhook": WebhookSink}
+
+
+def make_sink(spec: str):
+    """Build a sink from "stdout", "file:PATH" or "webhook:URL"."""
+    name, _, argument = spec.partition(":")
+    if name not in SINKS:
+        raise ValueError(f"Unknown sink: {name}. Supported: {', '.join(SINKS)}")
+    return SINKS[name](argument) if argument else SINKS[name]()
+
+
+# -- runner ------------------------------------------------------------------
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+async def run_reminders(
+    db_path: str,
+    sink,
+    *,
+    lead_days: int = DEFAULT_LEAD_DAYS,
+    at: time = DEFAULT_AT,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    once: bool = False,
+    clock: Callable[[], datetime] = datetime.now,
+) -> int:
+    """Deliver reminders until cancelled (or, with once, those due now). Returns the number sent."""
+    queue = ReminderQueue(lead_days=lead_days, at=at)
+    # Taken first: a change landing during the load is read again, harmlessly.
+    seq = dbm.journal_seq(db_path)
+    queue.load(dbm.iter_expenses(db_path, include_inactive=False))
+    version = dbm.data_version(db_path)
+    if not once:
+        _log(f"Watching {len(queue)} active expenses in {db_path}; reminders {lead_days} days ahead at {at:%H:%M}")
+    sent = 0
+    while True:
+        current = dbm.data_version(db_path)
+        if current != version:
+            version = current
+            seq, rows, deleted = dbm.expense_changes(db_path, after_seq=seq)
+            changed = sum(map(queue.update, rows)) + sum(map(queue.remove, deleted))
+            if changed:
+                _log(f"Re-keyed {changed} changed expenses")
+        now = clock()
+        for reminder in queue.pop_due(now):
+            if not dbm.claim_reminder(
+                db_path, expense_id=reminder["expense_id"], due_date=reminder["due_date"], sink=sink.name
+            ):
+                continue  # already sent by an earlier run or another process
+            try:
+                await sink.send(reminder)
+            except OSError as exc:
+                dbm.release_reminder(db_path, expense_id=reminder["expense_id"], due_date=reminder["due_date"])
+                queue.retry(reminder, now + timedelta(seconds=RETRY_SECONDS))
+                _log(f"Could not send reminder for #{reminder['expense_id']} ({exc}); it will be retried")
+                continue
+            sent += 1
+        if once:
+            return sent
+        next_fire = queue.next_fire()
+        delay = poll_seconds
+        if next_fire is not None:
+            delay = min(delay, max((next_fire - clock()).total_seconds(), 0.0))
+        await asyncio.sleep(delay)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import sqlite3
+from array import array
+from itertools import islice
+from typing import Iterable, Iterator, Union
+
+
+class Record:
+    """One row of a ResultSet, read in place from its columns.
+
+    Supports the parts of sqlite3.Row the callers use: r["name"], r[0],
+    keys() and dict(r).
+    """
+
+    __slots__ = ("_result", "_index")
+
+    def __init__(self, result: "ResultSet", index: int) -> None:
+        self._result = result
+        self._index = index
+
+    def __getitem__(self, key: Union[str, int]):
+        if isinstance(key, str):
+            key = self._result._positions[key]
+        return self._result._data[key][self._index]
+
+    def keys(self) -> list[str]:
+        return list(self._result.columns)
+
+    def __len__(self) -> int:
+        return len(self._result.columns)
+
+    def __iter__(self) -> Iterator:
+        i = self._index
+        return (column[i] for column in self._result._data)
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+
+
+class ResultSet:
+    """Query results stored column by column instead of one object per row.
+
+    Integer columns (which must be NOT NULL) live in array('q'), so each cell
+    costs 8 bytes instead of a Python int. Text columns are plain lists;
+    the ones named in `repeated` (currency, method, dates, ...) share one str
+    object per distinct value.
+    """
+
+    __slots__ = ("columns", "_positions", "_data", "_memos")
+
+    def __init__(self, columns: Iterable[str], *, ints: Iterable[str] = (), repeated: Iterable[str] = ()) -> None:
+        self.columns = tuple(columns)
+        self._positions = {name: i for i, name in enumerate(self.columns)}
+        ints, repeated = set(ints), set(repeated)
+        self._data: list = [array("q") if c in ints else [] for c in self.columns]
+        self._memos = [{} if c in repeated and c not in ints else None for c in self.columns]
+
+    @classmethod
+    def from_cursor(
+        cls,
+        cur: sqlite3.Cursor,
+        *,
+        ints: Iterable[str] = (),
+        repeated: Iterable[str] = (),
+        chunk_size: int = 1000,
+    ) -> "ResultSet":
+        result = cls((d[0] for d in cur.description), ints=ints, repeated=repeated)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            result._extend(rows)
+        return result
+
+    @classmethod
+    def from_rows(
+        cls,
+        columns: Iterable[str],
+        rows: Iterable[tuple],
+        *,
+        ints: Iterable[str] = (),
+        repeated: Iterable[str] = (),
+        chunk_size: int = 1000,
+    ) -> "ResultSet":
+        """Build from any iterable of tuples (e.g. a merge of several cursors)."""
+        result = cls(columns, ints=ints, repeated=repeated)
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            result._extend(chunk)
+        return result
+
+    def _extend(self, rows: list) -> None:
+        for column, memo, values in zip(self._data, self._memos, zip(*rows)):
+            if memo is not None:
+                values = [memo.setdefault(v, v) for v in values]
+            column.extend(values)
+
+    def column(self, name: str):
+        """The whole column: an array('q') for integer columns, else a list."""
+        return self._data[self._positions[name]]
+
+    def __len__(self) -> int:
+        return len(self._data[0]) if self._data else 0
+
+    def __getitem__(self, index: int) -> Record:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ResultSet index out of range")
+        return Record(self, index)
+
+    def __iter__(self) -> Iterator[Record]:
+        return (Record(self, i) for i in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f"ResultSet(columns={self.columns!r}, rows={len(self)})"
@@ -0,0 +1,432 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http import HTTPStatus
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from . import db as dbm
+from .forecast import build_forecast
+from .fx import MissingRateError
+from .recurrence import SUPPORTED_RECURRENCES, add_months, normalize_recurrence, parse_date, parse_yyyy_mm
+
+# Long-running JSON API over HTTP/1.1 (TCP or a unix socket).
+#
+# Requests are parsed on the event loop; all SQLite work runs on a small thread
+# pool, where each worker keeps its own pooled connection (db.Database).
+# Results of the read-heavy report endpoints are cached in memory. The
+# cache is dropped whenever a write goes through this server, and when
+# PRAGMA data_version shows that another process (the CLI, cron, ...) has
+# committed since the entries were computed.
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _row(r: Optional[sqlite3.Row]) -> Optional[dict]:
+    return dict(r) if r is not None else None
+
+
+def _arg(query: dict, name: str, default: Optional[str] = None) -> Optional[str]:
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _flag(query: dict, name: str) -> bool:
+    return (_arg(query, name, "") or "").lower() in ("1", "true", "yes")
+
+
+# Parameter parsing for handlers: a bad value is a 400 that names the field,
+# rather than whatever the underlying conversion happens to say.
+
+
+def _bad(field: str, expected: str) -> ApiError:
+    return ApiError(HTTPStatus.BAD_REQUEST, f"{field}: expected {expected}")
+
+
+def _required(data: dict, field: str) -> Any:
+    if data.get(field) in (None, ""):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{field}: required")
+    return data[field]
+
+
+def _int(value: Any, field: str) -> int:
+    if isinstance(value, (bool, float)):
+        raise _bad(field, "an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise _bad(field, "an integer") from None
+
+
+def _date(value: Any, field: str) -> date:
+    try:
+        return parse_date(value)
+    except (TypeError, ValueError):
+        raise _bad(field, "YYYY-MM-DD") from None
+
+
+def _yyyy_mm(value: Any, field: str) -> tuple[int, int]:
+    try:
+        year, month = parse_yyyy_mm(value)
+    except (AttributeError, ValueError):
+        raise _bad(field, "YYYY-MM") from None
+    if not (1 <= year <= 9999 and 1 <= month <= 12):
+        raise _bad(field, "YYYY-MM")
+    return year, month
+
+
+class ApiServer:
+    """Serves the CLI's operations as JSON endpoints for one database."""
+
+    def __init__(self, db_path: str, *, workers: int = 4) -> None:
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="expense-db")
+        self._cache: dict[tuple, Any] = {}
+        self._generation = 0
+        self._data_version: Optional[int] = None
+        # (method, path) -> (handler, kind); kind is "read", "cached" or "write".
+        self._routes: dict[tuple[str, str], tuple[Callable[[dict, dict], Any], str]] = {
+            ("GET", "/health"): (self._health, "read"),
+            ("GET", "/expenses"): (self._list_expenses, "read"),
+            ("GET", "/search"): (self._search, "read"),
+            ("GET", "/upcoming"): (self._upcoming, "cached"),
+            ("GET", "/month"): (self._month, "cached"),
+            ("GET", "/forecast"): (self._forecast, "cached"),
+            ("GET", "/report"): (self._report, "cached"),
+            ("GET", "/payments"): (self._payments, "read"),
+            ("POST", "/expenses"): (self._add_expense, "write"),
+            ("POST", "/pay"): (self._pay, "write"),
+            ("POST", "/pay-batch"): (self._pay_batch, "write"),
+            ("POST", "/rebuild-rollups"): (self._rebuild_rollups, "write"),
+        }
+
+    # -- request handling -------------------------------------------------
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request line"}, False)
+                    break
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, payload: Any, keep_alive: bool) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple[HTTPStatus, Any]:
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        query = parse_qs(parts.query)
+        route = self._routes.get((method, path))
+        if route is None and method == "GET" and path.startswith("/expenses/"):
+            route = (self._get_expense, "read")
+            query = {**query, "id": [path.rsplit("/", 1)[1]]}
+        if route is None:
+            known = any(p == path for _, p in self._routes)
+            status = HTTPStatus.METHOD_NOT_ALLOWED if known else HTTPStatus.NOT_FOUND
+            return status, {"error": f"{method} {path} not supported"}
+        handler, kind = route
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+            if kind == "cached":
+                result = await self._cached((path, parts.query, date.today()), handler, query, data)
+            else:
+                result = await self._run(handler, query, data)
+                if kind == "write":
+                    self._invalidate()
+        except ApiError as exc:
+            return exc.status, {"error": str(exc)}
+        except MissingRateError as exc:
+            # A valid request the stored rates cannot answer yet.
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(exc)}
+        except (ValueError, LookupError, TypeError) as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except sqlite3.Error as exc:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc)}
+        except Exception as exc:
+            # Answer rather than drop the connection; the server keeps running.
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+        return HTTPStatus.OK, result
+
+    async def _run(self, handler: Callable[[dict, dict], Any], query: dict, data: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, handler, query, data)
+
+    async def _cached(self, key: tuple, handler: Callable[[dict, dict], Any], query: dict, data: dict) -> Any:
+        # Read on the event loop thread, so it is always the same connection
+        # (data_version values of different connections are not comparable).
+        # That connection never writes, so every commit moves it.
+        version = dbm.data_version(self.db_path)
+        if version != self._data_version:
+            self._invalidate()
+            self._data_version = version
+        if key in self._cache:
+            return self._cache[key]
+        generation = self._generation
+        result = await self._run(handler, query, data)
+        # Don't store a result computed while a write was landing.
+        if generation == self._generation:
+            self._cache[key] = result
+        return result
+
+    def _invalidate(self) -> None:
+        self._generation += 1
+        self._cache.clear()
+
+    # -- endpoints (run on the worker threads) -----------------------------
+
+    def _health(self, query: dict, data: dict) -> dict:
+        return {"status": "ok", "db": self.db_path}
+
+    def _list_expenses(self, query: dict, data: dict) -> list:
+        rows = dbm.list_expenses(self.db_path, include_inactive=_flag(query, "all") or _flag(query, "inactive"))
+        return [dict(r) for r in rows]
+
+    def _get_expense(self, query: dict, data: dict) -> dict:
+        row = self._resolve(_arg(query, "id") or "", closest=True)
+        return dict(row)
+
+    def _search(self, query: dict, data: dict) -> list:
+        limit = _int(_arg(query, "limit", "10"), "limit")
+        rows = dbm.search_expenses(self.db_path, _arg(query, "q", "") or "", limit=limit)
+        return [dict(r) for r in rows]
+
+    def _upcoming(self, query: dict, data: dict) -> list:
+        cutoff = date.today() + timedelta(days=_int(_arg(query, "days", "30"), "days"))
+        return [dict(r) for r in dbm.upcoming_expenses(self.db_path, until_date=cutoff.isoformat())]
+
+    def _month(self, query: dict, data: dict) -> dict:
+        month = _arg(query, "month")
+        year, mon = _yyyy_mm(month, "month") if month else (date.today().year, date.today().month)
+        base = _arg(query, "base")
+        base = base.upper() if base else None
+        by_currency = dbm.monthly_currency_summary(self.db_path, year=year, month=mon, base=base)
+        result = {"month": f"{year:04d}-{mon:02d}", "by_currency": by_currency}
+        # Like `month`: a total only when it is in one currency.
+        if base:
+            converted = [r for r in by_currency if r["rate"] is not None]
+            result.update(
+                base=base,
+                total_cents=sum(r["converted_cents"] for r in converted),
+                count=sum(r["count"] for r in converted),
+                missing_rates=[r["currency"] for r in by_currency if r["rate"] is None],
+            )
+        elif len(by_currency) <= 1:
+            result["total_cents"] = by_currency[0]["total_cents"] if by_currency else 0
+            result["count"] = by_currency[0]["count"] if by_currency else 0
+        return result
+
+    def _forecast(self, query: dict, data: dict) -> dict:
+        start = _date(_arg(query, "start"), "start") if _arg(query, "start") else date.today()
+        months = _int(_arg(query, "months", "12"), "months")
+        if months < 1:
+            raise _bad("months", "a positive integer")
+        end = add_months(start, months) - timedelta(days=1)
+        forecast = build_forecast(dbm.list_expenses(self.db_path), start, end)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "by_month": {m: {"total_cents": t, "count": n} for m, (t, n) in forecast.totals_by_month().items()},
+            "by_category": {c: {"total_cents": t, "count": n} for c, (t, n) in forecast.totals_by_category().items()},
+        }
+
+    def _report(self, query: dict, data: dict) -> list:
+        month = _arg(query, "month")
+        if month:
+            year, mon = _yyyy_mm(month, "month")
+        else:
+            year, mon = _int(_arg(query, "year", str(date.today().year)), "year"), None
+        by = _arg(query, "by", "category")
+        if by not in dbm.REPORT_GROUPINGS:
+            raise _bad("by", " or ".join(sorted(dbm.REPORT_GROUPINGS)))
+        return dbm.payment_report(self.db_path, year=year, by=by, month=mon)
+
+    def _payments(self, query: dict, data: dict) -> list:
+        expense_id = _arg(query, "expense_id")
+        month = _arg(query, "month")
+        if month:
+            month = "{:04d}-{:02d}".format(*_yyyy_mm(month, "month"))
+        date_from, date_to = _arg(query, "from"), _arg(query, "to")
+        limit = _arg(query, "limit")
+        after = _arg(query, "after")
+        after_key = None
+        if after:
+            paid_date, _, payment_id = after.rpartition(":")
+            if not paid_date or not payment_id.isdigit():
+                raise _bad("after", "PAID_DATE:ID")
+            after_key = (_date(paid_date, "after").isoformat(), int(payment_id))
+        rows = dbm.list_payments(
+            self.db_path,
+            expense_id=_int(expense_id, "expense_id") if expense_id else None,
+            year_month=month,
+            date_from=_date(date_from, "from").isoformat() if date_from else None,
+            date_to=_date(date_to, "to").isoformat() if date_to else None,
+            limit=_int(limit, "limit") if limit else None,
+            offset=_int(_arg(query, "offset", "0"), "offset"),
+            after=after_key,
+        )
+        return [dict(r) for r in rows]
+
+    def _add_expense(self, query: dict, data: dict) -> dict:
+        name = _required(data, "name")
+        amount_cents = _int(_required(data, "amount_cents"), "amount_cents")
+        try:
+            recurrence = normalize_recurrence(data.get("recurrence", "monthly"))
+        except (AttributeError, ValueError):
+            raise _bad("recurrence", "one of " + ", ".join(sorted(SUPPORTED_RECURRENCES))) from None
+        start = _date(data["start_date"], "start_date") if data.get("start_date") else None
+        next_due = _date(data["next_due_date"], "next_due_date") if data.get("next_due_date") else None
+        if next_due is None:
+            next_due = start if recurrence == "none" else (start or date.today())
+        expense_id = dbm.add_expense(
+            self.db_path,
+            name=str(name),
+            amount_cents=amount_cents,
+            currency=data.get("currency", "USD"),
+            category=data.get("category"),
+            recurrence=recurrence,
+            start_date=start.isoformat() if start else None,
+            next_due_date=next_due.isoformat() if next_due else None,
+            notes=data.get("notes"),
+            active=True,
+            autopay=bool(data.get("autopay", False)),
+        )
+        return _row(dbm.get_expense_by_id(self.db_path, expense_id))
+
+    def _pay(self, query: dict, data: dict) -> dict:
+        row = self._resolve(str(_required(data, "expense")))
+        result = dbm.pay_expense(
+            self.db_path,
+            int(row["id"]),
+            paid_date=_date(data["date"], "date").isoformat() if data.get("date") else date.today().isoformat(),
+            amount_cents=_int(data["amount_cents"], "amount_cents") if data.get("amount_cents") is not None else None,
+            method=data.get("method"),
+            notes=data.get("notes"),
+        )
+        if result is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Expense not found: {data['expense']}")
+        return result
+
+    def _pay_batch(self, query: dict, data: dict) -> list:
+        paid_date = _date(data["date"], "date").isoformat() if data.get("date") else date.today().isoformat()
+        if data.get("expenses"):
+            if not isinstance(data["expenses"], list):
+                raise _bad("expenses", "a list of expense ids or names")
+            ids = [int(self._resolve(str(e))["id"]) for e in data["expenses"]]
+            return dbm.pay_expenses(
+                self.db_path, expense_ids=ids, paid_date=paid_date, method=data.get("method"), notes=data.get("notes")
+            )
+        if data.get("all_due"):
+            through = _date(data["through"], "through").isoformat() if data.get("through") else date.today().isoformat()
+            return dbm.pay_expenses(
+                self.db_path, due_through=through, paid_date=paid_date, method=data.get("method"), notes=data.get("notes")
+            )
+        raise ApiError(HTTPStatus.BAD_REQUEST, "give 'expenses' or 'all_due'")
+
+    def _rebuild_rollups(self, query: dict, data: dict) -> dict:
+        return {"rows": dbm.rebuild_rollups(self.db_path)}
+
+    def _resolve(self, identifier: str, *, closest: bool = False) -> sqlite3.Row:
+        """The expense with this id or exact (case-insensitive) name.
+
+        With closest (read-only endpoints), a single search match is used when
+        nothing matches exactly; otherwise search matches only go into the error.
+        """
+        if identifier.isdigit():
+            row = dbm.get_expense_by_id(self.db_path, int(identifier))
+            if row is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Expense not found: {identifier}")
+            return row
+        row = dbm.get_expense_by_name(self.db_path, identifier)
+        if row is not None:
+            return row
+        matches = dbm.search_expenses(self.db_path, identifier, limit=5)
+        if closest and len(matches) == 1:
+            return matches[0]
+        message = f"Expense not found: {identifier}"
+        if matches:
+            message += "; did you mean: " + ", ".join(f"#{m['id']} {m['name']}" for m in matches)
+        raise ApiError(HTTPStatus.NOT_FOUND, message)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+async def serve(
+    db_path: str,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[str] = None,
+    workers: int = 4,
+    ready: Optional[Callable[[str], None]] = None,
+) -> None:
+    """Run the API until cancelled. ready, if given, is called with the address."""
+    api = ApiServer(db_path, workers=workers)
+    # Open the schema (and run any migrations) before accepting requests.
+    await api._run(lambda q, d: dbm.get_connection(db_path), {}, {})
+    if unix_socket:
+        server = await asyncio.start_unix_server(api.handle_connection, path=unix_socket)
+        address = f"unix:{unix_socket}"
+    else:
+        server = await asyncio.start_server(api.handle_connection, host=host, port=port)
+        bound = server.sockets[0].getsockname()
+        address = f"http://{bound[0]}:{bound[1]}"
+    try:
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from . import db as dbm
+
+# Two-way sync between copies of a ledger, driven by change_journal.
+#
+# Each database is a node with a random id (sync_node). sync(source,
+# target) reads the source journal after the last entry the target applied
+# from that node (sync_peers), keeps the newest entry per row, reads the
+# current state of those rows and applies it to the target in one write
+# transaction. The work is proportional to the number of changes, not to
+# the size of either database.
+#
+# Rows are matched by uuid. Expenses are last-writer-wins on updated_at
+# (a tie keeps the larger row image, so both sides settle on the same one);
+# payments are never edited, so an incoming payment is only inserted. A
+# delete wins unless the row was edited after it. Rows the target deleted
+# itself are not brought back by older changes from a peer.
+#
+# The target journals what it applies like any other write, with origin
+# set to the source node, and sync never sends a node its own changes back.
+# Each side also records how far the other has applied its journal
+# (sent_seq): the source after the sync, the target from the source's
+# sync_peers. archive checks it so it never moves away a change a peer lacks.
+#
+# A new node starts as a copy of an existing database file, given its own
+# id with `sync new-id`; only changes made after the copy are exchanged.
+
+_EXPENSE_SYNC_COLUMNS = tuple(c for c in dbm.EXPENSE_COLUMNS if c != "id")
+_PAYMENT_SYNC_COLUMNS = ("amount_cents", "paid_date", "method", "notes", "created_at")
+_CHUNK_SIZE = 500
+
+
+@dataclass
+class SyncResult:
+    source: str
+    target: str
+    first_seq: int  # source journal entries read: first_seq < seq <= last_seq
+    last_seq: int
+    changes: int = 0  # rows changed in that range (not counting the target's own changes)
+    expenses_added: int = 0
+    expenses_updated: int = 0
+    payments_added: int = 0
+    deleted: int = 0
+    kept: int = 0  # incoming changes that lost to a newer local change
+
+
+def _chunks(items: list, size: int = _CHUNK_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _by_key(conn: sqlite3.Connection, sql: str, keys: Iterable) -> dict[bytes, sqlite3.Row]:
+    """{first column: row} for `sql` (which ends in "IN ({})") run over keys, in chunks."""
+    found = {}
+    for chunk in _chunks(list(keys)):
+        for row in conn.execute(sql.format(_placeholders(chunk)), chunk):
+            found[row[0]] = row
+    return found
+
+
+def _image(row: sqlite3.Row) -> str:
+    # Total order on expense states, for breaking updated_at ties.
+    return json.dumps([row[c] for c in _EXPENSE_SYNC_COLUMNS])
+
+
+def sync(source: str, target: str) -> SyncResult:
+    """Apply the changes of source not yet seen by target to target."""
+    source_node, target_node = dbm.node_id(source), dbm.node_id(target)
+    if source_node == target_node:
+        raise ValueError(
+            f"{source} and {target} have the same sync node id (one is a copy of the other); "
+            "run `sync new-id` on the copy first"
+        )
+    # The target's write lock is held throughout, so two syncs into one
+    # database cannot apply the same range of the source journal twice.
+    with dbm.write_transaction(target) as conn:
+        seen = conn.execute("SELECT last_seq FROM sync_peers WHERE node = ?", (source_node,)).fetchone()
+        after = seen[0] if seen else 0
+        last, expenses, payments, deletes, sent = _read_changes(source, after=after, skip_origin=target_node)
+        changes = len(expenses) + len(payments) + len(deletes["expenses"]) + len(deletes["payments"])
+        result = SyncResult(source=source, target=target, first_seq=after, last_seq=last, changes=changes)
+        seq_before = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+        added = _apply_expenses(conn, expenses, result)
+        _apply_payments(conn, payments, added, result)
+        kept = _apply_deletes(conn, deletes, result)
+        conn.execute("UPDATE change_journal SET origin = ? WHERE seq > ?", (source_node, seq_before))
+        _rejournal(conn, kept)
+        conn.execute(
+            """
+            INSERT INTO sync_peers (node, last_seq, sent_seq, synced_at)
+            VALUES (?, ?, ?, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+            ON CONFLICT(node) DO UPDATE SET
+                last_seq = excluded.last_seq,
+                sent_seq = MAX(sent_seq, excluded.sent_seq),
+                synced_at = excluded.synced_at
+            """,
+            (source_node, last, sent),
+        )
+    # Afterwards, so a failed sync is never recorded as sent.
+    with dbm.write_transaction(source) as conn:
+        conn.execute(
+            """
+            INSERT INTO sync_peers (node, last_seq, sent_seq, synced_at)
+            VALUES (?, 0, ?, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+            ON CONFLICT(node) DO UPDATE SET sent_seq = MAX(sent_seq, excluded.sent_seq), synced_at = excluded.synced_at
+            """,
+            (target_node, last),
+        )
+    return result
+
+
+def _read_changes(source: str, *, after: int, skip_origin: str) -> tuple:
+    """(last seq, expense rows, payment rows, deletes, seen) of source's journal after seq `after`, from one snapshot.
+
+    Rows are keyed by uuid; deletes are {table: {uuid: changed_at}}.
+    Entries that came from node skip_origin are left out; seen is how far
+    source has applied skip_origin's journal.
+    """
+    with dbm.read_transaction(source) as conn:
+        seen = conn.execute("SELECT last_seq FROM sync_peers WHERE node = ?", (skip_origin,)).fetchone()
+        last = conn.execute("SELECT COALESCE(MAX(seq), ?) FROM change_journal", (after,)).fetchone()[0]
+        # Upserts by row id (the current row is read, so several entries for
+        # one row are one change); deletes by uuid, as the row is gone.
+        upserts: dict[str, set[int]] = {"expenses": set(), "payments": set()}
+        deletes: dict[str, dict[bytes, str]] = {"expenses": {}, "payments": {}}
+        for entry in conn.execute(
+            """
+            SELECT table_name, row_id, row_uuid, op, changed_at FROM change_journal
+            WHERE seq > ? AND seq <= ? AND (origin IS NULL OR origin != ?)
+            """,
+            (after, last, skip_origin),
+        ):
+            if entry["op"] == "delete":
+                deletes[entry["table_name"]][entry["row_uuid"]] = entry["changed_at"]
+            else:
+                upserts[entry["table_name"]].add(entry["row_id"])
+        expenses = _by_key(
+            conn,
+            f"SELECT uuid, {', '.join(_EXPENSE_SYNC_COLUMNS)} FROM expenses WHERE id IN ({{}})",
+            upserts["expenses"],
+        )
+        payments = _by_key(
+            conn,
+            f"""
+            SELECT p.uuid, e.uuid AS expense_uuid, {', '.join('p.' + c for c in _PAYMENT_SYNC_COLUMNS)}
+            FROM payments p JOIN expenses e ON e.id = p.expense_id
+            WHERE p.id IN ({{}})
+            """,
+            upserts["payments"],
+        )
+    return last, expenses, payments, deletes, seen[0] if seen else 0
+
+
+def _deleted_at(conn: sqlite3.Connection, uuids: Iterable[bytes]) -> dict[bytes, str]:
+    """{uuid: when it was last deleted here} for the uuids this database has deleted."""
+    found = {}
+    for chunk in _chunks(list(uuids)):
+        found.update(
+            conn.execute(
+                f"""
+                SELECT row_uuid, MAX(changed_at) FROM change_journal
+                WHERE op = 'delete' AND row_uuid IN ({_placeholders(chunk)})
+                GROUP BY row_uuid
+                """,
+                chunk,
+            ).fetchall()
+        )
+    return found
+
+
+def _apply_expenses(conn: sqlite3.Connection, incoming: dict[bytes, sqlite3.Row], result: SyncResult) -> set[bytes]:
+    """Insert or update incoming expenses; returns the uuids of those inserted."""
+    fields = ", ".join(_EXPENSE_SYNC_COLUMNS)
+    local = _by_key(conn, f"SELECT uuid, id, {fields} FROM expenses WHERE uuid IN ({{}})", incoming)
+    deleted = _deleted_at(conn, (u for u in incoming if u not in local))
+    inserts, updates = [], []
+    for row_uuid, row in incoming.items():
+        values = [row[c] for c in _EXPENSE_SYNC_COLUMNS]
+        mine = local.get(row_uuid)
+        if mine is None:
+            if row_uuid in deleted and deleted[row_uuid] >= row["updated_at"]:
+                result.kept += 1
+            else:
+                inserts.append([row_uuid, *values])
+        elif (row["updated_at"], _image(row)) > (mine["updated_at"], _image(mine)):
+            updates.append([*values, mine["id"]])
+        elif _image(row) != _image(mine):
+            result.kept += 1
+    conn.executemany(
+        f"INSERT INTO expenses (uuid, {fields}) VALUES (?, {_placeholders(_EXPENSE_SYNC_COLUMNS)})", inserts
+    )
+    conn.executemany(
+        f"UPDATE expenses SET {', '.join(c + ' = ?' for c in _EXPENSE_SYNC_COLUMNS)} WHERE id = ?", updates
+    )
+    result.expenses_added += len(inserts)
+    result.expenses_updated += len(updates)
+    return {row[0] for row in inserts}
+
+
+def _apply_payments(
+    conn: sqlite3.Connection, incoming: dict[bytes, sqlite3.Row], added: set[bytes], result: SyncResult
+) -> None:
+    # A payment deleted here stays deleted, unless its expense was just
+    # added back: then the delete was the cascade of deleting the expense.
+    present = _by_key(conn, "SELECT uuid FROM payments WHERE uuid IN ({})", incoming)
+    expense_ids = {
+        row_uuid: row["id"]
+        for row_uuid, row in _by_key(
+            conn,
+            "SELECT uuid, id FROM expenses WHERE uuid IN ({})",
+            {row["expense_uuid"] for row in incoming.values()},
+        ).items()
+    }
+    deleted = _deleted_at(conn, (u for u in incoming if u not in present))
+    inserts = []
+    for row_uuid, row in incoming.items():
+        if row_uuid in present:
+            continue
+        expense_id = expense_ids.get(row["expense_uuid"])
+        if expense_id is None or (row_uuid in deleted and row["expense_uuid"] not in added):
+            result.kept += 1  # its expense, or the payment itself, was deleted here
+            continue
+        inserts.append([row_uuid, expense_id, *(row[c] for c in _PAYMENT_SYNC_COLUMNS)])
+    conn.executemany(
+        f"""
+        INSERT INTO payments (uuid, expense_id, {', '.join(_PAYMENT_SYNC_COLUMNS)})
+        VALUES (?, ?, {_placeholders(_PAYMENT_SYNC_COLUMNS)})
+        """,
+        inserts,
+    )
+    result.payments_added += len(inserts)
+
+
+def _apply_deletes(conn: sqlite3.Connection, deletes: dict[str, dict[bytes, str]], result: SyncResult) -> list[int]:
+    """Apply deletes; returns the ids of expenses kept because they were edited here after the delete."""
+    # A kept expense keeps its payments too (the peer's delete cascaded to
+    # them and journaled them as well).
+    kept_expenses = set()
+    if deletes["expenses"]:
+        local = _by_key(conn, "SELECT uuid, id, updated_at FROM expenses WHERE uuid IN ({})", deletes["expenses"])
+        doomed = []
+        for row_uuid, row in local.items():
+            if row["updated_at"] > deletes["expenses"][row_uuid]:
+                kept_expenses.add(row["id"])
+                result.kept += 1
+            else:
+                doomed.append(row["id"])
+        for chunk in _chunks(doomed):
+            conn.execute(f"DELETE FROM expenses WHERE id IN ({_placeholders(chunk)})", chunk)
+        result.deleted += len(doomed)
+    if deletes["payments"]:
+        local = _by_key(conn, "SELECT uuid, id, expense_id FROM payments WHERE uuid IN ({})", deletes["payments"])
+        doomed = [row["id"] for row in local.values() if row["expense_id"] not in kept_expenses]
+        for chunk in _chunks(doomed):
+            conn.execute(f"DELETE FROM payments WHERE id IN ({_placeholders(chunk)})", chunk)
+        result.deleted += len(doomed)
+        result.kept += len(local) - len(doomed)
+    return sorted(kept_expenses)
+
+
+def _rejournal(conn: sqlite3.Connection, expense_ids: list[int]) -> None:
+    """Journal kept expenses and their payments again as local changes, so the peer that deleted them gets them back."""
+    for chunk in _chunks(expense_ids):
+        marks = _placeholders(chunk)
+        conn.execute(
+            f"""
+            INSERT INTO change_journal (table_name, row_id, row_uuid, op, changed_at)
+            SELECT 'expenses', id, uuid, 'upsert', strftime('%Y-%m-%dT%H:%M:%SZ', 'now') FROM expenses WHERE id IN ({marks})
+            UNION ALL
+            SELECT 'payments', id, uuid, 'upsert', strftime('%Y-%m-%dT%H:%M:%SZ', 'now') FROM payments
+            WHERE expense_id IN ({marks})
+            """,
+            chunk + chunk,
+        )
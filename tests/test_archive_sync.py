@@ -0,0 +1,71 @@
+"""archive refuses to move payments whose changes a sync peer has not received."""
+
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import archive
+from expense_tracker import db as dbm
+from expense_tracker.sync import sync
+
+
+class ArchiveUnsyncedTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.a = str(Path(self._tmp.name) / "a.db")
+        self.b = str(Path(self._tmp.name) / "b.db")
+        dbm.bulk_insert_expenses(
+            self.a,
+            [{"name": "Rent", "amount_cents": 100000, "currency": "USD", "recurrence": "monthly",
+              "next_due_date": "2020-01-01"}],
+        )
+        self.pay(self.a, "2020-01-01")
+        with sqlite3.connect(self.a) as src, sqlite3.connect(self.b) as dst:
+            src.backup(dst)
+        dbm.reset_node_id(self.b)
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def pay(self, db_path: str, paid_date: str) -> None:
+        expense_id = dbm.get_expense_by_name(db_path, "Rent")["id"]
+        dbm.record_payment(db_path, expense_id=expense_id, amount_cents=100000, paid_date=paid_date)
+
+    def paid_dates(self, db_path: str) -> list[str]:
+        with dbm.get_connection(db_path) as conn:
+            return [r[0] for r in conn.execute("SELECT paid_date FROM payments ORDER BY paid_date")]
+
+    def test_unsynced_payment_blocks_archive_until_pushed(self):
+        self.pay(self.a, "2021-03-01")
+        sync(self.a, self.b)
+        self.pay(self.a, "2021-04-01")
+        with self.assertRaisesRegex(ValueError, "1 payments dated before 2022"):
+            archive.archive_payments(self.a, before_year=2022)
+        self.assertEqual(len(self.paid_dates(self.a)), 3)
+        self.assertEqual(archive.segments(self.a), [])
+
+        sync(self.a, self.b)
+        self.assertEqual([w["rows"] for w in archive.archive_payments(self.a, before_year=2022)], [1, 2])
+        self.assertEqual(self.paid_dates(self.b), ["2020-01-01", "2021-03-01", "2021-04-01"])
+
+    def test_changes_pulled_from_the_peer_do_not_block(self):
+        self.pay(self.b, "2021-05-01")
+        sync(self.b, self.a)
+        self.assertEqual(len(archive.archive_payments(self.a, before_year=2022)), 2)
+
+    def test_copy_does_not_archive_before_its_first_push(self):
+        self.pay(self.b, "2021-05-01")
+        with self.assertRaisesRegex(ValueError, "1 payments"):
+            archive.archive_payments(self.b, before_year=2022)
+
+    def test_database_without_peers_archives(self):
+        self.pay(self.a, "2021-05-01")
+        self.assertEqual(len(archive.archive_payments(self.a, before_year=2022)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
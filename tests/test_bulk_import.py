@@ -0,0 +1,56 @@
+"""Bulk imports store dates as YYYY-MM-DD or reject the whole file."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import db as dbm
+
+
+class BulkImportDatesTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "import.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [{"name": "Rent", "amount_cents": "100000", "recurrence": "monthly", "start_date": "2024-1-1",
+              "next_due_date": "2024-02-01"}],
+        )
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def query(self, sql: str) -> list[tuple]:
+        with dbm.get_connection(self.db_path) as conn:
+            return [tuple(r) for r in conn.execute(sql)]
+
+    def test_dates_are_normalized(self):
+        dbm.bulk_insert_payments(self.db_path, [{"expense_id": "1", "amount_cents": "100000", "paid_date": "2024-1-5"}])
+        self.assertEqual(self.query("SELECT start_date, next_due_date FROM expenses"), [("2024-01-01", "2024-02-01")])
+        self.assertEqual(self.query("SELECT paid_date, paid_day IS NOT NULL FROM payments"), [("2024-01-05", 1)])
+        self.assertEqual(self.query("SELECT year_month FROM payment_monthly_rollup"), [("2024-01",)])
+
+    def test_bad_payment_date_rejects_the_file(self):
+        rows = [
+            {"expense_id": "1", "amount_cents": "100000", "paid_date": "2024-01-01"},
+            {"expense_id": "1", "amount_cents": "100000", "paid_date": "01/02/2024"},
+        ]
+        with self.assertRaisesRegex(ValueError, r"row 2: paid_date: expected YYYY-MM-DD, got '01/02/2024'"):
+            dbm.bulk_insert_payments(self.db_path, rows)
+        with self.assertRaisesRegex(ValueError, "row 1: paid_date is required"):
+            dbm.bulk_insert_payments(self.db_path, [{"expense_id": "1", "amount_cents": "1", "paid_date": ""}])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM payments"), [(0,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM payment_monthly_rollup"), [(0,)])
+
+    def test_bad_expense_date_rejects_the_file(self):
+        rows = [{"name": "Gym", "amount_cents": "4000", "next_due_date": "2024-13-01"}]
+        with self.assertRaisesRegex(ValueError, "row 1: next_due_date"):
+            dbm.bulk_insert_expenses(self.db_path, rows)
+        self.assertEqual(self.query("SELECT name FROM expenses"), [("Rent",)])
+
+
+if __name__ == "__main__":
+    unittest.main()
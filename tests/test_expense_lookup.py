@@ -0,0 +1,72 @@
+"""Commands that write act only on an exact expense id or name."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import cli
+from expense_tracker import db as dbm
+
+
+class WriteLookupTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "lookup.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [
+                {"name": "Rent", "amount_cents": 100000, "currency": "USD", "recurrence": "monthly",
+                 "category": "Housing", "next_due_date": "2024-01-01"},
+                {"name": "Gym", "amount_cents": 4000, "currency": "USD", "recurrence": "monthly",
+                 "next_due_date": "2024-01-05"},
+                {"name": "Car Insurance", "amount_cents": 9000, "currency": "USD", "recurrence": "monthly",
+                 "next_due_date": "2024-01-09"},
+            ],
+        )
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def run_cli(self, *argv: str) -> tuple[int, str, str]:
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                code = cli.main(["--db", self.db_path, *argv])
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+                if isinstance(exc.code, str):
+                    err.write(exc.code)
+        return code, out.getvalue(), err.getvalue()
+
+    def payment_count(self) -> int:
+        with dbm.get_connection(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+
+    def test_inexact_names_do_not_write(self):
+        for command in (["pay", "housing"], ["pay", "Gim"], ["pay", "car"], ["pay-batch", "Gim"], ["autopay", "on", "car"]):
+            code, _, err = self.run_cli(*command)
+            self.assertEqual(code, 1, command)
+            self.assertIn("Expense not found", err)
+            self.assertIn("Did you mean", err)
+        self.assertEqual(self.payment_count(), 0)
+        self.assertEqual(dbm.get_expense_by_id(self.db_path, 3)["autopay"], 0)
+
+    def test_exact_id_and_name_write(self):
+        self.assertEqual(self.run_cli("pay", "gym")[0], 0)
+        self.assertEqual(self.run_cli("pay", "3")[0], 0)
+        self.assertEqual(self.payment_count(), 2)
+
+    def test_read_only_lookup_uses_single_match(self):
+        self.run_cli("pay", "Gym")
+        code, out, _ = self.run_cli("payments", "--name", "Gim")
+        self.assertEqual(code, 0)
+        self.assertIn("Using closest match: #2 Gym", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""A failing migration leaves the schema and user_version as they were."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from expense_tracker import db as dbm
+
+DAY_NUMBERS = dbm.MIGRATIONS.index(dbm._migrate_day_numbers)
+
+
+def _columns(conn, table: str) -> set[str]:
+    return {r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+
+def _fail(cur) -> None:
+    raise RuntimeError("migration step failed")
+
+
+class MigrationRollbackTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "old.db")
+        # A database from just before the day-number columns.
+        self.database = dbm.Database(self.db_path, auto_migrate=False)
+        conn = self.database.connection()
+        with mock.patch.object(dbm, "MIGRATIONS", dbm.MIGRATIONS[:DAY_NUMBERS]), \
+                mock.patch.object(dbm, "SCHEMA_VERSION", DAY_NUMBERS):
+            dbm._apply_migrations(conn)
+
+    def tearDown(self):
+        self.database.close()
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def test_failure_after_day_numbers_rolls_back_everything(self):
+        conn = self.database.connection()
+        steps = list(dbm.MIGRATIONS)
+        steps[DAY_NUMBERS + 2] = _fail
+        with mock.patch.object(dbm, "MIGRATIONS", steps):
+            with self.assertRaisesRegex(RuntimeError, "migration step failed"):
+                dbm._apply_migrations(conn)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], DAY_NUMBERS)
+        self.assertNotIn("paid_day", _columns(conn, "payments"))
+        self.assertNotIn("next_due_day", _columns(conn, "expenses"))
+        self.assertNotIn("autopay", _columns(conn, "expenses"))
+
+        self.assertEqual(dbm._apply_migrations(conn), (DAY_NUMBERS, dbm.SCHEMA_VERSION))
+        self.assertIn("paid_day", _columns(conn, "payments"))
+
+
+if __name__ == "__main__":
+    unittest.main()
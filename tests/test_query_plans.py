@@ -0,0 +1,91 @@
+"""Payment date filters must stay range searches on an index.
+
+Each test runs the real db.py function against a small database, captures
+the SQL it executed (with its bound values) and checks EXPLAIN QUERY PLAN:
+a filter that wraps paid_day/paid_date in a function, or an index that a
+migration dropped, turns the SEARCH into a full SCAN.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import db as dbm
+
+
+class PaymentQueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "plans.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [{"name": "Rent", "amount_cents": 120000, "currency": "USD", "recurrence": "monthly"}],
+        )
+        dbm.bulk_insert_payments(
+            self.db_path,
+            [
+                {"expense_id": 1, "amount_cents": 120000, "paid_date": f"2024-{month:02d}-01"}
+                for month in range(1, 13)
+            ],
+        )
+        with dbm.get_connection(self.db_path) as conn:
+            conn.execute("ANALYZE")
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def plans(self, table: str, call) -> list[str]:
+        """Query plan details of each statement over `table` that call() runs."""
+        conn = dbm.get_connection(self.db_path)
+        statements: list[str] = []
+        conn.set_trace_callback(statements.append)
+        try:
+            call()
+        finally:
+            conn.set_trace_callback(None)
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT") and f"FROM {table}" in s]
+        self.assertTrue(selects, f"no query on {table} was run")
+        return [
+            " / ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+            for sql in selects
+        ]
+
+    def assert_index_search(self, table: str, call) -> None:
+        for plan in self.plans(table, call):
+            self.assertRegex(plan, rf"SEARCH {table} USING (COVERING INDEX|INDEX|PRIMARY KEY) ")
+            self.assertNotIn(f"SCAN {table}", plan)
+
+    def test_month_filter(self):
+        self.assert_index_search("payments", lambda: dbm.list_payments(self.db_path, year_month="2024-05"))
+
+    def test_month_filter_with_expense(self):
+        self.assert_index_search(
+            "payments", lambda: dbm.list_payments(self.db_path, year_month="2024-05", expense_id=1)
+        )
+
+    def test_from_to_filters(self):
+        self.assert_index_search(
+            "payments", lambda: dbm.list_payments(self.db_path, date_from="2024-03-01", date_to="2024-06-30")
+        )
+        self.assert_index_search("payments", lambda: dbm.list_payments(self.db_path, date_from="2024-03-01"))
+        self.assert_index_search("payments", lambda: dbm.list_payments(self.db_path, date_to="2024-06-30"))
+
+    def test_keyset_page(self):
+        self.assert_index_search(
+            "payments", lambda: dbm.list_payments(self.db_path, after=("2024-06-01", 6), limit=5)
+        )
+
+    def test_monthly_summary(self):
+        self.assert_index_search(
+            "payment_monthly_rollup", lambda: dbm.monthly_payment_summary(self.db_path, year=2024, month=5)
+        )
+        self.assert_index_search(
+            "payment_monthly_rollup", lambda: dbm.monthly_currency_summary(self.db_path, year=2024, month=5)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""reconcile looks only at payments made on or before as_of."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from expense_tracker import db as dbm
+from expense_tracker.reconcile import reconcile
+
+
+class ReconcileAsOfTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "reconcile.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [{"name": "Domain", "amount_cents": 1500, "currency": "USD", "recurrence": "yearly",
+              "start_date": "2022-03-01", "next_due_date": "2024-03-01"}],
+        )
+        dbm.record_payment(self.db_path, expense_id=1, amount_cents=1500, paid_date="2023-03-01")
+        dbm.record_payment(self.db_path, expense_id=1, amount_cents=1500, paid_date="2024-03-01")
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def test_later_payment_does_not_settle_an_earlier_occurrence(self):
+        result = reconcile(self.db_path, as_of=date(2023, 6, 1))
+        self.assertEqual(result.expected, 2)
+        self.assertEqual(result.payments, 1)
+        self.assertEqual(result.late, [])
+        self.assertEqual(result.duplicates, [])
+        self.assertEqual([date.fromordinal(d) for d in result.missed.due_days], [date(2022, 3, 1)])
+
+    def test_payment_on_as_of_counts(self):
+        result = reconcile(self.db_path, as_of=date(2024, 3, 1))
+        self.assertEqual(result.payments, 2)
+        self.assertEqual(result.late, [])
+        self.assertEqual([date.fromordinal(d) for d in result.missed.due_days], [date(2022, 3, 1)])
+
+    def test_undated_payment_is_counted_and_left_out(self):
+        with dbm.get_connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO payments (expense_id, amount_cents, paid_date, created_at) "
+                "VALUES (1, 1500, '01/02/2024', '2024-02-01T00:00:00Z')"
+            )
+            conn.commit()
+        result = reconcile(self.db_path, as_of=date(2024, 6, 1))
+        self.assertEqual(result.undated, 1)
+        self.assertEqual(result.payments, 2)
+        self.assertEqual([date.fromordinal(d) for d in result.missed.due_days], [date(2022, 3, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
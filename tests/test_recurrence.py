@@ -0,0 +1,72 @@
+"""first_occurrence_after against the step-by-step next_after loop it replaces."""
+
+from __future__ import annotations
+
+import random
+import unittest
+from datetime import date, timedelta
+
+from expense_tracker.recurrence import SUPPORTED_RECURRENCES, first_occurrence_after, next_after
+
+RECURRENCES = sorted(SUPPORTED_RECURRENCES - {"none"})
+
+
+def loop_first_after(base: date, recurrence: str, after: date) -> date:
+    """The old way: chain next_after until the date passes `after`."""
+    d = base
+    while d <= after:
+        d = next_after(d, recurrence)
+    return d
+
+
+def month_end_starts(years: range) -> list[date]:
+    starts = []
+    for year in years:
+        for month in range(1, 13):
+            first_of_next = date(year + month // 12, month % 12 + 1, 1)
+            for back in (1, 2, 3, 4):
+                starts.append(first_of_next - timedelta(days=back))
+    return starts
+
+
+class FirstOccurrenceAfterTest(unittest.TestCase):
+    def assert_matches_loop(self, base: date, recurrence: str, after: date) -> None:
+        self.assertEqual(
+            first_occurrence_after(base, recurrence, after),
+            loop_first_after(base, recurrence, after),
+            f"base={base} recurrence={recurrence} after={after}",
+        )
+
+    def test_random_starts_and_gaps(self):
+        rnd = random.Random(2)
+        for _ in range(4000):
+            base = date(1990, 1, 1) + timedelta(days=rnd.randrange(40 * 365))
+            recurrence = rnd.choice(RECURRENCES)
+            # Mostly short gaps, some of decades, some before base.
+            gap = rnd.choice([rnd.randrange(-60, 60), rnd.randrange(2000), rnd.randrange(30 * 365)])
+            self.assert_matches_loop(base, recurrence, base + timedelta(days=gap))
+
+    def test_month_end_starts(self):
+        rnd = random.Random(3)
+        for base in month_end_starts(range(1999, 2006)):
+            for recurrence in ("monthly", "quarterly", "yearly"):
+                for gap in (0, 1, 27, 28, 29, 30, 31, 59, 60, 61, 365, 366, rnd.randrange(20 * 365)):
+                    self.assert_matches_loop(base, recurrence, base + timedelta(days=gap))
+
+    def test_feb_29_starts(self):
+        rnd = random.Random(4)
+        for year in (1996, 2000, 2004, 2020, 2024):
+            base = date(year, 2, 29)
+            for recurrence in RECURRENCES:
+                gaps = [0, 1, 28, 365, 366, 4 * 365, 4 * 365 + 1, 100 * 365]
+                for gap in gaps + [rnd.randrange(50 * 365) for _ in range(10)]:
+                    self.assert_matches_loop(base, recurrence, base + timedelta(days=gap))
+
+    def test_base_after_cutoff_and_one_off(self):
+        base = date(2024, 5, 31)
+        self.assertEqual(first_occurrence_after(base, "monthly", date(2024, 5, 30)), base)
+        self.assertEqual(first_occurrence_after(base, "none", date(2030, 1, 1)), base)
+
+
+if __name__ == "__main__":
+    unittest.main()
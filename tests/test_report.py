@@ -0,0 +1,49 @@
+"""payment_report's month-over-month change reaches back to the previous December."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import archive
+from expense_tracker import db as dbm
+
+
+class ReportJanuaryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "report.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [{"name": "Rent", "amount_cents": 100000, "category": "Housing", "recurrence": "monthly",
+              "next_due_date": "2022-03-01"}],
+        )
+        for paid_date, cents in (("2020-12-01", 90000), ("2021-01-01", 100000), ("2021-02-01", 100000)):
+            dbm.record_payment(self.db_path, expense_id=1, amount_cents=cents, paid_date=paid_date)
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def report(self, **kwargs) -> list[tuple]:
+        rows = dbm.payment_report(self.db_path, year=2021, **kwargs)
+        return [(r["month"], r["total_cents"], r["mom_delta_cents"], r["ytd_cents"]) for r in rows]
+
+    def test_january_delta_is_against_december(self):
+        expected = [("2021-01", 100000, 10000, 100000), ("2021-02", 100000, 0, 200000)]
+        self.assertEqual(self.report(), expected)
+        self.assertEqual(self.report(month=1), expected[:1])
+
+    def test_archived_december_is_the_baseline(self):
+        archive.archive_payments(self.db_path, before_year=2021)
+        self.assertEqual(self.report(month=1), [("2021-01", 100000, 10000, 100000)])
+        archive.archive_payments(self.db_path, before_year=2022)
+        self.assertEqual(self.report(month=1), [("2021-01", 100000, 10000, 100000)])
+
+    def test_january_without_december_counts_it_as_zero(self):
+        self.assertEqual(dbm.payment_report(self.db_path, year=2020)[0]["mom_delta_cents"], 90000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Bad request parameters get a 400 that names the field."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import tempfile
+import unittest
+from http import HTTPStatus
+from pathlib import Path
+
+from expense_tracker import db as dbm
+from expense_tracker.server import ApiServer
+
+
+class BadParameterTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "api.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [{"name": "Rent", "amount_cents": 100000, "recurrence": "monthly", "next_due_date": "2024-01-01"}],
+        )
+        self.server = ApiServer(self.db_path, workers=1)
+
+    def tearDown(self):
+        self.server.close()
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def request(self, method: str, target: str, body: dict = None) -> tuple[HTTPStatus, dict]:
+        payload = json.dumps(body).encode() if body is not None else b""
+        return asyncio.run(self.server.dispatch(method, target, payload))
+
+    def test_bad_parameters_name_the_field(self):
+        cases = [
+            ("GET", "/month?month=bad", None, "month: expected YYYY-MM"),
+            ("GET", "/month?month=2024-13", None, "month: expected YYYY-MM"),
+            ("GET", "/report?year=twenty", None, "year: expected an integer"),
+            ("GET", "/report?by=day", None, "by: expected category or expense"),
+            ("GET", "/forecast?start=01/02/2024", None, "start: expected YYYY-MM-DD"),
+            ("GET", "/upcoming?days=x", None, "days: expected an integer"),
+            ("GET", "/payments?after=zz", None, "after: expected PAID_DATE:ID"),
+            ("GET", "/payments?after=2024-99-01:3", None, "after: expected YYYY-MM-DD"),
+            ("GET", "/payments?from=yesterday", None, "from: expected YYYY-MM-DD"),
+            ("GET", "/payments?limit=ten", None, "limit: expected an integer"),
+            ("POST", "/pay", {}, "expense: required"),
+            ("POST", "/pay", {"expense": "Rent", "date": "01/02/2024"}, "date: expected YYYY-MM-DD"),
+            ("POST", "/pay", {"expense": "Rent", "amount_cents": 12.5}, "amount_cents: expected an integer"),
+            ("POST", "/expenses", {"amount_cents": 100}, "name: required"),
+            ("POST", "/expenses", {"name": "Gym", "amount_cents": 100, "recurrence": "hourly"}, "recurrence: expected"),
+            ("POST", "/pay-batch", {"expenses": "Rent"}, "expenses: expected a list"),
+        ]
+        for method, target, body, message in cases:
+            status, result = self.request(method, target, body)
+            self.assertEqual(status, HTTPStatus.BAD_REQUEST, target)
+            self.assertTrue(result["error"].startswith(message), (target, result))
+        with dbm.get_connection(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0], 0)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0], 1)
+
+    def test_valid_parameters_still_work(self):
+        self.assertEqual(self.request("GET", "/payments?month=2024-1&from=2024-01-01&limit=5")[0], HTTPStatus.OK)
+        status, result = self.request("POST", "/pay", {"expense": "Rent", "date": "2024-1-5", "amount_cents": "100000"})
+        self.assertEqual(status, HTTPStatus.OK, result)
+        self.assertEqual(self.request("GET", "/report?year=2024&by=expense")[1][0]["total_cents"], 100000)
+
+
+if __name__ == "__main__":
+    unittest.main()
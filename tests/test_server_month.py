@@ -0,0 +1,61 @@
+"""/month reports a total only when it is in one currency, like the month command."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from expense_tracker import db as dbm
+from expense_tracker.server import ApiServer
+
+
+class MonthEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "month.db")
+        dbm.bulk_insert_expenses(
+            self.db_path,
+            [
+                {"name": "Rent", "amount_cents": 100000, "currency": "USD", "recurrence": "monthly",
+                 "next_due_date": "2024-01-01"},
+                {"name": "Gym", "amount_cents": 4000, "currency": "EUR", "recurrence": "monthly",
+                 "next_due_date": "2024-01-05"},
+            ],
+        )
+        dbm.record_payment(self.db_path, expense_id=1, amount_cents=100000, paid_date="2024-01-01")
+        dbm.record_payment(self.db_path, expense_id=1, amount_cents=100000, paid_date="2024-02-01")
+        dbm.record_payment(self.db_path, expense_id=2, amount_cents=4000, paid_date="2024-02-05")
+        self.server = ApiServer(self.db_path)
+
+    def tearDown(self):
+        dbm.close_all()
+        self._tmp.cleanup()
+
+    def month(self, **query: str) -> dict:
+        return self.server._month({k: [v] for k, v in query.items()}, {})
+
+    def test_single_currency_has_total(self):
+        result = self.month(month="2024-01")
+        self.assertEqual(result["total_cents"], 100000)
+        self.assertEqual(result["count"], 1)
+        self.assertEqual(self.month(month="2024-03")["total_cents"], 0)
+
+    def test_mixed_currencies_have_no_total(self):
+        result = self.month(month="2024-02")
+        self.assertNotIn("total_cents", result)
+        self.assertEqual(
+            [(r["currency"], r["total_cents"]) for r in result["by_currency"]],
+            [("EUR", 4000), ("USD", 100000)],
+        )
+
+    def test_base_totals_only_converted_currencies(self):
+        result = self.month(month="2024-02", base="usd")
+        self.assertEqual(result["base"], "USD")
+        self.assertEqual(result["total_cents"], 100000)
+        self.assertEqual(result["count"], 1)
+        self.assertEqual(result["missing_rates"], ["EUR"])
+
+
+if __name__ == "__main__":
+    unittest.main()